@@ -0,0 +1,6 @@
+"""Performance benchmarks of py_tldr, run with `python -m benchmarks`.
+
+Pages, index and archive are generated at a given scale, then served by a
+local HTTP server in place of GitHub and tldr.sh, so results depend on
+neither the network nor upstream pages.
+"""
@@ -0,0 +1,93 @@
+import json
+import random
+from pathlib import Path as LibPath
+from typing import Dict, List
+from zipfile import ZIP_DEFLATED, ZipFile
+
+PLATFORMS = ("common", "linux", "osx", "windows", "android", "sunos")
+LANGUAGES = ("en", "zh", "de", "fr", "es", "ja", "pt_BR", "ko")
+WORDS = (
+    "git tar zip grep docker node apt find ssh curl kube pip npm make sed awk "
+    "rsync cargo gcc java python ruby perl brew yarn helm vim less sort cut"
+).split()
+VERBS = "create list show remove update compress extract copy move search".split()
+NOUNS = "file directory archive image branch package user process port".split()
+
+
+def make_names(commands: int) -> List[str]:
+    """Command names like `git`, `git-1`, more of them sharing prefixes."""
+    return [
+        WORDS[i % len(WORDS)] + (f"-{i // len(WORDS)}" if i >= len(WORDS) else "")
+        for i in range(commands)
+    ]
+
+
+def make_page(name: str, rng: random.Random, examples: int = 8) -> str:
+    """A page in the tldr format with placeholders and mnemonics."""
+    lines = [
+        f"# {name}",
+        "",
+        f"> {rng.choice(VERBS).capitalize()} {rng.choice(NOUNS)}s and more.",
+        f"> More information: <https://example.com/{name}>.",
+    ]
+    for _ in range(examples):
+        verb, noun = rng.choice(VERBS), rng.choice(NOUNS)
+        lines += [
+            "",
+            f"- [{verb[0]}]{verb[1:]} a {noun}:",
+            "",
+            f"`{name} --{verb} {{{{path/to/{noun}}}}} {{{{{noun}_name}}}}`",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def make_page_dir(language: str) -> str:
+    return "pages" if language == "en" else f"pages.{language}"
+
+
+def generate(
+    root: LibPath, commands: int, platforms: int, languages: int, seed: int = 0
+) -> Dict:
+    """Write a tree of tldr pages plus the index and archive built from it.
+
+    Every command is in English and a random half of the other languages,
+    on `common` or one of the other platforms. Layout of `root` follows the
+    upstream one:
+        pages*/<platform>/<name>.md
+        assets/index.json
+        assets/tldr.zip
+
+    Returns a summary with names of commands, their platforms and number
+    of pages.
+    """
+    rng = random.Random(seed)
+    platform_names = PLATFORMS[: max(1, platforms)]
+    language_names = LANGUAGES[: max(1, languages)]
+    names = make_names(commands)
+    index, platforms_of, pages = [], {}, 0
+    (root / "assets").mkdir(parents=True, exist_ok=True)
+    with ZipFile(root / "assets" / "tldr.zip", "w", ZIP_DEFLATED) as archive:
+        for i, name in enumerate(names):
+            platform = platforms_of[name] = platform_names[i % len(platform_names)]
+            targets = []
+            for language in language_names:
+                if language != "en" and rng.random() < 0.5:
+                    continue
+                member = f"{make_page_dir(language)}/{platform}/{name}.md"
+                content = make_page(name, rng)
+                page_file = root / member
+                page_file.parent.mkdir(parents=True, exist_ok=True)
+                page_file.write_text(content, encoding="utf8")
+                archive.writestr(member, content)
+                targets.append({"os": platform, "language": language})
+                pages += 1
+            index.append({"name": name, "targets": targets})
+        data = json.dumps({"commands": index})
+        archive.writestr("index.json", data)
+    (root / "assets" / "index.json").write_text(data, encoding="utf8")
+    return {
+        "names": names,
+        "platforms": platforms_of,
+        "pages": pages,
+        "languages": list(language_names),
+    }
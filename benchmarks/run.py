@@ -0,0 +1,364 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path as LibPath
+from shutil import rmtree
+from statistics import mean, median
+from time import perf_counter, time
+from typing import Callable, Dict, List, Optional
+
+import py_tldr
+from py_tldr import page
+from py_tldr.page import PageCache, PageFinder, PageFormatter
+
+from .generate import generate
+from .server import PageServer
+
+# Lookups done per iteration of the in-process scenarios
+BATCH_SIZE = 100
+# Hours of cache TTL, with stale entries aged in between the two
+CACHE_TIMEOUT = 24
+CACHE_HARD_TIMEOUT = 24 * 30
+STALE_HOURS = 48
+
+
+def measure(
+    name: str,
+    func: Callable[[], None],
+    repeat: int,
+    ops: int = 1,
+    setup: Callable[[], None] = None,
+) -> Dict:
+    """Time func for `repeat` iterations, each doing `ops` operations.
+
+    `setup` runs before every iteration and is not timed.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    return {
+        "name": name,
+        "repeat": repeat,
+        "ops": ops,
+        "min_ms": min(times) * 1000,
+        "median_ms": median(times) * 1000,
+        "mean_ms": mean(times) * 1000,
+        "max_ms": max(times) * 1000,
+        "per_op_us": median(times) / ops * 1e6,
+    }
+
+
+class Suite:
+    """Scenarios sharing one generated tree and its server.
+
+    Every scenario returns a result of measure(), see run().
+    """
+
+    def __init__(self, root: LibPath, server: PageServer, tree: Dict, repeat: int):
+        self.root = root
+        self.server = server
+        self.tree = tree
+        self.repeat = repeat
+        rng = random.Random(0)
+        self.sample = rng.sample(tree["names"], min(BATCH_SIZE, len(tree["names"])))
+        self._caches = 0
+
+    def make_cache_location(self) -> LibPath:
+        self._caches += 1
+        return self.root / "caches" / str(self._caches)
+
+    def make_finder(self, location: LibPath = None, **kwargs) -> PageFinder:
+        finder = PageFinder(
+            self.server.page_source,
+            CACHE_TIMEOUT,
+            location or self.make_cache_location(),
+            self.server.download_url,
+            cache_hard_timeout=CACHE_HARD_TIMEOUT,
+            **kwargs,
+        )
+        finder.background_revalidation = False
+        return finder
+
+    def make_synced_finder(self, **kwargs) -> PageFinder:
+        finder = self.make_finder(**kwargs)
+        finder.sync(self.tree["languages"])
+        return finder
+
+    def bench_update(self, backend: str) -> Dict:
+        location = self.make_cache_location()
+        cache = PageCache(
+            CACHE_TIMEOUT, location, self.server.download_url, backend=backend
+        )
+        return measure(
+            f"update[{backend}]",
+            lambda: cache.update(self.tree["languages"]),
+            self.repeat,
+            setup=lambda: rmtree(location, ignore_errors=True),
+        )
+
+    def bench_update_not_modified(self) -> Dict:
+        cache = self.make_synced_finder().cache
+        return measure(
+            "update[not-modified]",
+            lambda: cache.update(self.tree["languages"]),
+            self.repeat,
+        )
+
+    def bench_find_cold(self) -> Dict:
+        finders = []
+        name = self.sample[0]
+        return measure(
+            "find[cold]",
+            lambda: finders[-1].find(name, languages=["en"]),
+            self.repeat,
+            setup=lambda: finders.append(self.make_finder()),
+        )
+
+    def _find_sample(self, finder: PageFinder) -> None:
+        for name in self.sample:
+            assert finder.find(name, languages=["en"])
+
+    def bench_find_warm(self) -> Dict:
+        finder = self.make_synced_finder()
+        return measure(
+            "find[warm]",
+            lambda: self._find_sample(finder),
+            self.repeat,
+            ops=len(self.sample),
+        )
+
+    def bench_find_stale(self) -> Dict:
+        finder = self.make_synced_finder()
+        cache = finder.cache
+        fetched = time() - STALE_HOURS * 3600
+        cache.manifest.update(
+            {
+                key: {"fetched": fetched}
+                for key in (cache.index_table_file.name, cache.archive_file.name)
+            }
+        )
+
+        def find():
+            self._find_sample(finder)
+            # Stale entries are only marked, nothing is revalidated
+            finder._stale.clear()
+
+        return measure("find[stale]", find, self.repeat, ops=len(self.sample))
+
+    def bench_search(self) -> Dict:
+        finder = self.make_synced_finder()
+
+        def search():
+            for name in self.sample:
+                finder.search(name, "linux", ["en"])
+
+        return measure("search", search, self.repeat, ops=len(self.sample))
+
+    def bench_search_text(self) -> Dict:
+        finder = self.make_synced_finder()
+        queries = ["compress file", "list directories", "remove package", "git"]
+
+        def search():
+            for query in queries:
+                finder.search_text(query, languages=["en"])
+
+        return measure("search_text", search, self.repeat, ops=len(queries))
+
+    def bench_suggest(self) -> Dict:
+        finder = self.make_synced_finder()
+        typos = [name[1] + name[0] + name[2:] for name in self.sample]
+
+        def suggest():
+            for typo in typos:
+                finder.suggest(typo)
+
+        return measure("suggest", suggest, self.repeat, ops=len(typos))
+
+    def bench_format(self, color: bool) -> Dict:
+        cache = self.make_synced_finder().cache
+        contents = [
+            cache.get(name, self.tree["platforms"][name]) for name in self.sample
+        ]
+        formatter = PageFormatter(indent_spaces=4, color=color)
+        # Rendering is what's measured, not the memoization
+        formatter.render_cache = None
+
+        def format_all():
+            for content in contents:
+                formatter.format(content)
+
+        name = "format[color]" if color else "format[plain]"
+        return measure(name, format_all, self.repeat, ops=len(contents))
+
+    def bench_cli(self, name: str, args: List[str], home: LibPath) -> Dict:
+        env = dict(os.environ, HOME=str(home), USERPROFILE=str(home))
+        env.pop("TLDR_DEBUG", None)
+        command = [sys.executable, "-c", "import py_tldr; py_tldr.cli()", *args]
+
+        def run_cli():
+            subprocess.run(command, env=env, check=True, capture_output=True)
+
+        return measure(name, run_cli, self.repeat)
+
+    def bench_cli_lookup(self) -> Dict:
+        home = self.root / "home"
+        # Same location as the cli uses, see core.DEFAULT_CACHE_DIR
+        self.make_synced_finder(location=home / ".cache" / "tldr")
+        return self.bench_cli("cli[warm]", [self.sample[0]], home)
+
+    def bench_cli_startup(self) -> Dict:
+        return self.bench_cli("cli[version]", ["--version"], self.root / "home")
+
+
+SCENARIOS = {
+    "update": lambda suite: [
+        suite.bench_update("files"),
+        suite.bench_update("archive"),
+        suite.bench_update_not_modified(),
+    ],
+    "find": lambda suite: [
+        suite.bench_find_cold(),
+        suite.bench_find_warm(),
+        suite.bench_find_stale(),
+    ],
+    "search": lambda suite: [
+        suite.bench_search(),
+        suite.bench_search_text(),
+        suite.bench_suggest(),
+    ],
+    "format": lambda suite: [suite.bench_format(True), suite.bench_format(False)],
+    "cli": lambda suite: [suite.bench_cli_startup(), suite.bench_cli_lookup()],
+}
+
+
+def run(
+    commands: int,
+    platforms: int,
+    languages: int,
+    repeat: int,
+    scenarios: List[str] = None,
+    latency: float = 0.0,
+) -> Dict:
+    """Generate a tree at the scale given and run scenarios against it.
+
+    Returns results along with parameters and environment, as dumped by
+    the `--output` option.
+    """
+    with tempfile.TemporaryDirectory(prefix="tldr-bench-") as tmp:
+        root = LibPath(tmp)
+        start = perf_counter()
+        tree = generate(root / "tree", commands, platforms, languages)
+        generate_seconds = perf_counter() - start
+        results = []
+        index_url = page.INDEX_URL
+        with PageServer(root / "tree", latency=latency) as server:
+            page.INDEX_URL = server.index_url
+            try:
+                suite = Suite(root, server, tree, repeat)
+                for scenario in scenarios or SCENARIOS:
+                    results += SCENARIOS[scenario](suite)
+            finally:
+                page.INDEX_URL = index_url
+    return {
+        "meta": {
+            "version": py_tldr.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time(),
+            "commands": commands,
+            "platforms": platforms,
+            "languages": languages,
+            "pages": tree["pages"],
+            "repeat": repeat,
+            "latency": latency,
+            "generate_seconds": generate_seconds,
+        },
+        "results": results,
+    }
+
+
+def compare(results: Dict, baseline: Dict) -> Dict[str, Optional[float]]:
+    """Ratio of median times to the baseline by name, above 1 is slower."""
+    medians = {result["name"]: result["median_ms"] for result in baseline["results"]}
+    return {
+        result["name"]: (
+            result["median_ms"] / medians[result["name"]]
+            if medians.get(result["name"])
+            else None
+        )
+        for result in results["results"]
+    }
+
+
+def print_results(results: Dict, ratios: Dict[str, Optional[float]] = None) -> None:
+    meta = results["meta"]
+    print(
+        f"py_tldr {meta['version']}, Python {meta['python']}, "
+        f"{meta['commands']} commands, {meta['pages']} pages"
+    )
+    header = f"{'scenario':<24}{'median ms':>12}{'min ms':>12}{'per op us':>12}"
+    if ratios is not None:
+        header += f"{'vs base':>10}"
+    print(header)
+    for result in results["results"]:
+        line = (
+            f"{result['name']:<24}{result['median_ms']:>12.2f}"
+            f"{result['min_ms']:>12.2f}{result['per_op_us']:>12.1f}"
+        )
+        if ratios is not None:
+            ratio = ratios.get(result["name"])
+            line += f"{ratio:>9.2f}x" if ratio else f"{'-':>10}"
+        print(line)
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Run benchmarks of py_tldr."
+    )
+    parser.add_argument("--commands", type=int, default=1000)
+    parser.add_argument("--platforms", type=int, default=3)
+    parser.add_argument("--languages", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds added to every response of the local server.",
+    )
+    parser.add_argument(
+        "-s",
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="Scenarios to run, all of them by default.",
+    )
+    parser.add_argument("-o", "--output", help="Write results as JSON to the file.")
+    parser.add_argument(
+        "--baseline", help="JSON results of an earlier run to compare with."
+    )
+    args = parser.parse_args(argv)
+    results = run(
+        args.commands,
+        args.platforms,
+        args.languages,
+        args.repeat,
+        scenarios=args.scenario,
+        latency=args.latency,
+    )
+    ratios = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf8") as f:
+            ratios = compare(results, json.load(f))
+    print_results(results, ratios)
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,64 @@
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path as LibPath
+from threading import Thread
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Serve files with Last-Modified, and 304 for If-Modified-Since.
+
+    Attributes:
+        latency: Seconds to wait before every response, to mimic a network.
+    """
+
+    latency = 0.0
+
+    def send_head(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return super().send_head()
+
+    def log_message(self, *args):
+        pass
+
+
+class PageServer:
+    """Run a local HTTP server for a tree made by generate.generate().
+
+    It stands in for both `raw.githubusercontent.com` and `tldr.sh`, see
+    the URL properties. Use it as a context manager.
+    """
+
+    def __init__(self, root: LibPath, latency: float = 0.0):
+        handler = type("Handler", (QuietHandler,), {"latency": latency})
+        self._server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), partial(handler, directory=str(root))
+        )
+        self._server.daemon_threads = True
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def page_source(self) -> str:
+        return f"{self.base_url}/pages"
+
+    @property
+    def download_url(self) -> str:
+        return f"{self.base_url}/assets/tldr.zip"
+
+    @property
+    def index_url(self) -> str:
+        return f"{self.base_url}/assets/index.json"
+
+    def __enter__(self) -> "PageServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._server.shutdown()
+        self._server.server_close()
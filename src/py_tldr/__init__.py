@@ -1,12 +1,22 @@
-from logging.config import dictConfig
+from logging import NullHandler, getLogger
 from os import environ
 
-from .core import cli
-from .page import PageCache, PageFinder, PageFormatter
-
 __version__ = "0.9.0"
 
 
+# Re-exported lazily, so that `import py_tldr` stays cheap
+def __getattr__(name):
+    if name == "cli":
+        from .core import cli
+
+        return cli
+    if name in ("PageCache", "PageFinder", "PageFormatter"):
+        from . import page
+
+        return getattr(page, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 logging_config = {
     "version": 1,
     "formatters": {
@@ -16,9 +26,7 @@ logging_config = {
     },
     "handlers": {
         "default": {
-            "class": "logging.StreamHandler"
-            if environ.get("TLDR_DEBUG")
-            else "logging.NullHandler",
+            "class": "logging.StreamHandler",
             "formatter": "default",
         }
     },
@@ -30,4 +38,13 @@ logging_config = {
         },
     },
 }
-dictConfig(logging_config)
+
+if environ.get("TLDR_DEBUG"):
+    from logging.config import dictConfig
+
+    dictConfig(logging_config)
+else:
+    # Same as a NullHandler config, without importing `logging.config`
+    _logger = getLogger(__name__)
+    _logger.addHandler(NullHandler())
+    _logger.propagate = False
@@ -0,0 +1,328 @@
+import asyncio
+from functools import partial
+from http import HTTPStatus
+from logging import getLogger
+from pathlib import Path as LibPath
+from typing import Callable, List, Optional, Tuple
+
+from .page import (
+    INDEX_KEY,
+    INDEX_URL,
+    STREAM_CHUNK_SIZE,
+    DownloadError,
+    PageFinder,
+    make_conditional_headers,
+    update_validators,
+)
+
+LOGGER = getLogger(__name__)
+
+
+def _import_aiohttp():
+    try:
+        import aiohttp
+    except ImportError as exc:
+        raise ImportError(
+            "aiohttp is required for AsyncPageFinder, "
+            "install it via `pip install py-tldr[async]`"
+        ) from exc
+    return aiohttp
+
+
+async def run_in_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+
+
+async def download_data_async(
+    session, url: str, proxy: str = None, timeout=None, validators: dict = None
+) -> Optional[bytes]:
+    """Async version of download_data() with an aiohttp session."""
+    aiohttp = _import_aiohttp()
+
+    headers = make_conditional_headers(validators)
+    try:
+        async with session.get(
+            url, proxy=proxy, timeout=timeout, headers=headers
+        ) as resp:
+            resp.raise_for_status()
+            if validators is not None:
+                if resp.status == HTTPStatus.NOT_MODIFIED:
+                    return None
+                update_validators(validators, resp.headers)
+            return await resp.read()
+    except aiohttp.ClientResponseError as exc:
+        raise DownloadError(status_code=exc.status)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        raise DownloadError()
+
+
+async def download_file_async(
+    session,
+    url: str,
+    path: LibPath,
+    proxy: str = None,
+    timeout=None,
+    validators: dict = None,
+    progress: Callable[[int, Optional[int]], None] = None,
+) -> bool:
+    """Async version of download_file(), with the same part file layout.
+
+    File writes are done in the default executor to keep the loop free.
+    """
+    aiohttp = _import_aiohttp()
+
+    part_file = LibPath(f"{path}.part")
+    tag_file = LibPath(f"{path}.part.tag")
+    headers = make_conditional_headers(validators)
+    offset = 0
+    if part_file.exists() and tag_file.exists():
+        offset = part_file.stat().st_size
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = tag_file.read_text(encoding="utf8")
+    try:
+        async with session.get(
+            url, proxy=proxy, timeout=timeout, headers=headers
+        ) as resp:
+            if resp.status == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+                part_file.unlink()
+                tag_file.unlink()
+                return await download_file_async(
+                    session, url, path, proxy, timeout, validators, progress
+                )
+            resp.raise_for_status()
+            if resp.status == HTTPStatus.NOT_MODIFIED:
+                for item in (part_file, tag_file):
+                    if item.exists():
+                        item.unlink()
+                return False
+            if resp.status != HTTPStatus.PARTIAL_CONTENT:
+                offset = 0
+                tag = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+                if tag:
+                    tag_file.write_text(tag, encoding="utf8")
+                elif tag_file.exists():
+                    tag_file.unlink()
+            total = offset + resp.content_length if resp.content_length else None
+            done = offset
+            f = await run_in_executor(open, part_file, "ab" if offset else "wb")
+            try:
+                async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    await run_in_executor(f.write, chunk)
+                    done += len(chunk)
+                    if progress:
+                        progress(done, total)
+            finally:
+                await run_in_executor(f.close)
+            if validators is not None:
+                update_validators(validators, resp.headers)
+    except aiohttp.ClientResponseError as exc:
+        raise DownloadError(status_code=exc.status)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        raise DownloadError()
+    part_file.replace(path)
+    if tag_file.exists():
+        tag_file.unlink()
+    return True
+
+
+class AsyncPageFinder:
+    """AsyncPageFinder is PageFinder for asyncio applications.
+
+    It requires `aiohttp`, which comes with `pip install py-tldr[async]`.
+
+    Searching and caching are delegated to the wrapped PageFinder, so both
+    behave the same, while blocking file I/O runs in the default executor
+    and network requests go through an aiohttp session. Settings such as
+    proxy, timeouts and pool size are taken from `page_finder.http_client`.
+    """
+
+    def __init__(self, page_finder: PageFinder, session=None):
+        self.page_finder = page_finder
+        self.cache = page_finder.cache
+        self._session = session
+        self._owns_session = session is None
+        # Revalidation of stale index and pages, keyed as in PageFinder
+        self._revalidations = {}
+
+    async def __aenter__(self) -> "AsyncPageFinder":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None:
+            aiohttp = _import_aiohttp()
+            connector = aiohttp.TCPConnector(
+                limit=self.page_finder.http_client.pool_size
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trust_env=True)
+        return self._session
+
+    def _make_timeout(self, stream: bool = False):
+        aiohttp = _import_aiohttp()
+        http_client = self.page_finder.http_client
+        if stream:
+            connect, read = http_client.stream_timeout
+        else:
+            connect = read = http_client.timeout
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+    @property
+    def _proxy(self) -> Optional[str]:
+        return self.page_finder.proxy_url or None
+
+    async def close(self) -> None:
+        """Wait for pending revalidations, then close the session."""
+        if self._revalidations:
+            await asyncio.gather(*self._revalidations.values(), return_exceptions=True)
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+        self._session = None
+
+    async def _query(self, url: str) -> str:
+        try:
+            LOGGER.debug("Query URL: %s", url)
+            data = await download_data_async(
+                self._get_session(), url, self._proxy, self._make_timeout()
+            )
+        except DownloadError as exc:
+            if exc.status_code == HTTPStatus.NOT_FOUND:
+                return ""
+            raise exc
+        return data.decode(encoding="utf8")
+
+    async def search(
+        self, name: str, platform: str = "", languages: List[str] = None
+    ) -> Tuple[str, str, str]:
+        """See PageFinder.search()."""
+        return await run_in_executor(self.page_finder.search, name, platform, languages)
+
+    async def find(
+        self, name: str, platform: str = "", languages: List[str] = None
+    ) -> str:
+        """See PageFinder.find(), stale ones are revalidated in tasks."""
+        if not await run_in_executor(self.cache.check_index):
+            if await run_in_executor(self.cache.check_stale_index):
+                self._revalidate_later(INDEX_KEY, self.update_index())
+            else:
+                await self.update_index()
+        name, platform, language = await self.search(name, platform, languages)
+        if not name or not platform or not language:
+            return ""
+        if self.page_finder.local_root:
+            return await run_in_executor(
+                self.page_finder.read_local, name, platform, language
+            )
+        if self.page_finder.cache_enabled:
+            content = await run_in_executor(
+                self.cache.get, name, platform, language=language
+            )
+            if content:
+                return content
+            content = await run_in_executor(
+                self.cache.get_stale, name, platform, language=language
+            )
+            if content:
+                key = (name, platform, language)
+                self._revalidate_later(key, self._fetch(*key))
+                return content
+        return await self._fetch(name, platform, language)
+
+    async def _fetch(self, name: str, platform: str, language: str) -> str:
+        url = self.page_finder.make_page_url(name, platform, language)
+        content = await self._query(url)
+        if content and self.page_finder.cache_enabled:
+            await run_in_executor(
+                self.cache.set, name, platform, content, language=language, source=url
+            )
+        return content
+
+    def _revalidate_later(self, key: Tuple, coro) -> None:
+        if key in self._revalidations:
+            coro.close()
+            return
+
+        async def revalidate():
+            try:
+                await coro
+            except DownloadError as exc:
+                LOGGER.debug("Revalidation failed: %s", exc)
+            finally:
+                del self._revalidations[key]
+
+        self._revalidations[key] = asyncio.ensure_future(revalidate())
+
+    async def _download(
+        self,
+        url: str,
+        key: str,
+        conditional: bool,
+        path: LibPath = None,
+        progress: Callable[[int, Optional[int]], None] = None,
+    ) -> Optional[bytes]:
+        """See PageCache._download()."""
+        validators = await run_in_executor(self.cache.get_validators, key, conditional)
+        await run_in_executor(
+            self.cache.location_base.mkdir, parents=True, exist_ok=True
+        )
+        if path:
+            modified = await download_file_async(
+                self._get_session(),
+                url,
+                path,
+                self._proxy,
+                self._make_timeout(stream=True),
+                validators=validators,
+                progress=progress,
+            )
+            data = b"" if modified else None
+        else:
+            data = await download_data_async(
+                self._get_session(),
+                url,
+                self._proxy,
+                self._make_timeout(),
+                validators=validators,
+            )
+        await run_in_executor(self.cache.save_validators, key, validators)
+        return data
+
+    async def update_index(self) -> None:
+        """See PageCache.update_index()."""
+        if self.cache.local_root:
+            await run_in_executor(self.page_finder.update_index)
+            return
+        conditional = await run_in_executor(self.cache.index_table_file.exists)
+        data = await self._download(
+            INDEX_URL, self.cache.index_table_file.name, conditional
+        )
+        await run_in_executor(self.cache.install_index, data)
+        self.page_finder.reset_index()
+
+    async def sync(
+        self,
+        languages: List[str],
+        progress: Callable[[int, Optional[int]], None] = None,
+    ) -> None:
+        """See PageFinder.sync()."""
+        if isinstance(languages, str):
+            languages = [languages]
+        if self.cache.local_root:
+            await run_in_executor(self.page_finder.sync, languages)
+            return
+        conditional = await run_in_executor(self.cache.has_synced, languages)
+        data = await self._download(
+            self.cache.download_url,
+            self.cache.archive_file.name,
+            conditional,
+            path=self.cache.archive_file,
+            progress=progress,
+        )
+        modified = data is not None
+        await run_in_executor(self.cache.install, languages, modified=modified)
+        await run_in_executor(
+            self.cache.update_text_index, languages, modified=modified
+        )
+        self.page_finder.reset_index()
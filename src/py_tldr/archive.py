@@ -0,0 +1,125 @@
+import os
+import struct
+import zlib
+from pathlib import Path as LibPath
+from typing import List, Optional, Tuple
+
+from .index import Table, write_table
+
+# Local file header, see section 4.3.7 of the zip specification
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+# Offset table record: header offset, compress type, compressed size
+MEMBER = struct.Struct("<QHQ")
+# Identity of the archive the table is built from: size, mtime, inode. It's
+# kept as the record of a key no member can have, which sorts first
+IDENTITY = struct.Struct("<QQQ")
+IDENTITY_KEY = "\0identity"
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+
+def build_offset_table(archive_file: LibPath, table_file: LibPath) -> List[str]:
+    """Read central directory of the archive once and persist member offsets.
+
+    Returns names of the members, so that nothing else has to read it.
+    """
+    from zipfile import ZipFile
+
+    with open(archive_file, "rb") as fp, ZipFile(fp) as f:
+        identity = get_identity(os.fstat(fp.fileno()))
+        members = [
+            (
+                info.filename,
+                MEMBER.pack(info.header_offset, info.compress_type, info.compress_size),
+            )
+            for info in f.infolist()
+            if not info.is_dir()
+        ]
+    write_table(table_file, members + [(IDENTITY_KEY, IDENTITY.pack(*identity))])
+    return [name for name, _ in members]
+
+
+def get_identity(stat: os.stat_result) -> Tuple[int, int, int]:
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class ArchiveReader:
+    """ArchiveReader reads members of a zip archive via its offset table.
+
+    Instead of parsing the central directory on every run, member offsets
+    are looked up in the table built by build_offset_table(), then data is
+    read right after the local file header.
+
+    The archive may be replaced by a sync of another process, so its
+    identity is checked against the one saved in the table on every read.
+    On a mismatch the table is opened again, and rebuilt if it's still
+    not of the archive, e.g. read in the middle of a sync.
+    """
+
+    def __init__(self, archive_file: LibPath, table_file: LibPath):
+        self.archive_file = archive_file
+        self.table_file = table_file
+        self._table = None
+
+    def _get_table(self) -> Table:
+        if self._table is None:
+            self._table = Table(self.table_file)
+        return self._table
+
+    def _get_checked_table(self, identity: Tuple[int, int, int]) -> Table:
+        for rebuild in (False, True):
+            if rebuild:
+                build_offset_table(self.archive_file, self.table_file)
+            table = self._get_table()
+            record = table.get(IDENTITY_KEY)
+            if record is not None and IDENTITY.unpack(record) == identity:
+                return table
+            self.close()
+        raise ValueError(f"Offset table not of the archive: {self.archive_file}")
+
+    def read(self, name: str) -> Optional[bytes]:
+        """Read data of the member, None if there is no such member.
+
+        Raises:
+          OSError: if the archive or the table can't be read.
+          ValueError: if data read is not of the member.
+        """
+        from zipfile import BadZipFile
+
+        try:
+            return self._read(name)
+        except (struct.error, zlib.error, BadZipFile) as exc:
+            raise ValueError(f"Bad data for member: {name}") from exc
+
+    def _read(self, name: str) -> Optional[bytes]:
+        with open(self.archive_file, "rb") as f:
+            table = self._get_checked_table(get_identity(os.fstat(f.fileno())))
+            record = table.get(name)
+            if record is None:
+                return None
+            header_offset, compress_type, compress_size = MEMBER.unpack(record)
+            f.seek(header_offset)
+            header = LOCAL_HEADER.unpack(f.read(LOCAL_HEADER.size))
+            if header[0] != LOCAL_HEADER_SIGNATURE:
+                raise ValueError(f"Bad local header for member: {name}")
+            name_len, extra_len = header[-2:]
+            f.seek(name_len + extra_len, 1)
+            data = f.read(compress_size)
+        if compress_type == ZIP_STORED:
+            return data
+        if compress_type == ZIP_DEFLATED:
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+        return self._read_fallback(name)
+
+    def _read_fallback(self, name: str) -> bytes:
+        from zipfile import ZipFile
+
+        with ZipFile(self.archive_file) as f:
+            return f.read(name)
+
+    def close(self) -> None:
+        if self._table is not None:
+            self._table.close()
+            self._table = None
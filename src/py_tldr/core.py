@@ -4,30 +4,31 @@ from copy import deepcopy
 from functools import partial
 from os import environ
 from pathlib import Path as LibPath
+from typing import Dict, Iterable, List
 
-import toml
-from click import argument, option, pass_context, secho
+from click import Choice, argument, echo, option, pass_context, secho
 from click import command as command_
-from yaspin import yaspin
-from yaspin.spinners import Spinners
 
-from py_tldr.page import DownloadError, PageFinder, PageFormatter
+from py_tldr.page import (
+    DEFAULT_BACKOFF_FACTOR,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_RETRIES,
+    DEFAULT_REVALIDATE_TIMEOUT,
+    DEFAULT_TIMEOUT,
+    STREAM_TIMEOUT,
+    DownloadError,
+    Formatter,
+    HTTPClient,
+    JSONFormatter,
+    PageFinder,
+    PageFormatter,
+)
 from py_tldr.parse import parse_command, parse_language, parse_platform
-
-try:
-    from importlib.metadata import version
-
-    VERSION_CLI = version("py_tldr")
-except ModuleNotFoundError:
-    try:
-        from pkg_resources import get_distribution
-
-        VERSION_CLI = get_distribution("py_tldr").version
-    except ModuleNotFoundError:
-        VERSION_CLI = ""
+from py_tldr.timing import timed
 
 VERSION_CLIENT_SPEC = "1.5"
 DEFAULT_CACHE_HOURS = 24
+DEFAULT_CACHE_HARD_HOURS = 24 * 30
 DEFAULT_CONFIG = {
     "page_source": "https://raw.githubusercontent.com/tldr-pages/tldr/main/pages",
     "language": "",
@@ -35,26 +36,101 @@ DEFAULT_CONFIG = {
     "cache": {
         "enabled": True,
         "timeout": DEFAULT_CACHE_HOURS,
+        "hard_timeout": DEFAULT_CACHE_HARD_HOURS,
         "download_url": "https://tldr.sh/assets/tldr.zip",
+        "backend": "files",
+        "platforms": [],
+        "languages": [],
+        "persist_rendered": False,
+        "max_size_mb": 0,
+        "max_entries": 0,
+        "eviction": "lru",
+        "compress": False,
     },
     "proxy_url": "",
+    "network": {
+        "timeout": DEFAULT_TIMEOUT,
+        "stream_timeout": STREAM_TIMEOUT[1],
+        "retries": DEFAULT_RETRIES,
+        "backoff_factor": DEFAULT_BACKOFF_FACTOR,
+        "pool_size": DEFAULT_POOL_SIZE,
+    },
 }
 DEFAULT_CONFIG_EDITOR = "vi"
 DEFAULT_CONFIG_DIR = LibPath.home() / ".config" / "tldr"
 DEFAULT_CONFIG_FILE = DEFAULT_CONFIG_DIR / "config.toml"
 DEFAULT_CACHE_DIR = LibPath.home() / ".cache" / "tldr"
-
-DEFAULT_CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-DEFAULT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+DEFAULT_SOCKET_FILE = DEFAULT_CACHE_DIR / "daemon.sock"
+OUTPUT_FORMATS = ("ansi", "plain", "json")
 
 info = partial(secho, bold=True, fg="green")
 warn = partial(secho, bold=True, fg="yellow")
 
 
+def get_version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("py_tldr")
+    except ModuleNotFoundError:
+        try:
+            from pkg_resources import get_distribution
+
+            return get_distribution("py_tldr").version
+        except ModuleNotFoundError:
+            return ""
+
+
+class QuietSpinner:
+    """Stand-in of a spinner spinning nothing, with messages sent to stderr."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __enter__(self) -> "QuietSpinner":
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+    def write(self, text: str) -> None:
+        echo(text, err=True)
+
+
+def spinner(text: str, quiet: bool = False):
+    if quiet:
+        return QuietSpinner(text)
+    from yaspin import yaspin
+    from yaspin.spinners import Spinners
+
+    return yaspin(Spinners.arc, text=text)
+
+
+def format_progress(done: int, total: int = None) -> str:
+    done_kb = done // 1024
+    if not total:
+        return f"{done_kb} KB"
+    return f"{done_kb}/{total // 1024} KB ({done * 100 // total}%)"
+
+
+def format_size(size: int) -> str:
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def format_hours(hours: float) -> str:
+    if hours < 1:
+        return f"{int(hours * 60)} minutes ago"
+    if hours < 48:
+        return f"{int(hours)} hours ago"
+    return f"{int(hours / 24)} days ago"
+
+
 def print_version(ctx, param, value):  # pylint: disable=unused-argument
     if not value or ctx.resilient_parsing:
         return
-    info(f"tldr version {VERSION_CLI}")
+    info(f"tldr version {get_version()}")
     info(f"client specification version {VERSION_CLIENT_SPEC}")
     ctx.exit()
 
@@ -63,10 +139,13 @@ def edit_config(ctx, param, value):  # pylint: disable=unused-argument
     """Create config file if not existed, then open in editor."""
     if not value or ctx.resilient_parsing:
         return
+    import toml
+
     config = DEFAULT_CONFIG
     config_file = DEFAULT_CONFIG_FILE
     if not config_file.exists():
         warn("No config file found, creating...")
+        config_file.parent.mkdir(parents=True, exist_ok=True)
         with open(config_file, "w", encoding="utf8") as f:
             toml.dump(config, f)
         info(f"Default config file created: {config_file}")
@@ -75,22 +154,27 @@ def edit_config(ctx, param, value):  # pylint: disable=unused-argument
     ctx.exit()
 
 
-def setup_config():  # pylint: disable=unused-argument
+def setup_config(err: bool = False):  # pylint: disable=unused-argument
     """Build a config dict from config file on top of default settings.
 
-    Note `toml` should used as file format.
+    Note `toml` should used as file format. Messages go to stderr if `err`.
     Raises:
       SystemExit: if merged config checking failed.
     """
     config = deepcopy(DEFAULT_CONFIG)
     config_file = DEFAULT_CONFIG_FILE
     if config_file.exists():
-        warn(f"Found config file: {config_file}")
+        import toml
+
+        warn(f"Found config file: {config_file}", err=err)
         with open(config_file, encoding="utf8") as f:
             config.update(toml.load(f))
     cache = config.get("cache")
     if not config.get("page_source") or not cache or not cache.get("download_url"):
-        warn(f"Page source and cache are required in config file: {config_file}")
+        warn(
+            f"Page source and cache are required in config file: {config_file}",
+            err=err,
+        )
         sys.exit(1)
     return config
 
@@ -128,29 +212,127 @@ def setup_config():  # pylint: disable=unused-argument
     help="Specify searching language(with no fallbacks), e.g. `en`.",
 )
 @option("-u", "--update", is_flag=True, help="Update local cache with all pages.")
+@option(
+    "-b",
+    "--batch",
+    is_flag=True,
+    help="Show pages of many commands, one per argument or stdin line.",
+)
+@option(
+    "--serve",
+    is_flag=True,
+    help="Run as a daemon to answer lookups from memory, via a Unix socket.",
+)
+@option(
+    "--search",
+    is_flag=True,
+    help="Search synced pages for the arguments as words, e.g. `zip directory`.",
+)
+@option("--cache-stats", is_flag=True, help="Show size and entries of local cache.")
+@option(
+    "--cache-prune",
+    is_flag=True,
+    help="Remove expired cache entries, then evict down to the configured caps.",
+)
+@option(
+    "--timings",
+    is_flag=True,
+    help="Print time taken by each phase to stderr, as JSON if TLDR_PROFILE=json.",
+)
+@option(
+    "-f",
+    "--format",
+    "output_format",
+    type=Choice(OUTPUT_FORMATS),
+    default="ansi",
+    help="Show pages styled, as plain text, or as JSON lines with messages on stderr.",
+)
 @argument("command", nargs=-1)
 @pass_context
-def cli(ctx, command, platform, language, update):
+def cli(
+    ctx,
+    command,
+    platform,
+    language,
+    update,
+    batch,
+    serve,
+    search,
+    cache_stats,
+    cache_prune,
+    timings,
+    output_format,
+):
     """Collaborative cheatsheets for console commands.
 
     For subcommands such as `git commit`, just keep as it is:
 
         tldr git commit
     """
-    config = setup_config()
+    setup_timings(ctx, timings)
+    # Output of the daemon is styled, nothing to do for other formats
+    if (
+        command
+        and output_format == "ansi"
+        and not (update or batch or serve or search or cache_stats or cache_prune)
+    ):
+        # Skip everything below if a daemon is running
+        with timed("daemon"):
+            show_from_daemon(command, platform, language)
+
+    with timed("config"):
+        config = setup_config(err=output_format == "json")
     page_finder = make_page_finder(config)
 
     languages = parse_language(language, config)
     if update:
-        with yaspin(Spinners.arc, text="Downloading pages...") as sp:
+        with spinner("Downloading pages...") as sp:
+
+            def show_progress(done, total):
+                sp.text = f"Downloading pages... {format_progress(done, total)}"
+
             try:
-                page_finder.sync(languages[0])
+                page_finder.sync(
+                    languages_to_sync(languages, config), progress=show_progress
+                )
             except DownloadError:
                 sp.write("> Sync failed, check your network and try again.")
                 sys.exit(1)
             sp.write("> Download complete.")
         info("All caches updated.")
 
+    if cache_prune:
+        count, size = page_finder.cache.prune()
+        info(f"Pruned {count} cache entries, {format_size(size)} freed.")
+    if cache_stats:
+        show_cache_stats(page_finder.cache.stats())
+    if cache_prune or cache_stats:
+        return
+
+    if serve:
+        run_daemon(page_finder, config)
+        return
+
+    # Stale pages shown are revalidated afterwards, with a deadline
+    page_finder.background_revalidation = False
+
+    if batch:
+        names = command or (line for line in sys.stdin if line.strip())
+        show_many(
+            page_finder,
+            names,
+            parse_platform(platform, config),
+            languages,
+            make_page_formatter(config, output_format, page_finder),
+        )
+        return
+
+    if search and command:
+        show_search_results(
+            page_finder, " ".join(command), parse_platform(platform, config), languages
+        )
+        return
+
     if not command:
         if not update:
             secho(ctx.get_help())
@@ -158,24 +340,194 @@ def cli(ctx, command, platform, language, update):
 
     command = parse_command(command)
     platform = parse_platform(platform, config)
-    content = None
-    with yaspin(Spinners.arc, text="Searching pages...") as sp:
-        try:
-            content = page_finder.find(command, platform, languages=languages)
-        except DownloadError:
-            sp.write("> Search failed, check your network and try again.")
-            sys.exit(1)
-        if content:
-            sp.write("> Page found.")
-        else:
-            sp.write("> No result.")
+    # Cache hits need neither network nor spinner
+    quiet = output_format == "json"
+    content = page_finder.find_cached(command, platform, languages=languages)
+    if content:
+        echo("> Page found.", err=quiet)
+    else:
+        with spinner("Searching pages...", quiet=quiet) as sp:
+            try:
+                content = page_finder.find(command, platform, languages=languages)
+            except DownloadError:
+                sp.write("> Search failed, check your network and try again.")
+                sys.exit(1)
+            if content:
+                sp.write("> Page found.")
+            else:
+                sp.write("> No result.")
 
     if content:
-        print(PageFormatter(indent_spaces=4, start_with_new_line=True).format(content))
+        show_page(make_page_formatter(config, output_format, page_finder), content)
+        page_finder.revalidate(timeout=DEFAULT_REVALIDATE_TIMEOUT)
+    else:
+        show_missing(page_finder.suggest(command), err=quiet)
+
+
+def setup_timings(ctx, enabled: bool):
+    """Report timings of phases when the cli exits, see timing.Timings.
+
+    Enabled by the flag or TLDR_PROFILE, whose value `json` has them
+    reported as JSON.
+    """
+    profile = environ.get("TLDR_PROFILE", "")
+    if not enabled and not profile:
+        return
+    from py_tldr.timing import Timings, add_hook, remove_hook
+
+    timings = Timings()
+    add_hook(timings)
+
+    def report():
+        remove_hook(timings)
+        timings.report(as_json=profile == "json")
+
+    ctx.call_on_close(report)
+
+
+def show_from_daemon(command: List[str], platform: str, language: str):
+    """Print the page found by a running daemon and exit.
+
+    Return without doing anything if there is no daemon or it fails, so
+    the lookup can be done in process.
+    """
+    if not DEFAULT_SOCKET_FILE.exists():
+        return
+    from py_tldr.daemon import ENV_KEYS, STATUS_FOUND, STATUS_MISSING, query
+
+    request = {
+        "command": list(command),
+        "platform": platform,
+        "language": language,
+        "env": {key: environ[key] for key in ENV_KEYS if key in environ},
+    }
+    response = query(DEFAULT_SOCKET_FILE, request) or {}
+    if response.get("status") == STATUS_FOUND:
+        echo("> Page found.")
+        print(response["output"])
+        sys.exit(0)
+    if response.get("status") == STATUS_MISSING:
+        echo("> No result.")
+        show_missing(response.get("suggestions", []))
+
+
+def show_page(formatter: Formatter, content: str):
+    """Print the page line by line as it's formatted.
+
+    A blank line follows, except for JSON which is kept one page per line.
+    """
+    formatter.write(content, sys.stdout)
+    if not isinstance(formatter, JSONFormatter):
+        print()
+    sys.stdout.flush()
+
+
+def show_missing(suggestions: List[str], err: bool = False):
+    """Suggest similar commands if any, then exit."""
+    if suggestions:
+        warn(f"Did you mean: {', '.join(suggestions)}?", err=err)
     else:
-        warn("There is no available pages right now.")
-        warn("You can create an issue via https://github.com/tldr-pages/tldr/issues.")
+        warn("There is no available pages right now.", err=err)
+        warn(
+            "You can create an issue via https://github.com/tldr-pages/tldr/issues.",
+            err=err,
+        )
+    sys.exit(1)
+
+
+def run_daemon(page_finder: PageFinder, config: Dict):
+    from py_tldr.daemon import serve
+
+    info(f"Serving on {DEFAULT_SOCKET_FILE}, press Ctrl+C to stop.")
+    try:
+        serve(DEFAULT_SOCKET_FILE, page_finder, config)
+    except RuntimeError as exc:
+        warn(str(exc))
         sys.exit(1)
+    except KeyboardInterrupt:
+        info("Daemon stopped.")
+
+
+def show_many(
+    page_finder: PageFinder,
+    names: Iterable[str],
+    platform: str,
+    languages: List[str],
+    formatter: Formatter = None,
+):
+    """Print pages in the order they are found.
+
+    Raises:
+      SystemExit: if any of the pages is not available.
+    """
+    if formatter is None:
+        formatter = PageFormatter(indent_spaces=4, start_with_new_line=True)
+    commands = (parse_command(name.split()) for name in names)
+    failed = False
+    try:
+        for name, content in page_finder.find_many(commands, platform, languages):
+            if content:
+                show_page(formatter, content)
+            else:
+                failed = True
+                reason = "No result" if content == "" else "Search failed"
+                warn(f"> {reason}: {name}", err=True)
+    except DownloadError:
+        warn("> Search failed, check your network and try again.", err=True)
+        sys.exit(1)
+    page_finder.revalidate(timeout=DEFAULT_REVALIDATE_TIMEOUT)
+    if failed:
+        sys.exit(1)
+
+
+def show_search_results(
+    page_finder: PageFinder, query: str, platform: str, languages: List[str]
+):
+    """Print commands of pages matching the query, best ones first.
+
+    Raises:
+      SystemExit: if nothing is found.
+    """
+    results = page_finder.search_text(query, platform, languages)
+    if not results:
+        echo("> No result.")
+        if not page_finder.cache.search_terms_file.exists():
+            warn("Pages are not synced yet, run `tldr --update` first.")
+        sys.exit(1)
+    for result in results:
+        secho(result.name, bold=True, nl=False)
+        echo(f" ({result.platform}): {result.description}")
+
+
+def show_cache_stats(stats: Dict):
+    """Print what PageCache.stats() returns, caps of pages fetched included
+    if configured.
+    """
+    echo(f"Location: {stats['location']}")
+    echo(f"Size: {format_size(stats['size'])}")
+    echo(f"Entries: {stats['entries']}")
+    if stats["index_age"] is not None:
+        echo(f"Index: updated {format_hours(stats['index_age'])}")
+    synced = stats["synced"]
+    if synced:
+        echo(
+            f"Synced: {', '.join(synced['languages'])}, "
+            f"{format_size(synced['size'])}, updated {format_hours(synced['age'])}"
+        )
+    pages = stats["pages"]
+    count = str(pages["count"])
+    if stats["max_entries"]:
+        count += f" (max {stats['max_entries']})"
+    size = format_size(pages["size"])
+    if stats["max_size"]:
+        size += f" (max {format_size(stats['max_size'])})"
+    echo(f"Pages fetched: {count}, {size}, evicted by {stats['eviction'].upper()}")
+
+
+def languages_to_sync(languages: List[str], config: Dict) -> List[str]:
+    """Fallback languages plus extra ones configured, without duplicates."""
+    extra = config["cache"].get("languages", [])
+    return list(dict.fromkeys(languages + extra))
 
 
 def make_page_finder(config=None) -> PageFinder:
@@ -184,9 +536,17 @@ def make_page_finder(config=None) -> PageFinder:
     source_url = config["page_source"]
     cache_config = config["cache"]
     cache_timeout = cache_config.get("timeout", DEFAULT_CACHE_HOURS)
+    # The cache table of config files replaces the default one as a whole
+    cache_hard_timeout = cache_config.get("hard_timeout", DEFAULT_CACHE_HARD_HOURS)
     cache_location = DEFAULT_CACHE_DIR
     cache_download_url = cache_config["download_url"]
     cache_enabled = cache_config.get("enabled", True)
+    cache_backend = cache_config.get("backend", "files")
+    cache_platforms = cache_config.get("platforms", [])
+    cache_max_size = int(cache_config.get("max_size_mb", 0) * 1024 * 1024)
+    cache_max_entries = cache_config.get("max_entries", 0)
+    cache_eviction = cache_config.get("eviction", "lru")
+    cache_compress = cache_config.get("compress", False)
     proxy_url = config["proxy_url"]
     return PageFinder(
         source_url,
@@ -195,4 +555,46 @@ def make_page_finder(config=None) -> PageFinder:
         cache_download_url,
         cache_enabled,
         proxy_url,
+        cache_backend,
+        cache_platforms,
+        make_http_client(config),
+        cache_hard_timeout,
+        cache_max_size,
+        cache_max_entries,
+        cache_eviction,
+        cache_compress,
+    )
+
+
+def make_page_formatter(
+    config: Dict, output_format: str = "ansi", page_finder: PageFinder = None
+) -> Formatter:
+    """Formatter of the output format, JSON of pages kept parsed by the cache
+    if it's enabled.
+    """
+    if output_format == "json":
+        cached = page_finder and page_finder.cache_enabled
+        return JSONFormatter(parse=page_finder.cache.get_parsed if cached else None)
+    cache_location = None
+    if config["cache"].get("persist_rendered", False):
+        cache_location = DEFAULT_CACHE_DIR / "rendered"
+    return PageFormatter(
+        indent_spaces=4,
+        start_with_new_line=True,
+        cache_location=cache_location,
+        color=output_format == "ansi",
+    )
+
+
+def make_http_client(config: Dict) -> HTTPClient:
+    network_config = config.get("network", {})
+    timeout = network_config.get("timeout", DEFAULT_TIMEOUT)
+    stream_timeout = network_config.get("stream_timeout", STREAM_TIMEOUT[1])
+    return HTTPClient(
+        config["proxy_url"],
+        timeout=timeout,
+        stream_timeout=(timeout, stream_timeout),
+        retries=network_config.get("retries", DEFAULT_RETRIES),
+        backoff_factor=network_config.get("backoff_factor", DEFAULT_BACKOFF_FACTOR),
+        pool_size=network_config.get("pool_size", DEFAULT_POOL_SIZE),
     )
@@ -0,0 +1,175 @@
+import json
+import os
+import socket
+import socketserver
+import time
+from logging import getLogger
+from pathlib import Path as LibPath
+from typing import Dict, Optional
+
+from .lru import LRUCache
+from .page import (
+    DEFAULT_RENDER_CACHE_SIZE,
+    DownloadError,
+    PageFinder,
+    PageFormatter,
+)
+from .parse import parse_command, parse_language, parse_platform
+
+LOGGER = getLogger(__name__)
+# Misses may be fetched by the daemon, which takes a while
+CLIENT_TIMEOUT = 30
+# Env of clients used for language fallbacks
+ENV_KEYS = ("LC_ALL", "LANG", "LANGUAGE")
+
+STATUS_OK = "ok"
+STATUS_FOUND = "found"
+STATUS_MISSING = "missing"
+STATUS_ERROR = "error"
+
+
+class PageRequestHandler(socketserver.StreamRequestHandler):
+    """Handle one JSON request per connection, see PageServer.lookup()."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            response = self.server.lookup(request)
+        except DownloadError:
+            response = {"status": STATUS_ERROR}
+        except (ValueError, TypeError, KeyError) as exc:
+            LOGGER.debug("Bad request: %s", exc)
+            response = {"status": STATUS_ERROR}
+        self.wfile.write(json.dumps(response).encode("utf8") + b"\n")
+
+
+class PageServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """PageServer answers page lookups over a Unix domain socket.
+
+    It holds a PageFinder with its index open, plus an LRU cache of
+    rendered pages, so a lookup costs neither interpreter startup nor
+    config loading. Rendered pages expire with the page cache timeout,
+    and are dropped once the index file is updated by a sync.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_file: LibPath,
+        page_finder: PageFinder,
+        config: Dict,
+        cache_size: int = DEFAULT_RENDER_CACHE_SIZE,
+    ):
+        self.page_finder = page_finder
+        self.config = config
+        self.rendered = LRUCache(cache_size)
+        self._index_mtime = None
+        self._manifest_mtime = None
+        super().__init__(str(socket_file), PageRequestHandler)
+
+    def server_bind(self):
+        # The socket file is created by bind, with no window for other users
+        # to connect before it's made private
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def _check_index(self) -> None:
+        cache = self.page_finder.cache
+        index_mtime = get_mtime(cache.index_table_file)
+        if index_mtime != self._index_mtime:
+            LOGGER.debug("Index changed, reset rendered pages")
+            self._index_mtime = index_mtime
+            self.page_finder.reset_index()
+            self.rendered.clear()
+        # Such as TTL renewed by a sync with nothing modified
+        manifest_mtime = get_mtime(cache.manifest_file)
+        if manifest_mtime != self._manifest_mtime:
+            self._manifest_mtime = manifest_mtime
+            cache.reload()
+
+    def lookup(self, request: Dict) -> Dict:
+        """Find and render a page.
+
+        A request looks like {"command": ["git", "commit"], "platform": "",
+        "language": "", "env": {"LANG": "en_US.UTF-8"}}, where platform
+        and language are raw cli options. A request without command is a
+        ping.
+        """
+        if "command" not in request:
+            return {"status": STATUS_OK}
+        command = parse_command(request["command"])
+        platform = parse_platform(request.get("platform", ""), self.config)
+        languages = parse_language(
+            request.get("language", ""), self.config, env=request.get("env", {})
+        )
+        self._check_index()
+        key = (command, platform, tuple(languages))
+        entry = self.rendered.get(key)
+        ttl = self.page_finder.cache_timeout * 3600
+        if entry and time.time() - entry[0] <= ttl:
+            return {"status": STATUS_FOUND, "output": entry[1]}
+        content = self.page_finder.find(command, platform, languages=languages)
+        if not content:
+            suggestions = self.page_finder.suggest(command)
+            return {"status": STATUS_MISSING, "suggestions": suggestions}
+        formatter = PageFormatter(indent_spaces=4, start_with_new_line=True)
+        output = formatter.format(content)
+        self.rendered.set(key, (time.time(), output))
+        return {"status": STATUS_FOUND, "output": output}
+
+
+def get_mtime(path: LibPath) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def query(
+    socket_file: LibPath, request: Dict, timeout: float = CLIENT_TIMEOUT
+) -> Optional[Dict]:
+    """Send request to the daemon, None if it's not available."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(socket_file))
+            sock.sendall(json.dumps(request).encode("utf8") + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        return json.loads(line)
+    except (OSError, ValueError) as exc:
+        LOGGER.debug("Daemon not available: %s", exc)
+        return None
+
+
+def serve(
+    socket_file: LibPath,
+    page_finder: PageFinder,
+    config: Dict,
+    cache_size: int = DEFAULT_RENDER_CACHE_SIZE,
+) -> None:
+    """Run a PageServer until interrupted.
+
+    Raises:
+      RuntimeError: if Unix sockets are not supported or a daemon is
+      already running.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("Unix domain sockets are not supported")
+    if socket_file.exists():
+        if query(socket_file, {}, timeout=1) is not None:
+            raise RuntimeError(f"Daemon already running on {socket_file}")
+        # Left by a daemon not shut down properly
+        socket_file.unlink()
+    socket_file.parent.mkdir(parents=True, exist_ok=True)
+    with PageServer(socket_file, page_finder, config, cache_size) as server:
+        try:
+            server.serve_forever()
+        finally:
+            socket_file.unlink()
@@ -0,0 +1,164 @@
+import mmap
+import os
+import struct
+from pathlib import Path as LibPath
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"TLDRTBL1"
+HEADER = struct.Struct("<8sI")
+SLOT = struct.Struct("<III")
+
+
+def write_table(path: LibPath, items: Iterable[Tuple[str, bytes]]) -> None:
+    """Write key/value pairs as a sorted table that Table can mmap.
+
+    Layout: header (magic, count), then a fixed-size slot per record with
+    (offset, key length, value length), then keys and values back to back.
+    Slots are ordered by the UTF-8 bytes of keys so lookups can bisect.
+    """
+    records = sorted((key.encode("utf8"), value) for key, value in items)
+    offset = HEADER.size + SLOT.size * len(records)
+    slots, blobs = [], []
+    for key, value in records:
+        slots.append(SLOT.pack(offset, len(key), len(value)))
+        blobs.append(key + value)
+        offset += len(key) + len(value)
+    from tempfile import mkstemp
+
+    # Unique per writer, the table may be rewritten by concurrent updates
+    fd, tmp_file = mkstemp(dir=LibPath(path).parent, prefix=f"{LibPath(path).name}.")
+    with open(fd, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records)))
+        f.write(b"".join(slots))
+        f.write(b"".join(blobs))
+    # Replace atomically so readers never map a half-written file
+    os.replace(tmp_file, path)
+
+
+class Table:
+    """Table is a read-only view of a file produced by write_table.
+
+    Only the header is parsed on open, a lookup reads O(log n) slots and
+    the matching record straight from the mapped file.
+    """
+
+    def __init__(self, path: LibPath):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not a table file: {path}")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _slot(self, i: int) -> Tuple[int, int, int]:
+        return SLOT.unpack_from(self._mm, HEADER.size + SLOT.size * i)
+
+    def _key(self, i: int) -> bytes:
+        offset, key_len, _ = self._slot(i)
+        return self._mm[offset : offset + key_len]
+
+    def _value(self, i: int) -> bytes:
+        offset, key_len, value_len = self._slot(i)
+        start = offset + key_len
+        return self._mm[start : start + value_len]
+
+    def _bisect(self, target: bytes) -> int:
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def get(self, key: str) -> Optional[bytes]:
+        target = key.encode("utf8")
+        i = self._bisect(target)
+        if i < self._count and self._key(i) == target:
+            return self._value(i)
+        return None
+
+    def item(self, i: int) -> Tuple[str, bytes]:
+        """Record at position i, in order of keys."""
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return self._key(i).decode("utf8"), self._value(i)
+
+    def prefix(self, prefix: str) -> Iterator[Tuple[str, bytes]]:
+        """Records whose keys start with prefix, in order of keys."""
+        target = prefix.encode("utf8")
+        for i in range(self._bisect(target), self._count):
+            key = self._key(i)
+            if not key.startswith(target):
+                break
+            yield key.decode("utf8"), self._value(i)
+
+    def keys(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self._key(i).decode("utf8")
+
+    def items(self) -> Iterator[Tuple[str, bytes]]:
+        for i in range(self._count):
+            yield self._key(i).decode("utf8"), self._value(i)
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def encode_targets(targets: Dict[str, List[str]]) -> bytes:
+    """Encode {platform: [language]} as `linux:en,zh;common:en`."""
+    return ";".join(
+        f"{platform}:{','.join(languages)}" for platform, languages in targets.items()
+    ).encode("utf8")
+
+
+def decode_targets(data: bytes) -> Dict[str, List[str]]:
+    targets = {}
+    if not data:
+        return targets
+    for item in data.decode("utf8").split(";"):
+        platform, _, languages = item.partition(":")
+        targets[platform] = languages.split(",") if languages else []
+    return targets
+
+
+class CommandIndex:
+    """CommandIndex maps command names to their platforms and languages.
+
+    It mimics the read-only part of a dict so it can stand in for the
+    restructured index.json, while only decoding the entry asked for.
+    """
+
+    def __init__(self, path: LibPath):
+        self._table = Table(path)
+
+    @staticmethod
+    def write(path: LibPath, index: Dict[str, Dict[str, List[str]]]) -> None:
+        write_table(
+            path, ((name, encode_targets(targets)) for name, targets in index.items())
+        )
+
+    def get(self, name: str, default=None) -> Optional[Dict[str, List[str]]]:
+        data = self._table.get(name)
+        if data is None:
+            return default
+        return decode_targets(data)
+
+    def __contains__(self, name: str) -> bool:
+        return self._table.get(name) is not None
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def names(self) -> Iterator[str]:
+        return self._table.keys()
+
+    def name_at(self, i: int) -> str:
+        return self._table.item(i)[0]
+
+    def close(self) -> None:
+        self._table.close()
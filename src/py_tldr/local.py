@@ -0,0 +1,160 @@
+import json
+import os
+from logging import getLogger
+from pathlib import Path as LibPath
+from time import time_ns
+from typing import Dict, List, Optional, Tuple
+
+LOGGER = getLogger(__name__)
+DEFAULT_SCAN_WORKERS = 8
+# Dirs modified more recently than this may change again within the same
+# mtime tick, so they are not trusted to be unchanged next time
+MTIME_GRANULARITY_NS = 2 * 10**9
+
+
+def get_local_path(source: str) -> Optional[LibPath]:
+    """Path of a page source given as `file://` URL or plain path.
+
+    Either the English pages dir or a checkout containing it, such as
+    `~/tldr/pages` or `~/tldr`. Returns None for other URLs.
+    """
+    if not source:
+        return None
+    if source.startswith("file://"):
+        from urllib.parse import unquote, urlparse
+
+        path = LibPath(unquote(urlparse(source).path))
+    elif "://" in source:
+        return None
+    else:
+        path = LibPath(source).expanduser()
+    if (path / "pages").is_dir():
+        path = path / "pages"
+    return path
+
+
+def make_local_page_dir(root: LibPath, language: str) -> LibPath:
+    postfix_lang = f".{language}" if language != "en" else ""
+    return root.parent / (root.name + postfix_lang)
+
+
+def list_page_names(path: str) -> List[str]:
+    with os.scandir(path) as entries:
+        return sorted(
+            entry.name[: -len(".md")]
+            for entry in entries
+            if entry.name.endswith(".md") and entry.is_file()
+        )
+
+
+class TreeScanner:
+    """TreeScanner builds the index from a local tree of pages.
+
+    Pages are laid out as upstream, `<root>/<platform>/<name>.md` for
+    English and `<root>.<language>/...` for other languages. Names listed
+    in every platform dir are saved into `state_file` along with its mtime,
+    so a scan lists only dirs modified since the last one, in parallel.
+    Modifying pages in place doesn't affect the index, so it's not looked
+    into.
+    """
+
+    def __init__(
+        self,
+        root: LibPath,
+        state_file: LibPath,
+        max_workers: int = DEFAULT_SCAN_WORKERS,
+    ):
+        self.root = root
+        self.state_file = state_file
+        self.max_workers = max_workers
+
+    def _load_state(self) -> Dict[str, Dict]:
+        try:
+            with open(self.state_file, encoding="utf8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if state.get("root") != str(self.root):
+            return {}
+        return state.get("dirs", {})
+
+    def _save_state(self, dirs: Dict[str, Dict]) -> None:
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_name(f"{self.state_file.name}.tmp")
+        with open(tmp_file, "w", encoding="utf8") as f:
+            json.dump({"root": str(self.root), "dirs": dirs}, f)
+        os.replace(tmp_file, self.state_file)
+
+    def _list_platform_dirs(self) -> List[Tuple[str, str, str, int]]:
+        """Return (key, language, path, mtime) of platform dirs of the tree."""
+        prefix = self.root.name
+        platform_dirs = []
+        with os.scandir(self.root.parent) as page_dirs:
+            for page_dir in page_dirs:
+                if not page_dir.is_dir() or not (
+                    page_dir.name == prefix or page_dir.name.startswith(f"{prefix}.")
+                ):
+                    continue
+                language = page_dir.name[len(prefix) + 1 :] or "en"
+                with os.scandir(page_dir.path) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            platform_dirs.append(
+                                (
+                                    f"{page_dir.name}/{entry.name}",
+                                    language,
+                                    entry.path,
+                                    entry.stat().st_mtime_ns,
+                                )
+                            )
+        return platform_dirs
+
+    def scan(self, force: bool = False) -> Optional[Dict[str, Dict[str, List[str]]]]:
+        """Return the index as PageCache saves it, None if it's not changed.
+
+        The index is returned anyway if `force`, e.g. when it's missing.
+
+        Raises:
+          OSError: if the tree is not there.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        state = self._load_state()
+        platform_dirs = self._list_platform_dirs()
+        stale = [
+            (key, path)
+            for key, _, path, mtime in platform_dirs
+            if state.get(key, {}).get("mtime") != mtime
+        ]
+        names_of = {key: state[key]["names"] for key in state}
+        if stale:
+            LOGGER.debug("Scan %s of %s dirs", len(stale), len(platform_dirs))
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                listed = executor.map(list_page_names, [path for _, path in stale])
+                names_of.update(zip([key for key, _ in stale], listed))
+        changed = {key for key, *_ in platform_dirs} != set(state) or any(
+            names_of[key] != state[key]["names"] for key, _ in stale if key in state
+        )
+        if stale or changed:
+            now = time_ns()
+            self._save_state(
+                {
+                    key: {
+                        # Never equal to a real mtime, so scanned next time
+                        "mtime": mtime if now - mtime > MTIME_GRANULARITY_NS else -1,
+                        "names": names_of[key],
+                    }
+                    for key, _, _, mtime in platform_dirs
+                }
+            )
+        if not changed and not force:
+            return None
+        index: Dict[str, Dict[str, List[str]]] = {}
+        # English first, as upstream lists languages
+        for key, language, _, _ in sorted(
+            platform_dirs, key=lambda item: (item[1] != "en", item[0])
+        ):
+            platform = key.split("/")[1]
+            for name in names_of[key]:
+                index.setdefault(name, {}).setdefault(platform, []).append(language)
+        return index
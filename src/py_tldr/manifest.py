@@ -0,0 +1,126 @@
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path as LibPath
+from tempfile import mkstemp
+from threading import Lock
+from time import time
+from typing import Dict, Iterator, Optional
+
+MANIFEST_VERSION = 1
+
+
+class Manifest:
+    """Manifest keeps metadata of all cache entries in a single file.
+
+    Entries are keyed by paths relative to the cache location, such as
+    `index.bin` or `pages/common/tar.md`, with fields:
+        fetched: Timestamp of the last download or revalidation.
+        source: URL downloaded from.
+        validators: ETag and Last-Modified for conditional requests.
+        size: Bytes taken by the entry on disk.
+        accessed: Timestamp of the last read, recorded sparingly.
+        hits: Number of reads recorded.
+        digest: Hash of the content of a page fetched.
+        parsed_size: Bytes of the page kept parsed, included in size.
+
+    The file is read once and kept in memory. Updates are merged into the
+    file on disk, so processes sharing the cache keep entries of others.
+    Merges are serialized across processes by a lock file next to it, see
+    lock_file().
+    """
+
+    def __init__(self, path: LibPath):
+        self.path = path
+        self._entries = None
+        self._lock = Lock()
+
+    @property
+    def lock_path(self) -> LibPath:
+        return self.path.with_name(self.path.name + ".lock")
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, encoding="utf8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def _write(self, entries: Dict[str, Dict]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_file = mkstemp(dir=self.path.parent, prefix=f"{self.path.name}.")
+        with open(fd, "w", encoding="utf8") as f:
+            json.dump({"version": MANIFEST_VERSION, "entries": entries}, f)
+        os.replace(tmp_file, self.path)
+
+    @property
+    def entries(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.entries.get(key)
+
+    def age(self, key: str) -> Optional[float]:
+        """Hours since the entry was fetched, None if there is no such entry."""
+        entry = self.entries.get(key)
+        if not entry or "fetched" not in entry:
+            return None
+        return (time() - entry["fetched"]) / 3600
+
+    def update(self, changes: Dict[str, Optional[Dict]], create: bool = True) -> None:
+        """Merge fields into entries, an entry is removed if given None.
+
+        Entries missing are skipped unless `create` is true, e.g. for
+        accesses of entries removed by others meanwhile.
+        """
+        with self._lock, lock_file(self.lock_path):
+            entries = self._read()
+            for key, fields in changes.items():
+                if fields is None:
+                    entries.pop(key, None)
+                elif create or key in entries:
+                    entries.setdefault(key, {}).update(fields)
+            self._write(entries)
+            self._entries = entries
+
+    def reload(self) -> None:
+        """Read the file again on next access, e.g. after a sync by others."""
+        self._entries = None
+
+
+@contextmanager
+def lock_file(path: LibPath) -> Iterator[None]:
+    """Hold an exclusive lock of the file, waiting for other processes.
+
+    The file is locked rather than the one it guards, since that one is
+    replaced on writes.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            # Retried for about 10 seconds before OSError is raised
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -1,30 +1,120 @@
 import json
+import os
 from collections import defaultdict
-from datetime import datetime
-from http import HTTPStatus
+from hashlib import sha1
 from logging import getLogger
 from pathlib import Path as LibPath
-from shutil import rmtree
-from typing import Dict, List, Tuple
-from zipfile import ZipFile
+from tempfile import mkstemp
+from threading import Lock, Thread
+from time import time
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+)
 
-import requests
 from click import style
-from requests.exceptions import ConnectionError as ConnectionError_
-from requests.exceptions import HTTPError, Timeout
+
+from .archive import ArchiveReader, build_offset_table
+from .index import CommandIndex
+from .lru import LRUCache
+from .manifest import Manifest
+from .syntax import (
+    BLANK,
+    CODE,
+    DESCRIPTION,
+    EXAMPLE,
+    PLACEHOLDER,
+    TITLE,
+    Page,
+    parse_page,
+    strip_line,
+    tokenize_line,
+)
+from .timing import timed
+
+if TYPE_CHECKING:
+    from .search import SearchResult
 
 LOGGER = getLogger(__name__)
+CACHE_BACKENDS = ("files", "archive")
+CACHE_EVICTIONS = ("lru", "lfu")
+# Reads of an entry are recorded at most once in this many seconds, so that
+# lookups rarely write the manifest. Hits of LFU count such periods of use.
+ACCESS_INTERVAL = 3600
+COMPRESSED_SUFFIX = ".gz"
+INDEX_URL = "https://tldr.sh/assets/index.json"
+DEFAULT_TIMEOUT = 3
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_WORKERS = DEFAULT_POOL_SIZE
+# Retry on these besides connection errors, as they are likely transient
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Timeouts for connecting and waiting between chunks of a streaming download
+STREAM_TIMEOUT = (3, 10)
+STREAM_CHUNK_SIZE = 64 * 1024
+# Formatted pages kept in memory, also the cap of persisted ones
+DEFAULT_RENDER_CACHE_SIZE = 256
+# Key of the index among stale entries to revalidate
+INDEX_KEY = ("index",)
+# Seconds to wait for revalidation after a page is shown, see revalidate()
+DEFAULT_REVALIDATE_TIMEOUT = 1
+# No revalidation is tried within this many seconds after one failed
+REVALIDATE_INTERVAL = 600
+# Styles of page syntax, as keyword arguments of click.style
+DEFAULT_THEME = {
+    TITLE: {"bold": True, "fg": "red"},
+    DESCRIPTION: {"fg": "yellow", "underline": True},
+    EXAMPLE: {"fg": "green"},
+    CODE: {"fg": "magenta"},
+    PLACEHOLDER: {"fg": "cyan"},
+}
+ANSI_RESET = "\x1b[0m"
 
 
 class PageCache:
     """PageCache intends to manage local cache data.
 
     It provides instant search among downloaded page files, while
-    should not have direct interactions with PageFinder.
+    should not have direct interactions with PageFinder. Freshness is
+    decided by fetch times recorded in the manifest, instead of mtimes.
 
     Attributes:
         timeout: Number of hours to indicate TTL for cache data.
         Could be a decimal.
+        hard_timeout: Number of hours after which cache data is not used at
+        all. Between the two, expired data can still be served while it's
+        being revalidated, see get_stale(). Same as timeout if not given.
+        backend: How synced pages are stored, `files` extracts them from
+        the archive while `archive` keeps the archive and reads members
+        from it directly.
+        platforms: Platforms to extract when syncing, empty for all. Pages
+        of `common` are always extracted since every platform falls back
+        to them.
+        http_client: Shared with PageFinder for connection reuse.
+        max_size: Bytes of cache data to keep, 0 for no limit.
+        max_entries: Number of entries to keep, 0 for no limit. Every page
+        fetched counts as one. Synced pages and the index are left out of
+        both caps, so that a sync for offline use is never evicted by
+        lookups, only pruned once expired, see prune().
+        eviction: Which entries go first once a cap is exceeded, `lru` for
+        the least recently used, `lfu` for the least frequently used. It's
+        done on writes from the sizes recorded in the manifest, see evict().
+        compress: Whether to gzip page files and index.json, each on its own.
+        Files of either format are read, so a cache stays usable when this
+        is switched. Binary tables such as index.bin are never compressed,
+        since they are read via mmap.
+        local_root: Local tree of pages to build the index from instead of
+        downloading, see local.TreeScanner. Pages there are not cached, only
+        the index and the full-text index are.
     """
 
     def __init__(
@@ -33,81 +123,986 @@ class PageCache:
         location_base: LibPath,
         download_url: str,
         proxy_url: str = None,
+        backend: str = "files",
+        platforms: List[str] = None,
+        http_client: "HTTPClient" = None,
+        hard_timeout: float = None,
+        max_size: int = 0,
+        max_entries: int = 0,
+        eviction: str = "lru",
+        compress: bool = False,
+        local_root: LibPath = None,
     ):
+        if backend not in CACHE_BACKENDS:
+            raise ValueError(f"Unknown cache backend: {backend}")
+        if eviction not in CACHE_EVICTIONS:
+            raise ValueError(f"Unknown cache eviction: {eviction}")
         self.timeout = timeout
+        self.hard_timeout = max(timeout, hard_timeout or 0)
         self.location_base = location_base
         self.location = self.location_base / "pages"
         self.download_url = download_url
         self.proxy_url = proxy_url
+        self.backend = backend
+        self.platforms = set(platforms or [])
+        if self.platforms:
+            self.platforms.add("common")
+        self.http_client = http_client or HTTPClient(proxy_url)
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.eviction = eviction
+        self.compress = compress
+        self.local_root = local_root
+        self._archive = ArchiveReader(self.archive_file, self.archive_table_file)
+        self._manifest = None
 
-    def _make_page_file(self, platform: str, name: str, language: str) -> LibPath:
+    def _make_page_dir(self, language: str) -> LibPath:
         postfix_lang = f".{language}" if language != "en" else ""
-        return LibPath(str(self.location) + postfix_lang) / platform / (name + ".md")
+        return LibPath(str(self.location) + postfix_lang)
 
-    def _validate_page_file(self, page_file: LibPath) -> bool:
-        if page_file.exists():
-            mtime_ts = page_file.lstat().st_mtime
-            age = (
-                datetime.now() - datetime.fromtimestamp(mtime_ts)
-            ).total_seconds() / 3600
-            return age <= self.timeout
-        return False
+    def _make_page_file(self, platform: str, name: str, language: str) -> LibPath:
+        return self._make_page_dir(language) / platform / (name + ".md")
 
-    def get(self, name: str, platform: str, language: str = "en") -> str:
+    def _make_member_name(self, platform: str, name: str, language: str) -> str:
+        return f"{self._make_page_dir(language).name}/{platform}/{name}.md"
+
+    def _read_file(self, path: LibPath) -> bytes:
+        """Read data of the file, from its compressed version if there is one.
+
+        The format in use is tried first, the other one only if missing.
+        """
+        compressed = with_compressed_suffix(path)
+        for item in (compressed, path) if self.compress else (path, compressed):
+            try:
+                with open(item, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            if item is compressed:
+                import gzip
+
+                return gzip.decompress(data)
+            return data
+        raise FileNotFoundError(path)
+
+    def _write_file(self, path: LibPath, data: bytes) -> int:
+        """Write data in the format in use, return bytes written.
+
+        The file in the other format is removed so that it won't be read.
+        """
+        compressed = with_compressed_suffix(path)
+        if self.compress:
+            data = gzip_compress(data)
+            path, other = compressed, path
+        else:
+            other = compressed
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        remove_quietly(other)
+        return len(data)
+
+    def _remove_file(self, path: LibPath) -> None:
+        remove_quietly(path)
+        remove_quietly(with_compressed_suffix(path))
+
+    def _get_file_size(self, path: LibPath) -> int:
+        return get_size(path) + get_size(with_compressed_suffix(path))
+
+    @property
+    def manifest_file(self) -> LibPath:
+        return LibPath(self.location_base) / "manifest.json"
+
+    @property
+    def manifest(self) -> Manifest:
+        if self._manifest is None:
+            self._manifest = Manifest(self.manifest_file)
+            if not self._manifest.exists():
+                self._migrate()
+        return self._manifest
+
+    def reload(self) -> None:
+        """Pick up changes made by other processes, such as a sync."""
+        if self._manifest is not None:
+            self._manifest.reload()
+        self._archive.close()
+        self._archive = ArchiveReader(self.archive_file, self.archive_table_file)
+
+    def _migrate(self) -> None:
+        """Build the manifest for caches of older versions, from mtimes."""
+        entries = {}
+        try:
+            with open(self.validators_file, encoding="utf8") as f:
+                validators = json.load(f)
+        except (OSError, ValueError):
+            validators = {}
+        if self.index_table_file.exists():
+            entries[self.index_table_file.name] = {
+                "fetched": self.index_table_file.stat().st_mtime,
+                "source": INDEX_URL,
+                "validators": validators.get(INDEX_URL, {}),
+                "size": self._get_index_size(),
+            }
+        if self.backend == "archive":
+            synced = (
+                [self.archive_table_file] if self.archive_table_file.exists() else []
+            )
+        else:
+            synced = [
+                item
+                for item in self.location_base.glob(f"{self.location.name}*")
+                if item.is_dir()
+            ]
+        if synced:
+            entries[self.archive_file.name] = {
+                "fetched": min(item.stat().st_mtime for item in synced),
+                "source": self.download_url,
+                "validators": validators.get(self.download_url, {}),
+                "languages": [
+                    item.suffix[1:] or "en" for item in synced if item.is_dir()
+                ],
+                "size": sum(get_size(item) for item in synced),
+            }
+        if entries:
+            LOGGER.debug("Migrate cache into manifest: %s", list(entries))
+            self._manifest.update(entries)
+        if self.validators_file.exists():
+            self.validators_file.unlink()
+
+    def _check_entry(self, key: str, timeout: float) -> bool:
+        age = self.manifest.age(key)
+        return age is not None and age <= timeout
+
+    def _read(self, name: str, platform: str, language: str, timeout: float) -> str:
+        member_name = self._make_member_name(platform, name, language)
         page_file = self._make_page_file(platform, name, language)
-        if not self._validate_page_file(page_file):
+        # Pages fetched one by one are still saved as files, so they are
+        # checked before synced ones
+        if self._check_entry(member_name, timeout):
+            try:
+                content = self._read_file(page_file).decode("utf8")
+            except OSError:
+                pass
+            else:
+                self._record_access(member_name)
+                return content
+        if not self._check_entry(self.archive_file.name, timeout):
+            return ""
+        synced = self.manifest.get(self.archive_file.name)
+        if self.backend == "archive":
+            try:
+                data = self._archive.read(member_name)
+            except (OSError, ValueError) as exc:
+                # Taken as a miss, so that the page is fetched instead
+                LOGGER.debug("Failed to read from archive: %s", exc)
+                return ""
+            if data is None:
+                return ""
+            content = data.decode("utf8")
+        elif language not in synced.get("languages", []):
+            return ""
+        else:
+            try:
+                content = self._read_file(page_file).decode("utf8")
+            except OSError:
+                return ""
+        self._record_access(self.archive_file.name)
+        return content
+
+    def _record_access(self, key: str) -> None:
+        """Count a read of the entry, unless one is recorded recently."""
+        entry = self.manifest.get(key) or {}
+        now = time()
+        if now - entry.get("accessed", 0) < ACCESS_INTERVAL:
+            return
+        try:
+            self.manifest.update(
+                {key: {"accessed": now, "hits": entry.get("hits", 0) + 1}},
+                create=False,
+            )
+        except OSError as exc:
+            # Such as a read-only cache, which is still fine to read from
+            LOGGER.debug("Access not recorded: %s", exc)
+
+    def get(self, name: str, platform: str, language: str = "en") -> str:
+        with timed("cache.read"):
+            return self._read(name, platform, language, self.timeout)
+
+    def get_stale(self, name: str, platform: str, language: str = "en") -> str:
+        """Get page expired within hard timeout, to be served while revalidated."""
+        if self.hard_timeout <= self.timeout:
             return ""
-        with open(page_file, encoding="utf8") as f:
-            res = f.read()
-        return res
+        with timed("cache.read"):
+            return self._read(name, platform, language, self.hard_timeout)
 
-    def set(self, name: str, platform: str, content: str, language: str = "en"):
-        page_file = self._make_page_file(platform, name, language)
-        page_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(page_file, "w", encoding="utf8") as f:
-            f.write(content)
-
-    def update(self, language: str):
-        """Download pages for specified language."""
-        LOGGER.debug("Update cache for language: %s", language)
-        data = download_data(self.download_url, proxies={"https": self.proxy_url})
-        tldr_zip = self.location_base / "tldr.zip"
-        with open(tldr_zip, "wb") as f:
-            f.write(data)
+    def set(
+        self,
+        name: str,
+        platform: str,
+        content: str,
+        language: str = "en",
+        source: str = "",
+    ):
+        manifest = self.manifest  # Migrated before any change
+        with timed("cache.write"):
+            size = self._write_file(
+                self._make_page_file(platform, name, language), content.encode("utf8")
+            )
+        member_name = self._make_member_name(platform, name, language)
+        digest = make_digest(content)
+        # The page parsed is kept along if the content is the same
+        entry = manifest.get(member_name) or {}
+        parsed_size = entry.get("parsed_size", 0)
+        if parsed_size and entry.get("digest") != digest:
+            remove_quietly(self._make_parsed_file(entry["digest"]))
+            parsed_size = 0
+        now = time()
+        manifest.update(
+            {
+                member_name: {
+                    "fetched": now,
+                    "source": source,
+                    "size": size + parsed_size,
+                    "accessed": now,
+                    "hits": 1,
+                    "digest": digest,
+                    "parsed_size": parsed_size,
+                }
+            }
+        )
+        self.evict(keep=[member_name])
+
+    @property
+    def validators_file(self) -> LibPath:
+        """Where validators were saved by older versions, see _migrate()."""
+        return LibPath(self.location_base) / "validators.json"
+
+    def get_validators(self, key: str, conditional: bool) -> Dict[str, str]:
+        """Return validators saved for the manifest entry.
+
+        Nothing is returned unless `conditional` is true, i.e. there is a
+        local copy to keep if the source turns out not modified.
+        """
+        if not conditional:
+            return {}
+        return (self.manifest.get(key) or {}).get("validators", {})
+
+    def save_validators(self, key: str, validators: Dict[str, str]) -> None:
+        self.manifest.update({key: {"validators": validators}})
+
+    def _download(
+        self,
+        url: str,
+        key: str,
+        conditional: bool,
+        path: LibPath = None,
+        progress: Callable[[int, Optional[int]], None] = None,
+    ) -> Optional[bytes]:
+        """Download with validators saved in the manifest entry last time.
+
+        Data is streamed into `path` if given, otherwise it's returned.
+        Returns None if the source is not modified, see get_validators().
+        """
+        validators = self.get_validators(key, conditional)
+        self.location_base.mkdir(parents=True, exist_ok=True)
+        with timed("network"):
+            if path:
+                modified = self.http_client.get_file(
+                    url, path, validators=validators, progress=progress
+                )
+                data = b"" if modified else None
+            else:
+                data = self.http_client.get(url, validators=validators)
+        self.save_validators(key, validators)
+        return data
+
+    def has_synced(self, languages: List[str]) -> bool:
+        if self.backend == "archive":
+            return self.archive_file.exists() and self.archive_table_file.exists()
+        return all(self._make_page_dir(language).exists() for language in languages)
+
+    def _record_sync(self, languages: List[str], size: int = None) -> None:
+        """Renew TTL of synced pages, which is the same for all of them."""
+        now = time()
+        fields = {
+            "fetched": now,
+            "source": self.download_url,
+            "languages": languages,
+            "accessed": now,
+        }
+        if size is not None:
+            fields["size"] = size
+        self.manifest.update({self.archive_file.name: fields})
+
+    def update(
+        self,
+        languages: List[str],
+        progress: Callable[[int, Optional[int]], None] = None,
+    ):
+        """Download pages for specified languages, along with the index.
+
+        All of the languages are kept, so that pages falling back to any of
+        them can be found locally. The index is derived from the archive,
+        see install(), so a sync takes one request only. The archive is
+        streamed to disk, `progress` is called with bytes downloaded so far
+        and the total size if known.
+
+        With a local tree of pages there is nothing to download, the index
+        and the full-text index are built from the tree instead.
+        """
+        if isinstance(languages, str):
+            languages = [languages]
+        if self.local_root:
+            self.location_base.mkdir(parents=True, exist_ok=True)
+            self.scan_index()
+            self.update_text_index(languages)
+            return
+        LOGGER.debug("Update cache for languages: %s", languages)
+        data = self._download(
+            self.download_url,
+            self.archive_file.name,
+            self.has_synced(languages),
+            path=self.archive_file,
+            progress=progress,
+        )
+        self.install(languages, modified=data is not None)
+        self.update_text_index(languages, modified=data is not None)
+
+    def install(self, languages: List[str], modified: bool = True) -> None:
+        """Make pages in the downloaded archive available for reading.
+
+        The index is written from names of all members, read in the same
+        pass over the central directory, so it matches the pages synced.
+        If the archive is not modified, TTL of existing pages and the index
+        is renewed.
+        """
+        size = names = None
+        if not modified:
+            LOGGER.debug("Pages not modified, renew TTL only")
+        elif self.backend == "archive":
+            with timed("install"):
+                names = self._update_archive()
+            size = get_size(self.archive_file) + get_size(self.archive_table_file)
+        else:
+            with timed("install"):
+                size, names = self._extract(languages)
+        if modified:
+            self.clear_parsed()
+        self._record_sync(languages, size)
+        self._install_synced_index(names)
+        self.evict(keep=[self.archive_file.name])
+
+    def _install_synced_index(self, names: Optional[List[str]]) -> None:
+        if names is None and not self.index_table_file.exists():
+            # Synced by an older version, which downloaded the index alone
+            self.update_index()
+            return
+        if names is not None:
+            with timed("index.install"):
+                self._write_index(make_index(names, self.location.name))
+        self._record_index(self.download_url)
 
+    @property
+    def archive_file(self) -> LibPath:
+        return LibPath(self.location_base) / "tldr.zip"
+
+    @property
+    def archive_table_file(self) -> LibPath:
+        return LibPath(self.location_base) / "tldr.bin"
+
+    def _update_archive(self) -> List[str]:
+        """Keep the archive and save offsets of its members for reading.
+
+        Returns names of all members.
+        """
+        self._archive.close()
+        return build_offset_table(self.archive_file, self.archive_table_file)
+
+    def _extract(self, languages: List[str]) -> Tuple[int, List[str]]:
+        """Extract pages of the languages.
+
+        Returns their size in bytes, and names of all members.
+        """
+        from zipfile import ZipFile
+
+        tldr_zip = self.archive_file
+        page_dirs = [self._make_page_dir(language) for language in languages]
+        page_dir_names = {page_dir.name for page_dir in page_dirs}
         with ZipFile(tldr_zip, "r") as f:
-            f.extractall(self.location_base)
+            infos = f.infolist()
+            # Only pages wanted are decompressed, this skips other languages
+            # and non-page files such as index.json and LICENSE.md
+            members = [
+                info
+                for info in infos
+                if self._is_member_wanted(info.filename, page_dir_names)
+            ]
+            LOGGER.debug("Extract %s of %s members", len(members), len(infos))
+            if self.compress:
+                size = sum(
+                    self._write_file(self.location_base / info.filename, f.read(info))
+                    for info in members
+                )
+            else:
+                f.extractall(self.location_base, members=members)
+                size = sum(info.file_size for info in members)
 
-        # Remove non-page files, such as tldr.zip, index.json and LICENSE.md
-        # Also remove page dirs of other languages
+        # Remove tldr.zip, page dirs of other languages and platforms
         tldr_zip.unlink()
-        dir_to_reserve = "pages" if language == "en" else f"pages.{language}"
         for item in self.location_base.iterdir():
-            if item.is_file():
-                item.unlink()
-            elif item.name != dir_to_reserve:
-                rmtree(item)
+            if (
+                item.is_dir()
+                and item.name.startswith(self.location.name)
+                and item.name not in page_dir_names
+            ):
+                self._remove_synced_pages(item)
+        if not self.platforms:
+            return size, [info.filename for info in infos]
+        for page_dir in page_dirs:
+            if not page_dir.exists():
+                continue
+            for item in page_dir.iterdir():
+                if item.is_dir() and item.name not in self.platforms:
+                    self._remove_synced_pages(item)
+        return size, [info.filename for info in infos]
+
+    def _is_member_wanted(self, name: str, page_dir_names: Set[str]) -> bool:
+        parts = name.split("/")
+        if len(parts) != 3 or parts[0] not in page_dir_names or not parts[2]:
+            return False
+        return not self.platforms or parts[1] in self.platforms
 
     @property
     def index_file(self) -> LibPath:
         return LibPath(self.location_base) / "index.json"
 
+    @property
+    def index_table_file(self) -> LibPath:
+        return LibPath(self.location_base) / "index.bin"
+
+    def get_index(self) -> Dict[str, Dict[str, List[str]]]:
+        """Load the index as saved by install_index(), compressed or not.
+
+        Lookups should use the binary index instead, see PageFinder.get_index().
+
+        Raises:
+          OSError: if the index is never downloaded.
+        """
+        return json.loads(self._read_file(self.index_file))
+
     def check_index(self) -> bool:
-        return self._validate_page_file(self.index_file)
+        return (
+            self._check_entry(self.index_table_file.name, self.timeout)
+            and self.index_table_file.exists()
+        )
+
+    def check_stale_index(self) -> bool:
+        """Check if expired index can be used while revalidated, see get_stale()."""
+        return (
+            self.hard_timeout > self.timeout
+            and self._check_entry(self.index_table_file.name, self.hard_timeout)
+            and self.index_table_file.exists()
+        )
 
     def update_index(self) -> None:
-        """Download newest index.json and restructure it for better searching."""
-        data = download_data(
-            "https://tldr.sh/assets/index.json", proxies={"https": self.proxy_url}
+        """Download newest index.json and restructure it for better searching.
+
+        Besides the restructured index.json, a binary table is written for
+        searching, see CommandIndex. With a local tree of pages, it's scanned
+        instead, see scan_index().
+        """
+        if self.local_root:
+            self.scan_index()
+            return
+        data = self._download(
+            INDEX_URL, self.index_table_file.name, self.index_table_file.exists()
         )
+        self.install_index(data)
+
+    def install_index(self, data: Optional[bytes]) -> None:
+        """Save downloaded index, or renew its TTL if data is None."""
+        from .suggest import build_ngram_index
+
+        if data is None:
+            LOGGER.debug("Index not modified, renew TTL only")
+            if not self.suggest_file.exists():
+                index = CommandIndex(self.index_table_file)
+                build_ngram_index(index.names(), self.suggest_file)
+                index.close()
+            self._record_index()
+            return
+        with timed("index.install"):
+            self._install_index(data)
+        self._record_index()
+
+    def _install_index(self, data: bytes) -> None:
         index, index_compact = json.loads(data), {}
         for command in index["commands"]:
             name = command["name"]
             index_compact[name] = defaultdict(list)
             for target in command["targets"]:
                 index_compact[name][target["os"]].append(target["language"])
-        with open(self.index_file, "w") as f:
-            json.dump(index_compact, f)
+        self._write_index(index_compact)
+
+    def _write_index(self, index_compact: Dict[str, Dict[str, List[str]]]) -> None:
+        from .suggest import build_ngram_index
+
+        self._write_file(self.index_file, json.dumps(index_compact).encode("utf8"))
+        # Written before the index, whose update is what readers watch for
+        build_ngram_index(index_compact, self.suggest_file)
+        CommandIndex.write(self.index_table_file, index_compact)
+
+    @property
+    def scan_state_file(self) -> LibPath:
+        return LibPath(self.location_base) / "scan.json"
+
+    def scan_index(self) -> None:
+        """Build the index from the local tree of pages.
+
+        Only platform dirs modified since the last scan are listed again,
+        the index is kept as is if none of them has pages added or removed.
+        """
+        from .local import TreeScanner
+
+        with timed("index.scan"):
+            index = TreeScanner(self.local_root, self.scan_state_file).scan(
+                force=not self.index_table_file.exists()
+            )
+        if index is not None:
+            with timed("index.install"):
+                self._write_index(index)
+        else:
+            LOGGER.debug("Local pages not changed, renew TTL only")
+        self._record_index(str(self.local_root))
+
+    def _record_index(self, source: str = INDEX_URL) -> None:
+        self.manifest.update(
+            {
+                self.index_table_file.name: {
+                    "fetched": time(),
+                    "source": source,
+                    "size": self._get_index_size(),
+                }
+            }
+        )
+
+    def _get_index_size(self) -> int:
+        return (
+            self._get_file_size(self.index_file)
+            + get_size(self.index_table_file)
+            + get_size(self.suggest_file)
+        )
+
+    @property
+    def suggest_file(self) -> LibPath:
+        return LibPath(self.location_base) / "suggest.bin"
+
+    @property
+    def search_terms_file(self) -> LibPath:
+        return LibPath(self.location_base) / "search.bin"
+
+    @property
+    def search_docs_file(self) -> LibPath:
+        return LibPath(self.location_base) / "search_docs.bin"
+
+    def iter_pages(self, languages: List[str]) -> Iterator[Tuple[str, str, str, str]]:
+        """Yield (language, platform, name, content) of synced pages.
+
+        Pages of the local tree are yielded instead if there is one.
+        """
+        if self.local_root:
+            from .local import make_local_page_dir
+
+            page_dirs = {
+                make_local_page_dir(self.local_root, language): language
+                for language in languages
+            }
+        else:
+            page_dirs = {
+                self._make_page_dir(language): language for language in languages
+            }
+        if self.backend == "archive" and not self.local_root:
+            from zipfile import ZipFile
+
+            page_dirs = {path.name: language for path, language in page_dirs.items()}
+            with ZipFile(self.archive_file) as f:
+                for info in f.infolist():
+                    if not self._is_member_wanted(info.filename, set(page_dirs)):
+                        continue
+                    page_dir, platform, file_name = info.filename.split("/")
+                    yield (
+                        page_dirs[page_dir],
+                        platform,
+                        file_name[: -len(".md")],
+                        f.read(info).decode("utf8"),
+                    )
+            return
+        for page_dir, language in page_dirs.items():
+            for page_file in page_dir.glob("*/*.md*"):
+                page_file = without_compressed_suffix(page_file)
+                if page_file.suffix != ".md":
+                    continue
+                yield (
+                    language,
+                    page_file.parent.name,
+                    page_file.stem,
+                    self._read_file(page_file).decode("utf8"),
+                )
+
+    @property
+    def parsed_location(self) -> LibPath:
+        return LibPath(self.location_base) / "parsed"
+
+    def _make_parsed_file(self, digest: str) -> LibPath:
+        return self.parsed_location / f"{digest}.json"
+
+    def get_parsed(self, content: str) -> Page:
+        """Return the page parsed, see syntax.parse_page().
+
+        Parsed pages are persisted as JSON keyed on content hash, so a page
+        is parsed once per sync rather than once per view, and a page
+        fetched again with changes is parsed again. They are accounted to
+        the manifest entry of their page, so they count towards caps and
+        are removed along with it. Ones of synced pages are dropped once
+        synced pages change, see clear_parsed(). Pages not in the cache,
+        e.g. of a local tree, are not persisted.
+        """
+        digest = make_digest(content)
+        parsed_file = self._make_parsed_file(digest)
+        with timed("parse"):
+            try:
+                return Page.from_dict(json.loads(parsed_file.read_bytes()))
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+            page = parse_page(content)
+        key = self._find_parsed_owner(digest)
+        if key:
+            self._save_parsed(
+                key, parsed_file, json.dumps(page.to_dict()).encode("utf8")
+            )
+        return page
+
+    def _find_parsed_owner(self, digest: str) -> Optional[str]:
+        """Key of the manifest entry the content belongs to, if any.
+
+        Contents not of pages fetched are taken as synced ones.
+        """
+        for key, entry in self._get_page_entries().items():
+            if entry.get("digest") == digest:
+                return key
+        if not self.local_root and self.manifest.get(self.archive_file.name):
+            return self.archive_file.name
+        return None
+
+    def _save_parsed(self, key: str, parsed_file: LibPath, data: bytes) -> None:
+        try:
+            parsed_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = mkstemp(dir=parsed_file.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, parsed_file)
+        except OSError as exc:
+            LOGGER.debug("Failed to persist parsed page: %s", exc)
+            return
+        entry = self.manifest.get(key) or {}
+        if key == self.archive_file.name:
+            fields = {"size": entry.get("size", 0) + len(data)}
+        else:
+            fields = {
+                "size": entry.get("size", 0) - entry.get("parsed_size", 0) + len(data),
+                "parsed_size": len(data),
+            }
+        self.manifest.update({key: fields}, create=False)
+        self.evict(keep=[key])
+
+    def clear_parsed(self) -> None:
+        """Remove parsed pages, except those of pages fetched one by one."""
+        kept = {
+            self._make_parsed_file(entry["digest"]).name
+            for entry in self._get_page_entries().values()
+            if entry.get("parsed_size")
+        }
+        try:
+            items = list(self.parsed_location.iterdir())
+        except OSError:
+            return
+        for item in items:
+            if item.name not in kept:
+                remove_quietly(item)
+        remove_empty(self.parsed_location)
+
+    @property
+    def revalidation_file(self) -> LibPath:
+        return LibPath(self.location_base) / "revalidation.json"
+
+    def check_revalidation(self) -> bool:
+        """Check if stale entries can be revalidated now.
+
+        Not if an attempt started within REVALIDATE_INTERVAL has failed or
+        never finished, e.g. it's abandoned at exit with no network.
+        """
+        try:
+            with open(self.revalidation_file, encoding="utf8") as f:
+                started = json.load(f)["started"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return True
+        return abs(time() - started) >= REVALIDATE_INTERVAL
+
+    def start_revalidation(self) -> None:
+        """Record an attempt, which counts as failed until finish_revalidation()."""
+        try:
+            self.location_base.mkdir(parents=True, exist_ok=True)
+            with open(self.revalidation_file, "w", encoding="utf8") as f:
+                json.dump({"started": time()}, f)
+        except OSError as exc:
+            LOGGER.debug("Revalidation not recorded: %s", exc)
+
+    def finish_revalidation(self) -> None:
+        remove_quietly(self.revalidation_file)
+
+    def update_text_index(self, languages: List[str], modified: bool = True) -> None:
+        """Build the full-text index of synced pages, see search.TextIndex.
+
+        It's kept as is if pages are not modified since it was built.
+        """
+        from .search import build_text_index
+
+        if not modified and self.search_terms_file.exists():
+            return
+        with timed("text_index.build"):
+            count = build_text_index(
+                self.iter_pages(languages),
+                self.search_terms_file,
+                self.search_docs_file,
+            )
+        LOGGER.debug("Text index built for %s pages", count)
+
+    def stats(self) -> Dict:
+        """Summarize entries in the manifest, nothing else is looked into."""
+        entries = self.manifest.entries
+        synced = entries.get(self.archive_file.name)
+        pages = list(self._get_page_entries().values())
+        return {
+            "location": str(self.location_base),
+            "entries": len(entries),
+            "size": sum(entry.get("size", 0) for entry in entries.values()),
+            "max_entries": self.max_entries,
+            "max_size": self.max_size,
+            "eviction": self.eviction,
+            "index_age": self.manifest.age(self.index_table_file.name),
+            "synced": (
+                {
+                    "languages": synced.get("languages", []),
+                    "size": synced.get("size", 0),
+                    "age": self.manifest.age(self.archive_file.name),
+                }
+                if synced
+                else None
+            ),
+            "pages": {
+                "count": len(pages),
+                "size": sum(entry.get("size", 0) for entry in pages),
+            },
+        }
+
+    def _get_page_entries(self) -> Dict[str, Dict]:
+        """Entries of pages fetched one by one, which caps apply to."""
+        excluded = (self.archive_file.name, self.index_table_file.name)
+        return {
+            key: entry
+            for key, entry in self.manifest.entries.items()
+            if key not in excluded
+        }
+
+    def _is_within_caps(self, size: int, count: int) -> bool:
+        return (not self.max_size or size <= self.max_size) and (
+            not self.max_entries or count <= self.max_entries
+        )
+
+    def _eviction_order(self, entry: Dict) -> Tuple:
+        accessed = entry.get("accessed", entry.get("fetched", 0))
+        if self.eviction == "lfu":
+            return entry.get("hits", 0), accessed
+        return (accessed,)
+
+    def evict(self, keep: Iterable[str] = ()) -> Tuple[int, int]:
+        """Remove entries until the cache is within caps.
+
+        Totals come from the manifest, so this neither walks the cache tree
+        nor runs on lookups, only after writes. Only pages fetched one by
+        one are counted and removed, except those in `keep`, e.g. the one
+        just written. Returns number of entries removed and bytes freed.
+        """
+        if not self.max_size and not self.max_entries:
+            return 0, 0
+        entries = self._get_page_entries()
+        size = sum(entry.get("size", 0) for entry in entries.values())
+        count = len(entries)
+        if self._is_within_caps(size, count):
+            return 0, 0
+        candidates = sorted(
+            (key for key in entries if key not in keep),
+            key=lambda key: self._eviction_order(entries[key]),
+        )
+        victims = []
+        for key in candidates:
+            if self._is_within_caps(size, count):
+                break
+            victims.append(key)
+            size -= entries[key].get("size", 0)
+            count -= 1
+        return self._remove(victims)
+
+    def prune(self) -> Tuple[int, int]:
+        """Remove entries expired beyond hard timeout, then evict().
+
+        Returns number of entries removed and bytes freed.
+        """
+        expired = [
+            key
+            for key in self.manifest.entries
+            if key != self.index_table_file.name
+            and (self.manifest.age(key) or 0) > self.hard_timeout
+        ]
+        count, size = self._remove(expired)
+        evicted_count, evicted_size = self.evict()
+        return count + evicted_count, size + evicted_size
+
+    def _remove(self, keys: List[str]) -> Tuple[int, int]:
+        entries = self.manifest.entries
+        removed = {}
+        for key in keys:
+            if key not in entries:
+                continue
+            LOGGER.debug("Evict cache entry: %s", key)
+            if key == self.archive_file.name:
+                self._remove_synced(entries[key])
+            else:
+                self._remove_file(self.location_base / key)
+                if entries[key].get("parsed_size"):
+                    remove_quietly(self._make_parsed_file(entries[key]["digest"]))
+            removed[key] = entries[key]
+        if removed:
+            self.manifest.update(dict.fromkeys(removed))
+        return len(removed), sum(entry.get("size", 0) for entry in removed.values())
+
+    def _remove_synced(self, entry: Dict) -> None:
+        """Remove synced pages, but not pages fetched among them."""
+        self._archive.close()
+        for path in (
+            self.archive_file,
+            self.archive_table_file,
+            self.search_terms_file,
+            self.search_docs_file,
+        ):
+            remove_quietly(path)
+        self.clear_parsed()
+        if self.backend == "archive":
+            return
+        for language in entry.get("languages", []):
+            self._remove_synced_pages(self._make_page_dir(language))
+
+    def _remove_synced_pages(self, path: LibPath) -> None:
+        """Remove pages under a page dir or one of its platform dirs, except
+        pages fetched among them, which have manifest entries of their own.
+        """
+        entries = self.manifest.entries
+        for page_file in path.rglob("*.md*"):
+            key = without_compressed_suffix(page_file).relative_to(self.location_base)
+            if key.as_posix() not in entries:
+                remove_quietly(page_file)
+        for item in sorted(path.rglob("*"), reverse=True):
+            if item.is_dir():
+                remove_empty(item)
+        remove_empty(path)
+
+
+def make_index(
+    member_names: Iterable[str], page_dir_name: str = "pages"
+) -> Dict[str, Dict[str, List[str]]]:
+    """Build the index as saved by PageCache from names of pages.
+
+    Names are paths of the archive such as `pages.zh/linux/apt.md`, others
+    like `index.json` are skipped.
+    """
+    index: Dict[str, Dict[str, List[str]]] = {}
+    for member_name in member_names:
+        parts = member_name.split("/")
+        if len(parts) != 3 or not parts[2].endswith(".md"):
+            continue
+        page_dir, platform, file_name = parts
+        if page_dir == page_dir_name:
+            language = "en"
+        elif page_dir.startswith(f"{page_dir_name}."):
+            language = page_dir[len(page_dir_name) + 1 :]
+        else:
+            continue
+        languages = index.setdefault(file_name[: -len(".md")], {}).setdefault(
+            platform, []
+        )
+        languages.append(language)
+    return index
+
+
+def get_size(path: LibPath) -> int:
+    """Bytes taken by a file, or by files under a directory."""
+    try:
+        if not path.is_dir():
+            return path.stat().st_size
+        return sum(item.stat().st_size for item in path.rglob("*") if item.is_file())
+    except OSError:
+        return 0
+
+
+def with_compressed_suffix(path: LibPath) -> LibPath:
+    return path.with_name(path.name + COMPRESSED_SUFFIX)
+
+
+def make_digest(*texts: str) -> str:
+    """SHA-1 of the texts one after another, in hex."""
+    digest = sha1()
+    for text in texts:
+        digest.update(text.encode("utf8"))
+    return digest.hexdigest()
+
+
+def gzip_compress(data: bytes) -> bytes:
+    """Same as gzip.compress(data, mtime=0), which is new in Python 3.8.
+
+    A fixed mtime in the header makes the same data compress the same.
+    """
+    import gzip
+    from io import BytesIO
+
+    buf = BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def without_compressed_suffix(path: LibPath) -> LibPath:
+    if path.suffix == COMPRESSED_SUFFIX:
+        return path.with_name(path.name[: -len(COMPRESSED_SUFFIX)])
+    return path
+
+
+def remove_quietly(path: LibPath) -> None:
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
+def remove_empty(path: LibPath) -> None:
+    try:
+        path.rmdir()
+    except OSError:
+        pass
+
+
+def touch(path: LibPath) -> None:
+    """Update mtime of an existing file."""
+    os.utime(path)
 
 
 class DownloadError(Exception):
@@ -116,10 +1111,55 @@ class DownloadError(Exception):
         super().__init__(*args, **kwargs)
 
 
-def download_data(url, proxies: dict = None, timeout: int = 3) -> bytes:
+def make_conditional_headers(validators: dict = None) -> Dict[str, str]:
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def update_validators(validators: dict, headers) -> None:
+    validators.clear()
+    for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified")):
+        if headers.get(header):
+            validators[key] = headers[header]
+
+
+def download_data(
+    url,
+    proxies: dict = None,
+    timeout: int = DEFAULT_TIMEOUT,
+    validators: dict = None,
+    session=None,
+) -> Optional[bytes]:
+    """Download data from url.
+
+    If `validators` is given, a conditional request is made with its `etag`
+    and `last_modified`, and the dict is updated with validators from the
+    response. None is returned if the resource is not modified. A requests
+    session can be given to reuse connections, see make_session().
+    """
+    # Imported here since the HTTP stack is slow to load and cache hits
+    # don't need it at all
+    from http import HTTPStatus
+
+    import requests
+    from requests.exceptions import ConnectionError as ConnectionError_
+    from requests.exceptions import HTTPError, Timeout
+
+    headers = make_conditional_headers(validators)
     try:
-        resp = requests.get(url, proxies=proxies, timeout=timeout)
+        resp = (session or requests).get(
+            url, proxies=proxies, timeout=timeout, headers=headers
+        )
         resp.raise_for_status()
+        if validators is not None:
+            if resp.status_code == HTTPStatus.NOT_MODIFIED:
+                return None
+            update_validators(validators, resp.headers)
         return resp.content
     except (ConnectionError_, HTTPError, Timeout) as exc:
         if exc.response is not None:
@@ -129,6 +1169,182 @@ def download_data(url, proxies: dict = None, timeout: int = 3) -> bytes:
         raise err
 
 
+def download_file(
+    url,
+    path: LibPath,
+    proxies: dict = None,
+    timeout: Tuple[float, float] = STREAM_TIMEOUT,
+    validators: dict = None,
+    progress: Callable[[int, Optional[int]], None] = None,
+    session=None,
+) -> bool:
+    """Stream data from url into path with bounded memory.
+
+    Chunks are written to `<path>.part` which replaces path when done, so
+    an interrupted download can be resumed by a Range request. The part is
+    tagged with the validator of its source for If-Range, thus a changed
+    source starts over. `timeout` is for connecting and idling between
+    chunks rather than the whole download. See download_data() for
+    `validators` and `session`. Returns False if the resource is not
+    modified.
+    """
+    from http import HTTPStatus
+
+    import requests
+    from requests.exceptions import RequestException
+
+    part_file = LibPath(f"{path}.part")
+    tag_file = LibPath(f"{path}.part.tag")
+    headers = make_conditional_headers(validators)
+    offset = 0
+    if part_file.exists() and tag_file.exists():
+        offset = part_file.stat().st_size
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = tag_file.read_text(encoding="utf8")
+    try:
+        with (session or requests).get(
+            url, proxies=proxies, timeout=timeout, headers=headers, stream=True
+        ) as resp:
+            if resp.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+                LOGGER.debug("Invalid part file, download from scratch")
+                part_file.unlink()
+                tag_file.unlink()
+                return download_file(
+                    url, path, proxies, timeout, validators, progress, session
+                )
+            resp.raise_for_status()
+            if resp.status_code == HTTPStatus.NOT_MODIFIED:
+                for item in (part_file, tag_file):
+                    if item.exists():
+                        item.unlink()
+                return False
+            if resp.status_code != HTTPStatus.PARTIAL_CONTENT:
+                offset = 0
+                tag = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+                if tag:
+                    tag_file.write_text(tag, encoding="utf8")
+                elif tag_file.exists():
+                    tag_file.unlink()
+            else:
+                LOGGER.debug("Resume download from byte %s", offset)
+            length = resp.headers.get("Content-Length")
+            total = offset + int(length) if length else None
+            done = offset
+            with open(part_file, "ab" if offset else "wb") as f:
+                for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    f.write(chunk)
+                    done += len(chunk)
+                    if progress:
+                        progress(done, total)
+            if validators is not None:
+                update_validators(validators, resp.headers)
+    except RequestException as exc:
+        # Part file is kept for resuming next time
+        response = getattr(exc, "response", None)
+        if response is not None:
+            raise DownloadError(status_code=response.status_code)
+        raise DownloadError()
+    # Readers may be using the old file, so replace it atomically
+    part_file.replace(path)
+    if tag_file.exists():
+        tag_file.unlink()
+    return True
+
+
+def make_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    retries: int = DEFAULT_RETRIES,
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+):
+    """Make a requests session with pooled keep-alive connections.
+
+    Failed connections and responses of RETRY_STATUSES are retried with
+    exponential backoff, i.e. `backoff_factor * 2 ** (retry - 1)` seconds.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        # Let the last response through so its status code is reported
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class HTTPClient:
+    """HTTPClient holds network settings and one session for all requests.
+
+    The session is made on first use, so nothing from the HTTP stack is
+    loaded until there is something to download.
+    """
+
+    def __init__(
+        self,
+        proxy_url: str = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        stream_timeout: Tuple[float, float] = STREAM_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        pool_size: int = DEFAULT_POOL_SIZE,
+    ):
+        self.proxies = {"https": proxy_url}
+        self.timeout = timeout
+        self.stream_timeout = stream_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_size = pool_size
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = make_session(
+                self.pool_size, self.retries, self.backoff_factor
+            )
+        return self._session
+
+    def get(self, url: str, validators: dict = None) -> Optional[bytes]:
+        return download_data(
+            url,
+            proxies=self.proxies,
+            timeout=self.timeout,
+            validators=validators,
+            session=self.session,
+        )
+
+    def get_file(
+        self,
+        url: str,
+        path: LibPath,
+        validators: dict = None,
+        progress: Callable[[int, Optional[int]], None] = None,
+    ) -> bool:
+        return download_file(
+            url,
+            path,
+            proxies=self.proxies,
+            timeout=self.stream_timeout,
+            validators=validators,
+            progress=progress,
+            session=self.session,
+        )
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
 class PageFinder:
     """PageFinder is to locate specific entries among tldr pages.
 
@@ -136,8 +1352,17 @@ class PageFinder:
     and platform. This means it will not expand such scope during
     the match process, except `common`, see find() method below.
 
+    Expired pages and index within the hard timeout of cache are served
+    as they are, then revalidated in a background thread, see revalidate().
+
     Attributes:
-        source_url: Indicate where tldr pages are located.
+        source_url: Indicate where tldr pages are located. A `file://` URL or
+        a plain path is a local tree of pages, e.g. a checkout of tldr-pages,
+        which is read directly with no network at all, see local_root.
+        http_client: Used for both querying pages and syncing cache.
+        background_revalidation: Whether to revalidate stale pages and index
+        in a thread right after they are served. If not, revalidate() should
+        be called when it suits, e.g. after the page is shown.
     """
 
     def __init__(
@@ -148,58 +1373,310 @@ class PageFinder:
         cache_download_url: str,
         cache_enabled: bool = True,
         proxy_url: str = None,
+        cache_backend: str = "files",
+        cache_platforms: List[str] = None,
+        http_client: HTTPClient = None,
+        cache_hard_timeout: float = None,
+        cache_max_size: int = 0,
+        cache_max_entries: int = 0,
+        cache_eviction: str = "lru",
+        cache_compress: bool = False,
     ):
+        from .local import get_local_path
+
         self.source_url = source_url
+        self.local_root = get_local_path(source_url)
         self.cache_timeout = cache_timeout
         self.cache_location = cache_location
         self.cache_enabled = cache_enabled
         self.proxy_url = proxy_url
+        self.http_client = http_client or HTTPClient(proxy_url)
         self.cache = PageCache(
-            cache_timeout, cache_location, cache_download_url, proxy_url
+            cache_timeout,
+            cache_location,
+            cache_download_url,
+            proxy_url,
+            backend=cache_backend,
+            platforms=cache_platforms,
+            http_client=self.http_client,
+            hard_timeout=cache_hard_timeout,
+            max_size=cache_max_size,
+            max_entries=cache_max_entries,
+            eviction=cache_eviction,
+            compress=cache_compress,
+            local_root=self.local_root,
         )
+        self.background_revalidation = True
+        self._index = None
+        self._text_index = None
+        self._ngram_index = None
+        # Keys of stale entries served, (name, platform, language) for pages
+        self._stale = {}
+        self._stale_lock = Lock()
 
-    def _make_page_url(self, name: str, platform: str, language: str) -> str:
+    def make_page_url(self, name: str, platform: str, language: str) -> str:
+        """URL of the page at the source, as found by search()."""
         postfix_lang = f".{language}" if language != "en" else ""
         return "/".join([self.source_url + postfix_lang, platform, name + ".md"])
 
     def _query(self, url: str) -> str:
+        from http import HTTPStatus
+
         try:
             LOGGER.debug("Query URL: %s", url)
-            data = download_data(url, proxies={"https": self.proxy_url})
+            with timed("network"):
+                data = self.http_client.get(url)
         except DownloadError as exc:
             if exc.status_code == HTTPStatus.NOT_FOUND:
                 return ""
             raise exc
         return data.decode(encoding="utf8")
 
+    def find_cached(
+        self, name: str, platform: str = "", languages: List[str] = None
+    ) -> str:
+        """Find page content via local cache only, never touching network.
+
+        Stale ones found are not revalidated, call revalidate() for that.
+        """
+        if not self.cache_enabled:
+            return ""
+        if not self.cache.check_index():
+            if not self.cache.check_stale_index():
+                return ""
+            self._mark_stale(INDEX_KEY)
+        name, platform, language = self.search(name, platform, languages)
+        if not name or not platform or not language:
+            return ""
+        return self._get_cached(name, platform, language)
+
     def find(self, name: str, platform: str = "", languages: List[str] = None) -> str:
         """Find page content via local cache and source."""
-        if not self.cache.check_index():
-            self.cache.update_index()
+        try:
+            return self._find(name, platform, languages)
+        finally:
+            self._revalidate_later()
+
+    def _find(self, name: str, platform: str, languages: List[str]) -> str:
+        self._check_index()
         LOGGER.debug("Page find for: %s, %s, %s", name, platform, languages)
         name, platform, language = self.search(name, platform, languages)
         if not name or not platform or not language:
             return ""
         LOGGER.debug("Search result: %s, %s, %s", name, platform, language)
         if self.cache_enabled:
-            content = self.cache.get(name, platform, language=language)
+            content = self._get_cached(name, platform, language)
             if content:
                 LOGGER.debug("Cache enabled and hit!")
                 return content
-        content = self._query(self._make_page_url(name, platform, language)) or ""
+        return self._fetch(name, platform, language)
+
+    def _check_index(self) -> None:
+        """Update index if expired, or have it revalidated if it's stale."""
+        with timed("index.check"):
+            fresh = self.cache.check_index()
+        if fresh:
+            return
+        if self.cache.check_stale_index():
+            self._mark_stale(INDEX_KEY)
+        else:
+            self.update_index()
+
+    def _get_cached(self, name: str, platform: str, language: str) -> str:
+        if self.local_root:
+            return self.read_local(name, platform, language)
+        content = self.cache.get(name, platform, language=language)
+        if not content:
+            content = self.cache.get_stale(name, platform, language=language)
+            if content:
+                LOGGER.debug("Stale page: %s, %s, %s", name, platform, language)
+                self._mark_stale((name, platform, language))
+        return content
+
+    def _mark_stale(self, key: Tuple) -> None:
+        with self._stale_lock:
+            self._stale[key] = None
+
+    def _revalidate_later(self) -> None:
+        if not self.background_revalidation or not self._stale:
+            return
+        Thread(target=self.revalidate, name="tldr-revalidate").start()
+
+    def revalidate(self, timeout: float = None) -> None:
+        """Refresh stale index and pages served so far.
+
+        Failures are ignored, stale ones are then kept till next time. Once
+        an attempt fails, none is made for a while, see
+        PageCache.check_revalidation(). With `timeout`, it's done in a
+        daemon thread waited for that many seconds at most, so the caller
+        is free to exit once the time is up, leaving the attempt failed.
+        """
+        with self._stale_lock:
+            stale, self._stale = list(self._stale), {}
+        if not stale:
+            return
+        if not self.cache.check_revalidation():
+            LOGGER.debug("Revalidation skipped, the last one failed recently")
+            return
+        if timeout is None:
+            self._revalidate(stale)
+            return
+        thread = Thread(
+            target=self._revalidate,
+            args=(stale,),
+            name="tldr-revalidate",
+            daemon=True,
+        )
+        thread.start()
+        thread.join(timeout)
+
+    def _revalidate(self, stale: List[Tuple]) -> None:
+        self.cache.start_revalidation()
+        failed = False
+        for key in stale:
+            LOGGER.debug("Revalidate: %s", key)
+            try:
+                if key == INDEX_KEY:
+                    self.update_index()
+                else:
+                    self._fetch(*key)
+            except DownloadError as exc:
+                LOGGER.debug("Revalidation failed: %s", exc)
+                failed = True
+        if not failed:
+            self.cache.finish_revalidation()
+
+    def read_local(self, name: str, platform: str, language: str) -> str:
+        """Read the page from the local tree, empty if there is no such page."""
+        from .local import make_local_page_dir
+
+        page_file = make_local_page_dir(self.local_root, language) / platform
+        try:
+            with timed("local.read"):
+                return (page_file / f"{name}.md").read_text(encoding="utf8")
+        except FileNotFoundError:
+            return ""
+
+    def _fetch(self, name: str, platform: str, language: str) -> str:
+        if self.local_root:
+            return self.read_local(name, platform, language)
+        url = self.make_page_url(name, platform, language)
+        content = self._query(url) or ""
         if content and self.cache_enabled:
-            self.cache.set(name, platform, content, language=language)
+            self.cache.set(name, platform, content, language=language, source=url)
         return content
 
-    def get_index(self) -> Dict:
-        with open(self.cache.index_file) as f:
-            return json.load(f)
+    def find_many(
+        self,
+        names: Iterable[str],
+        platform: str = "",
+        languages: List[str] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> Iterator[Tuple[str, Optional[str]]]:
+        """Find pages of many commands, yielding (name, content) when ready.
+
+        Index is checked once, cache hits are yielded right away in order,
+        while misses are fetched concurrently and yielded as they complete.
+        Content is empty if there is no such page, or None if fetching
+        failed.
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        self._check_index()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for name in names:
+                found, pf, language = self.search(name, platform, languages)
+                if not found or not pf or not language:
+                    yield name, ""
+                    continue
+                if self.cache_enabled:
+                    content = self._get_cached(name, pf, language)
+                    if content:
+                        yield name, content
+                        continue
+                futures[executor.submit(self._fetch, name, pf, language)] = name
+            self._revalidate_later()
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except DownloadError:
+                    LOGGER.debug("Fetch failed: %s", futures[future])
+                    yield futures[future], None
+
+    def get_index(self) -> CommandIndex:
+        """Open the binary index once, entries are decoded on demand."""
+        if self._index is None:
+            with timed("index.load"):
+                self._index = CommandIndex(self.cache.index_table_file)
+        return self._index
+
+    def update_index(self) -> None:
+        with timed("index.update"):
+            self.cache.update_index()
+        self.reset_index()
+
+    def reset_index(self) -> None:
+        """Drop indexes loaded, call it once the index on disk is updated."""
+        # Not closed explicitly since concurrent searches may be reading the
+        # old one, whose file is replaced atomically
+        self._index = None
+        self.cache.reload()
+        self._text_index = None
+        self._ngram_index = None
+
+    def suggest(self, name: str, limit: int = 5) -> List[str]:
+        """Commands with names close to the given one, closest first.
+
+        Returns an empty list if the index is not there.
+        """
+        from .suggest import open_ngram_index
+
+        if self._ngram_index is None:
+            try:
+                index = self.get_index()
+            except (OSError, ValueError):
+                return []
+            self._ngram_index = open_ngram_index(self.cache.suggest_file, index.name_at)
+        if self._ngram_index is None:
+            return []
+        with timed("suggest"):
+            return self._ngram_index.suggest(name, limit)
+
+    def search_text(
+        self,
+        query: str,
+        platform: str = "",
+        languages: List[str] = None,
+        limit: int = 10,
+    ) -> List["SearchResult"]:
+        """Full-text search among synced pages, see search.TextIndex.
+
+        Returns an empty list if pages are never synced.
+        """
+        from .search import open_text_index
+
+        if self._text_index is None:
+            self._text_index = open_text_index(
+                self.cache.search_terms_file, self.cache.search_docs_file
+            )
+        if self._text_index is None:
+            return []
+        with timed("search_text"):
+            return self._text_index.search(query, platform, languages, limit)
 
     def search(
         self, name: str, platform: str = "", languages: List[str] = None
     ) -> Tuple[str, str, str]:
         """Search index for the best platform and language for the command."""
-        info = self.get_index().get(name)
+        index = self.get_index()
+        with timed("search"):
+            return self._search(index, name, platform, languages)
+
+    def _search(
+        self, index: CommandIndex, name: str, platform: str, languages: List[str]
+    ) -> Tuple[str, str, str]:
+        info = index.get(name)
         if not info:
             return "", "", ""
 
@@ -218,44 +1695,160 @@ class PageFinder:
                 break
         return name, res_platform, res_language
 
-    def sync(self, language: str) -> None:
-        self.cache.update(language)
-        self.cache.update_index()
+    def sync(
+        self,
+        languages: List[str],
+        progress: Callable[[int, Optional[int]], None] = None,
+    ) -> None:
+        """Sync pages of all languages given, usually the fallback list.
+
+        The index comes along, see PageCache.update().
+        """
+        with timed("sync"):
+            self.cache.update(languages, progress=progress)
+        self.reset_index()
 
 
 class Formatter:
     """Formatter decides how text contents are displayed.
 
     Methods:
-        format: This should be the only method to use a formatter. To each line
-            in raw content, it will render and arrange them before returning
-            everything in the buffer.
+        format: Return the whole content formatted, memoized if configured.
+        iter_format: Yield formatted lines one by one as they are rendered,
+            keeping nothing once done, see write() which sends them to a file.
+
+    Attributes:
+        render_cache: LRU cache of formatted contents shared by instances of
+            the class, keyed on content hash plus settings. None to disable.
+        cache_location: Directory to persist formatted contents, so they are
+            reused across processes. Files there are capped at the size of
+            render_cache, least recently used ones removed first.
     """
 
+    render_cache: Optional[LRUCache] = None
+
     def __init__(
         self,
         *,
         indent_spaces: int = 0,
         start_with_new_line=False,
+        cache_location: LibPath = None,
     ) -> None:
         self.indent_spaces = indent_spaces
         self.start_with_new_line = start_with_new_line
-        self._buffer = []
+        self.cache_location = cache_location
+
+    def settings(self) -> Tuple:
+        """Everything other than content that affects formatted output."""
+        return (type(self).__name__, self.indent_spaces, self.start_with_new_line)
 
-    def _write(self, line: str) -> None:
-        self._buffer.append(line)
+    def _make_cache_key(self, content: str) -> str:
+        return make_digest(repr(self.settings()), content)
 
     def format(self, content: str) -> str:
-        for line in content.strip().split("\n"):  # Keep empty lines
-            rendered = self.render(line.strip())
-            arranged = self.arrange(rendered)
-            self._write(arranged)
+        with timed("format"):
+            return self._format_cached(content)
+
+    def _format_cached(self, content: str) -> str:
+        if self.render_cache is None:
+            return "".join(self.iter_format(content))
+        key = self._make_cache_key(content)
+        formatted = self._get_formatted(key)
+        if formatted is None:
+            formatted = "".join(self.iter_format(content))
+            self._set_formatted(key, formatted)
+        return formatted
 
-        formatted = "".join(self._buffer)
+    def _get_formatted(self, key: str) -> Optional[str]:
+        formatted = self.render_cache.get(key)
+        if formatted is None and self.cache_location:
+            formatted = self._load_formatted(key)
+            if formatted is not None:
+                self.render_cache.set(key, formatted)
+        return formatted
+
+    def _set_formatted(self, key: str, formatted: str) -> None:
+        self.render_cache.set(key, formatted)
+        if self.cache_location:
+            self._save_formatted(key, formatted)
+
+    def iter_format(self, content: str) -> Iterator[str]:
+        """Yield formatted lines, each ending with a newline.
+
+        State lives in the generator only, so one formatter can serve many
+        pages at the same time. Nothing is memoized here, see format().
+        """
         if self.start_with_new_line:
-            formatted = f"\n{formatted}"
+            yield "\n"
+        for line in content.strip().split("\n"):  # Keep empty lines
+            yield self.arrange(self.render(line.strip()))
+
+    def write(self, content: str, file: TextIO) -> None:
+        """Write formatted lines into a writable text file as they come.
+
+        Any object with `write(str)` does, e.g. sys.stdout, an opened file
+        or `socket.makefile("w")`. A memoized result is written at once.
+        """
+        with timed("format"):
+            if self.render_cache is None:
+                for line in self.iter_format(content):
+                    file.write(line)
+                return
+            key = self._make_cache_key(content)
+            formatted = self._get_formatted(key)
+            if formatted is not None:
+                file.write(formatted)
+                return
+            lines = []
+            for line in self.iter_format(content):
+                file.write(line)
+                lines.append(line)
+            self._set_formatted(key, "".join(lines))
+
+    def _load_formatted(self, key: str) -> Optional[str]:
+        file = self.cache_location / key
+        try:
+            formatted = file.read_text(encoding="utf8")
+            touch(file)  # Keep recently used ones when pruning
+        except OSError:
+            return None
         return formatted
 
+    def _save_formatted(self, key: str, formatted: str) -> None:
+        try:
+            self.cache_location.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_location / f"{key}.tmp"
+            tmp_file.write_text(formatted, encoding="utf8")
+            os.replace(tmp_file, self.cache_location / key)
+            self._prune_formatted()
+        except OSError as exc:
+            LOGGER.debug("Failed to persist formatted content: %s", exc)
+
+    def _prune_formatted(self) -> None:
+        files = [item for item in self.cache_location.iterdir() if item.is_file()]
+        if len(files) <= self.render_cache.max_size:
+            return
+        files.sort(key=lambda item: item.stat().st_mtime)
+        for item in files[: len(files) - self.render_cache.max_size]:
+            item.unlink()
+
+    def iter_format_page(self, page: Page) -> Iterator[str]:
+        """Same as iter_format(), for a page already parsed.
+
+        Lines come from Page.iter_lines() as plain text, with syntax
+        symbols removed, before render() and arrange().
+        """
+        if self.start_with_new_line:
+            yield "\n"
+        for _, spans in page.iter_lines():
+            yield self.arrange(self.render("".join([text for _, text in spans])))
+
+    def write_page(self, page: Page, file: TextIO) -> None:
+        """Same as write(), for a page already parsed, never memoized."""
+        with timed("format"):
+            for line in self.iter_format_page(page):
+                file.write(line)
+
     def render(self, line: str) -> str:
         return f"{line}\n"
 
@@ -266,22 +1859,148 @@ class Formatter:
 
 
 class PageFormatter(Formatter):
+    """PageFormatter renders tldr pages for terminals.
+
+    Lines are tokenized in one pass, see syntax.tokenize_line(), then
+    spans are wrapped in ANSI sequences of the theme, which are computed
+    once per theme. Placeholders in code such as `{{path}}` are styled on
+    their own. Without color, lines are stripped as they are, see
+    syntax.strip_line().
+
+    Attributes:
+        color: Whether to style at all, plain text is rendered otherwise.
+        theme: Styles of kinds of spans, on top of DEFAULT_THEME.
+    """
+
+    render_cache = LRUCache(DEFAULT_RENDER_CACHE_SIZE)
+
+    def __init__(
+        self,
+        *,
+        indent_spaces: int = 0,
+        start_with_new_line=False,
+        cache_location: LibPath = None,
+        color: bool = True,
+        theme: Dict[str, Dict] = None,
+    ) -> None:
+        super().__init__(
+            indent_spaces=indent_spaces,
+            start_with_new_line=start_with_new_line,
+            cache_location=cache_location,
+        )
+        self.color = color
+        self.theme = {**DEFAULT_THEME, **(theme or {})}
+        self._theme_key = make_theme_key(self.theme)
+        self._codes = get_ansi_codes(self.theme) if color else None
+
+    def settings(self) -> Tuple:
+        return super().settings() + (self.color, self._theme_key)
+
+    def iter_format(self, content: str) -> Iterator[str]:
+        """Same as Formatter.iter_format(), without a call per line to
+        render() and arrange(), which take most of the time otherwise.
+        """
+        if self.start_with_new_line:
+            yield "\n"
+        yield from self._render_lines(
+            content.strip().split("\n"), " " * self.indent_spaces
+        )
+
+    def iter_format_page(self, page: Page) -> Iterator[str]:
+        """Same as iter_format(), with lines taken from the parsed page.
+
+        Output is the same for pages following the format, whose parts are
+        separated by one blank line.
+        """
+        if self.start_with_new_line:
+            yield "\n"
+        yield from self._render_tokens(page.iter_lines(), " " * self.indent_spaces)
+
     def render(self, line: str) -> str:
-        # Remove token syntax symbols, check style guide for tldr pages
-        # TODO: highlight tokens
-        for sym in ("{{", "}}", "`"):
-            line = line.replace(sym, "")
-
-        # Render markdown texts
-        if not line:
-            pass
-        elif line[0] == "#":
-            line = style(line[2:], bold=True, fg="red")
-        elif line[0] == ">":
-            line = line[2:].replace("<", "").replace(">", "")
-            line = style(line, fg="yellow", underline=True)
-        elif line[0] == "-":
-            line = style("\u2022" + line[1:], fg="green")
-        else:
-            line = style("  " + line, fg="magenta")
-        return super().render(line)
+        return "".join(self._render_lines([line], ""))
+
+    def _render_lines(self, lines: Iterable[str], indent: str) -> Iterator[str]:
+        if self._codes is None:
+            return self._render_plain(lines, indent)
+        return self._render_tokens(
+            (tokenize_line(line.strip()) for line in lines), indent
+        )
+
+    def _render_plain(self, lines: Iterable[str], indent: str) -> Iterator[str]:
+        """Same as _render_tokens() without color, lines are stripped of
+        syntax symbols as they are, with no spans built.
+        """
+        code_indent = f"{indent}  "
+        for line in lines:
+            kind, text = strip_line(line.strip())
+            if kind == BLANK or kind == CODE and not text:
+                yield "\n"
+            elif kind == CODE:
+                yield f"{code_indent}{text}\n"
+            elif kind == EXAMPLE:
+                yield f"{indent}• {text}\n"
+            else:
+                yield f"{indent}{text}\n"
+
+    def _render_tokens(
+        self, tokens: Iterable[Tuple[str, List]], indent: str
+    ) -> Iterator[str]:
+        codes = self._codes
+        code_indent = f"{indent}  "
+        for kind, spans in tokens:
+            if not spans:
+                yield "\n"
+                continue
+            if kind == EXAMPLE:
+                spans = [(EXAMPLE, f"• {spans[0][1]}")]
+            if codes is None:
+                text = (
+                    spans[0][1] if len(spans) == 1 else "".join([t for _, t in spans])
+                )
+            elif len(spans) == 1:
+                text = f"{codes[kind]}{spans[0][1]}{ANSI_RESET}"
+            else:
+                text = "".join(
+                    [f"{codes[span]}{text}{ANSI_RESET}" for span, text in spans if text]
+                )
+            yield f"{code_indent if kind == CODE else indent}{text}\n"
+
+
+class JSONFormatter(Formatter):
+    """JSONFormatter renders a page as one line of JSON, see Page.to_dict().
+
+    Pages are parsed by `parse`, e.g. PageCache.get_parsed() which keeps
+    them parsed, syntax.parse_page() otherwise. Indent and new lines do not
+    apply, so that output of many pages stays one page per line.
+    """
+
+    def __init__(self, *, parse: Callable[[str], Page] = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.parse = parse or parse_page
+
+    def iter_format(self, content: str) -> Iterator[str]:
+        return self.iter_format_page(self.parse(content))
+
+    def iter_format_page(self, page: Page) -> Iterator[str]:
+        yield json.dumps(page.to_dict(), ensure_ascii=False) + "\n"
+
+
+_ansi_codes: Dict[Tuple, Dict[str, str]] = {}
+
+
+def make_theme_key(theme: Dict[str, Dict]) -> Tuple:
+    return tuple(
+        sorted((kind, tuple(sorted(styles.items()))) for kind, styles in theme.items())
+    )
+
+
+def get_ansi_codes(theme: Dict[str, Dict]) -> Dict[str, str]:
+    """ANSI sequences starting styles of the theme, computed once per theme."""
+    key = make_theme_key(theme)
+    codes = _ansi_codes.get(key)
+    if codes is None:
+        codes = _ansi_codes[key] = {
+            kind: style("", **styles)[: -len(ANSI_RESET)]
+            for kind, styles in theme.items()
+        }
+    return codes
@@ -1,17 +1,20 @@
 import platform as platform_
 from os import environ
-from typing import Dict, List
+from typing import Dict, List, Mapping
 
 
 def parse_command(commands: List[str]) -> str:
     return "-".join(commands).lower()
 
 
-def parse_language(language: str, config: Dict) -> List[str]:
+def parse_language(
+    language: str, config: Dict, env: Mapping[str, str] = None
+) -> List[str]:
     """Return language list for page matching.
 
     If language is specified or configured, use it as only choice.
-    Otherwise make the list based on env `LANG` and `LANGUAGE`.
+    Otherwise make the list based on env `LANG` and `LANGUAGE`, which are
+    read from `env` if given instead of `os.environ`.
     # pylint: disable=line-too-long
     For detailed logic, see https://github.com/tldr-pages/tldr/blob/main/CLIENT-SPECIFICATION.md#language
     """  # noqa: E501
@@ -26,10 +29,11 @@ def parse_language(language: str, config: Dict) -> List[str]:
     def extract(x: str) -> str:
         return x.split("_", maxsplit=1)[0].lower()
 
-    lang = extract(environ.get("LC_ALL", "") or environ.get("LANG", ""))
+    env = environ if env is None else env
+    lang = extract(env.get("LC_ALL", "") or env.get("LANG", ""))
     if not lang:
         return ["en"]
-    languages = [item for item in environ.get("LANGUAGE", "").split(":") if item]
+    languages = [item for item in env.get("LANGUAGE", "").split(":") if item]
     if lang not in languages:
         languages.append(lang)
     if "en" not in languages:
@@ -0,0 +1,205 @@
+import re
+import struct
+from collections import defaultdict
+from math import log
+from pathlib import Path as LibPath
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .index import Table, write_table
+
+# Posting record: document id, weighted term frequency
+POSTING = struct.Struct("<IH")
+MAX_FREQUENCY = 2**16 - 1
+
+# Terms in command names weigh the most, then descriptions, then the code
+WEIGHT_NAME = 4
+WEIGHT_DESCRIPTION = 2
+WEIGHT_CODE = 1
+# Score ratio of a term matched only as prefix of an indexed one
+PREFIX_RATIO = 0.5
+MIN_PREFIX_LENGTH = 3
+# Term frequency saturation as in BM25
+SATURATION = 1.2
+
+STOPWORDS = frozenset(
+    (
+        "a an and are as at be by can command do does for from how i in into "
+        "is it its my of on or that the this to what which with"
+    ).split()
+)
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def stem(term: str) -> str:
+    """Strip common English suffixes so that `compresses` meets `compress`."""
+    if len(term) <= 3:
+        return term
+    if term.endswith("ies"):
+        return term[:-3] + "y"
+    if term.endswith(("sses", "xes", "zes", "ches", "shes")):
+        return term[:-2]
+    if term.endswith("ing") and len(term) > 6:
+        return term[:-3]
+    if term.endswith("ed") and len(term) > 5:
+        return term[:-2]
+    if term.endswith("s") and not term.endswith(("ss", "us", "is")):
+        return term[:-1]
+    return term
+
+
+def tokenize(text: str) -> List[str]:
+    # `[c]reate` is how pages mark mnemonics
+    text = text.lower().replace("[", "").replace("]", "")
+    return [
+        stem(token)
+        for token in TOKEN_PATTERN.findall(text)
+        if token not in STOPWORDS and not token.isdigit()
+    ]
+
+
+def parse_page(name: str, content: str) -> Tuple[str, Dict[str, int]]:
+    """Return description and weighted frequencies of terms in a page."""
+    frequencies = defaultdict(int)
+    description = []
+    for term in tokenize(name.replace("-", " ")) + [name.lower()]:
+        frequencies[term] += WEIGHT_NAME
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith(">"):
+            line = line[1:].strip()
+            if line.startswith("More information"):
+                continue
+            description.append(line)
+            weight = WEIGHT_DESCRIPTION
+        elif line.startswith("-"):
+            line = line[1:]
+            weight = WEIGHT_DESCRIPTION
+        elif line.startswith("`"):
+            line = line.replace("{{", " ").replace("}}", " ")
+            weight = WEIGHT_CODE
+        else:
+            continue
+        for term in tokenize(line):
+            frequencies[term] += weight
+    return " ".join(description), frequencies
+
+
+def make_doc_key(language: str, platform: str, name: str) -> str:
+    return f"{language}/{platform}/{name}"
+
+
+def build_text_index(
+    pages: Iterable[Tuple[str, str, str, str]],
+    terms_file: LibPath,
+    docs_file: LibPath,
+) -> int:
+    """Build an inverted index over (language, platform, name, content) pages.
+
+    Two tables are written: documents keyed by `language/platform/name`
+    with descriptions as values, whose positions serve as document ids,
+    and terms with postings of document ids and weighted frequencies.
+    Returns number of documents indexed.
+    """
+    parsed = {}
+    for language, platform, name, content in pages:
+        parsed[make_doc_key(language, platform, name)] = parse_page(name, content)
+    doc_keys = sorted(parsed, key=lambda key: key.encode("utf8"))
+    postings = defaultdict(list)
+    for doc_id, doc_key in enumerate(doc_keys):
+        for term, frequency in parsed[doc_key][1].items():
+            postings[term].append(POSTING.pack(doc_id, min(frequency, MAX_FREQUENCY)))
+    write_table(
+        docs_file,
+        ((doc_key, parsed[doc_key][0].encode("utf8")) for doc_key in doc_keys),
+    )
+    write_table(
+        terms_file, ((term, b"".join(items)) for term, items in postings.items())
+    )
+    return len(doc_keys)
+
+
+class SearchResult(NamedTuple):
+    name: str
+    platform: str
+    language: str
+    description: str
+    score: float
+
+
+class TextIndex:
+    """TextIndex answers full-text queries from tables of build_text_index().
+
+    Only postings of the query terms are read, plus the documents ranked
+    on top, so a query does not depend on the number of pages.
+    """
+
+    def __init__(self, terms_file: LibPath, docs_file: LibPath):
+        self._terms = Table(terms_file)
+        self._docs = Table(docs_file)
+
+    def _score_term(self, term: str, scores: Dict[int, float]) -> None:
+        matches = [(term, self._terms.get(term), 1.0)]
+        if len(term) >= MIN_PREFIX_LENGTH:
+            matches += [
+                (key, value, PREFIX_RATIO)
+                for key, value in self._terms.prefix(term)
+                if key != term
+            ]
+        total = len(self._docs)
+        best = {}
+        for _, data, ratio in matches:
+            if not data:
+                continue
+            idf = log(1 + total / (len(data) // POSTING.size))
+            for doc_id, frequency in POSTING.iter_unpack(data):
+                tf = frequency * (SATURATION + 1) / (frequency + SATURATION)
+                best[doc_id] = max(best.get(doc_id, 0), ratio * tf * idf)
+        for doc_id, score in best.items():
+            scores[doc_id] = scores.get(doc_id, 0) + score
+
+    def search(
+        self,
+        query: str,
+        platform: str = "",
+        languages: List[str] = None,
+        limit: int = 10,
+    ) -> List[SearchResult]:
+        """Rank pages by relevance to the query.
+
+        Pages are limited to the platform (plus `common`) and languages
+        if given. A command shows up once, in its best ranked page.
+        """
+        scores = {}
+        for term in dict.fromkeys(tokenize(query)):
+            self._score_term(term, scores)
+        results, seen = [], set()
+        for doc_id in sorted(scores, key=lambda i: (-scores[i], i)):
+            doc_key, description = self._docs.item(doc_id)
+            language, pf, name = doc_key.split("/", 2)
+            if platform and pf not in (platform, "common"):
+                continue
+            if languages and language not in languages:
+                continue
+            if name in seen:
+                continue
+            seen.add(name)
+            results.append(
+                SearchResult(
+                    name, pf, language, description.decode("utf8"), scores[doc_id]
+                )
+            )
+            if len(results) >= limit:
+                break
+        return results
+
+    def close(self) -> None:
+        self._terms.close()
+        self._docs.close()
+
+
+def open_text_index(terms_file: LibPath, docs_file: LibPath) -> Optional[TextIndex]:
+    """Open the index if it's been built, otherwise return None."""
+    try:
+        return TextIndex(terms_file, docs_file)
+    except (OSError, ValueError):
+        return None
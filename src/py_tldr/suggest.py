@@ -0,0 +1,108 @@
+import struct
+from collections import defaultdict
+from pathlib import Path as LibPath
+from typing import Callable, Iterable, List, Optional, Set
+
+from .index import Table, write_table
+
+GRAM_SIZE = 3
+# Names are padded so that short ones and their edges still make grams
+PADDING = "$" * (GRAM_SIZE - 1)
+# Posting record: position of the name in the command index, its length
+POSTING = struct.Struct("<IB")
+MAX_LENGTH = 2**8 - 1
+# Candidates sharing most grams with the query, whose distances are computed
+MAX_CANDIDATES = 200
+
+
+def make_grams(name: str) -> Set[str]:
+    padded = f"{PADDING}{name}{PADDING}"
+    return {padded[i : i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, i.e. Levenshtein with transpositions.
+
+    Returns limit + 1 as soon as the distance is known to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def max_distance(name: str) -> int:
+    """Typos allowed, one more for every six characters up to three."""
+    return min(3, 1 + len(name) // 6)
+
+
+def build_ngram_index(names: Iterable[str], path: LibPath) -> None:
+    """Map grams to positions of names, which are sorted as in write_table."""
+    postings = defaultdict(list)
+    for i, name in enumerate(sorted(names, key=lambda name: name.encode("utf8"))):
+        for gram in make_grams(name):
+            postings[gram].append(POSTING.pack(i, min(len(name), MAX_LENGTH)))
+    write_table(path, ((gram, b"".join(items)) for gram, items in postings.items()))
+
+
+class NgramIndex:
+    """NgramIndex finds names similar to a misspelled one.
+
+    Names of similar lengths sharing enough grams with the query are
+    candidates, only the ones sharing most are compared by edit distance.
+
+    Attributes:
+        get_name: Returns the name at a position, e.g. CommandIndex.name_at.
+    """
+
+    def __init__(self, path: LibPath, get_name: Callable[[int], str]):
+        self._table = Table(path)
+        self.get_name = get_name
+
+    def suggest(self, name: str, limit: int = 5) -> List[str]:
+        """Return similar names, closest first."""
+        grams = make_grams(name)
+        distance_limit = max_distance(name)
+        counts = defaultdict(int)
+        for gram in grams:
+            for i, length in POSTING.iter_unpack(self._table.get(gram) or b""):
+                if abs(length - len(name)) <= distance_limit:
+                    counts[i] += 1
+        # A typo changes at most GRAM_SIZE + 1 grams (transpositions), names
+        # sharing less cannot be within the distance limit
+        min_count = len(grams) - distance_limit * (GRAM_SIZE + 1)
+        candidates = []
+        for i in sorted(counts, key=lambda i: -counts[i])[:MAX_CANDIDATES]:
+            if counts[i] < min_count:
+                break
+            candidate = self.get_name(i)
+            if candidate == name:
+                continue
+            distance = edit_distance(name, candidate, distance_limit)
+            if distance <= distance_limit:
+                candidates.append((distance, -counts[i], candidate))
+        return [candidate for *_, candidate in sorted(candidates)[:limit]]
+
+    def close(self) -> None:
+        self._table.close()
+
+
+def open_ngram_index(
+    path: LibPath, get_name: Callable[[int], str]
+) -> Optional[NgramIndex]:
+    """Open the index if it's been built, otherwise return None."""
+    try:
+        return NgramIndex(path, get_name)
+    except (OSError, ValueError):
+        return None
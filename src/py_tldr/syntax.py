@@ -0,0 +1,236 @@
+from typing import Dict, Iterator, List, Tuple
+
+# Kinds of lines in a page, also of spans within them
+TITLE = "title"
+DESCRIPTION = "description"
+EXAMPLE = "example"
+CODE = "code"
+PLACEHOLDER = "placeholder"
+BLANK = "blank"
+
+Span = Tuple[str, str]
+
+
+def split_placeholders(text: str) -> List[Span]:
+    """Split code into spans of CODE and PLACEHOLDER, braces removed.
+
+    The text is scanned once, an opening `{{` without a closing one is
+    kept as code.
+    """
+    spans = []
+    start = 0
+    while True:
+        opening = text.find("{{", start)
+        if opening < 0:
+            break
+        closing = text.find("}}", opening + 2)
+        if closing < 0:
+            break
+        # Placeholders such as `{{{a,b}}}` keep braces of their own
+        while text.startswith("}", closing + 2):
+            closing += 1
+        if opening > start:
+            spans.append((CODE, text[start:opening]))
+        spans.append((PLACEHOLDER, text[opening + 2 : closing]))
+        start = closing + 2
+    if start < len(text):
+        spans.append((CODE, text[start:]))
+    return spans
+
+
+def strip_placeholders(text: str) -> str:
+    """Same as split_placeholders() with spans joined, without building them."""
+    if "{{" not in text:
+        return text
+    pieces = []
+    start = 0
+    while True:
+        opening = text.find("{{", start)
+        if opening < 0:
+            break
+        closing = text.find("}}", opening + 2)
+        if closing < 0:
+            break
+        while text.startswith("}", closing + 2):
+            closing += 1
+        pieces.append(text[start:opening])
+        pieces.append(text[opening + 2 : closing])
+        start = closing + 2
+    pieces.append(text[start:])
+    return "".join(pieces)
+
+
+def tokenize_line(line: str) -> Tuple[str, List[Span]]:
+    """Return kind of a stripped line of a page and spans of its text.
+
+    Syntax symbols are removed: `#`, `>` and `-` markers, backticks around
+    code, angle brackets around links and braces of placeholders. Only code
+    lines are split into spans, others come as one span of their kind.
+    """
+    if not line:
+        return BLANK, []
+    marker = line[0]
+    if marker == "#":
+        return TITLE, [(TITLE, strip_braces(line[2:]))]
+    if marker == ">":
+        text = line[2:].replace("<", "").replace(">", "").replace("`", "")
+        return DESCRIPTION, [(DESCRIPTION, strip_braces(text))]
+    if marker == "-":
+        text = line[1:].strip().replace("`", "")
+        return EXAMPLE, [(EXAMPLE, strip_braces(text))]
+    if marker == "`" and line[-1] == "`":
+        line = line[1:-1]
+    return CODE, split_placeholders(line)
+
+
+def strip_line(line: str) -> Tuple[str, str]:
+    """Same as tokenize_line() with spans joined, for plain text."""
+    if not line:
+        return BLANK, ""
+    marker = line[0]
+    if marker == "#":
+        return TITLE, strip_braces(line[2:])
+    if marker == ">":
+        text = line[2:].replace("<", "").replace(">", "").replace("`", "")
+        return DESCRIPTION, strip_braces(text)
+    if marker == "-":
+        return EXAMPLE, strip_braces(line[1:].strip().replace("`", ""))
+    if marker == "`" and line[-1] == "`":
+        line = line[1:-1]
+    return CODE, strip_placeholders(line)
+
+
+def strip_braces(text: str) -> str:
+    if "{{" not in text:
+        return text
+    return text.replace("{{", "").replace("}}", "")
+
+
+class Example:
+    """One example of a page, description along with tokens of its code."""
+
+    __slots__ = ("description", "tokens")
+
+    def __init__(self, description: str, tokens: List[Span] = None):
+        self.description = description
+        self.tokens = tokens or []
+
+    @property
+    def command(self) -> str:
+        """Code of the example as plain text, placeholders included."""
+        return "".join([text for _, text in self.tokens])
+
+    @property
+    def placeholders(self) -> List[str]:
+        return [text for kind, text in self.tokens if kind == PLACEHOLDER]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Example):
+            return NotImplemented
+        return (self.description, self.tokens) == (other.description, other.tokens)
+
+    def __repr__(self) -> str:
+        return f"Example({self.description!r}, {self.tokens!r})"
+
+
+class Page:
+    """Parsed page, see parse_page().
+
+    Attributes:
+        title: Name of the command, e.g. `tar`.
+        description: Lines of the description, links included.
+        examples: Examples in the order they appear.
+    """
+
+    __slots__ = ("title", "description", "examples")
+
+    def __init__(
+        self,
+        title: str = "",
+        description: List[str] = None,
+        examples: List[Example] = None,
+    ):
+        self.title = title
+        self.description = description or []
+        self.examples = examples or []
+
+    def iter_lines(self) -> Iterator[Tuple[str, List[Span]]]:
+        """Yield lines as tokenize_line() does, laid out as a page.
+
+        The title, the description and every example are separated by
+        blank lines.
+        """
+        yield TITLE, [(TITLE, self.title)]
+        if self.description:
+            yield BLANK, []
+            for line in self.description:
+                yield DESCRIPTION, [(DESCRIPTION, line)]
+        for example in self.examples:
+            yield BLANK, []
+            yield EXAMPLE, [(EXAMPLE, example.description)]
+            if example.tokens:
+                yield BLANK, []
+                yield CODE, example.tokens
+
+    def to_dict(self) -> Dict:
+        """A JSON serializable form, tokens as [kind, text] pairs."""
+        return {
+            "title": self.title,
+            "description": self.description,
+            "examples": [
+                {
+                    "description": example.description,
+                    "command": example.command,
+                    "tokens": [list(token) for token in example.tokens],
+                }
+                for example in self.examples
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Page":
+        return cls(
+            data["title"],
+            data["description"],
+            [
+                Example(
+                    example["description"],
+                    [tuple(token) for token in example["tokens"]],
+                )
+                for example in data["examples"]
+            ],
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Page):
+            return NotImplemented
+        return (self.title, self.description, self.examples) == (
+            other.title,
+            other.description,
+            other.examples,
+        )
+
+    def __repr__(self) -> str:
+        return f"Page({self.title!r}, {len(self.examples)} examples)"
+
+
+def parse_page(content: str) -> Page:
+    """Parse a page in one pass, with lines tokenized by tokenize_line().
+
+    Code without an example before it gets one with an empty description,
+    so that nothing is dropped from pages not following the format.
+    """
+    page = Page()
+    for line in content.split("\n"):
+        kind, spans = tokenize_line(line.strip())
+        if kind == CODE:
+            if not page.examples or page.examples[-1].tokens:
+                page.examples.append(Example(""))
+            page.examples[-1].tokens = spans
+        elif kind == EXAMPLE:
+            page.examples.append(Example(spans[0][1]))
+        elif kind == DESCRIPTION:
+            page.description.append(spans[0][1])
+        elif kind == TITLE and not page.title:
+            page.title = spans[0][1]
+    return page
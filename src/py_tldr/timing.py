@@ -0,0 +1,104 @@
+import sys
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, List, TextIO
+
+# Called with name of the phase and seconds taken, see add_hook()
+Hook = Callable[[str, float], None]
+
+_hooks: List[Hook] = []
+
+
+def add_hook(hook: Hook) -> None:
+    """Have hook called once a phase timed by timed() ends.
+
+    Phases nest, e.g. `cache.read` happens within `find`, so a phase's
+    time includes those of its inner ones.
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    _hooks.remove(hook)
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, *args) -> None:
+        elapsed = perf_counter() - self.start
+        for hook in _hooks:
+            hook(self.name, elapsed)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *args) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(name: str):
+    """Context manager timing a phase, reported to hooks.
+
+    Without hooks, a shared no-op is returned so that timing costs a
+    function call only.
+    """
+    return _Timer(name) if _hooks else _NULL_TIMER
+
+
+class Timings:
+    """Timings collects phases as a hook, and reports totals of them.
+
+    Phases are kept in the order they first end, with count of times run.
+    Pages fetched concurrently report from threads, hence the lock.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, List[float]] = {}
+        self._start = perf_counter()
+        self._lock = Lock()
+
+    def __call__(self, name: str, seconds: float) -> None:
+        with self._lock:
+            phase = self.phases.setdefault(name, [0, 0.0])
+            phase[0] += 1
+            phase[1] += seconds
+
+    def as_dict(self) -> Dict:
+        return {
+            "total_ms": (perf_counter() - self._start) * 1000,
+            "phases": [
+                {"name": name, "count": count, "ms": seconds * 1000}
+                for name, (count, seconds) in self.phases.items()
+            ],
+        }
+
+    def report(self, as_json: bool = False, file: TextIO = None) -> None:
+        """Print timings, to stderr unless file is given."""
+        file = file or sys.stderr
+        data = self.as_dict()
+        if as_json:
+            import json
+
+            print(json.dumps(data), file=file)
+            return
+        print(f"{'phase':<20}{'count':>6}{'ms':>10}", file=file)
+        for phase in data["phases"]:
+            print(
+                f"{phase['name']:<20}{phase['count']:>6}{phase['ms']:>10.2f}",
+                file=file,
+            )
+        print(f"{'total':<20}{'':>6}{data['total_ms']:>10.2f}", file=file)
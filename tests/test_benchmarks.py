@@ -0,0 +1,36 @@
+import json
+
+from benchmarks.generate import generate
+from benchmarks.run import compare, main, run
+
+
+def test_generate(tmp_path):
+    tree = generate(tmp_path, 40, 2, 2)
+    assert len(tree["names"]) == 40
+    assert tree["platforms"]["git"] == "common"
+    assert tree["pages"] == len(list(tmp_path.glob("pages*/*/*.md")))
+    with open(tmp_path / "assets" / "index.json") as f:
+        assert len(json.load(f)["commands"]) == 40
+
+
+def test_run(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    main(["--commands", "20", "--repeat", "1", "-s", "find", "-o", str(output)])
+    with open(output) as f:
+        results = json.load(f)
+    assert results["meta"]["commands"] == 20
+    assert [result["name"] for result in results["results"]] == [
+        "find[cold]",
+        "find[warm]",
+        "find[stale]",
+    ]
+    assert "find[warm]" in capsys.readouterr().out
+
+
+def test_compare():
+    results = run(20, 1, 1, 1, scenarios=["format"])
+    baseline = json.loads(json.dumps(results))
+    baseline["results"][0]["median_ms"] *= 2
+    ratios = compare(results, baseline)
+    assert ratios["format[color]"] == 0.5
+    assert ratios["format[plain]"] == 1
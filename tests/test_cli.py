@@ -1,10 +1,14 @@
+import json
+from copy import deepcopy
 from os import environ
+from time import monotonic, sleep, time
 
 import pytest
 import toml
 
-from py_tldr import core
+from py_tldr import core, timing
 from py_tldr.core import DEFAULT_CONFIG_EDITOR, DEFAULT_CONFIG_FILE, cli
+from py_tldr.index import CommandIndex
 from py_tldr.page import DownloadError
 
 
@@ -29,6 +33,17 @@ class TestConfig:
         assert config["page_source"] == config_customed["page_source"]
         assert config["cache"] == config_customed["cache"]
 
+    def test_cache_table_without_hard_timeout(self, tmp_path, mocker):
+        config_file = tmp_path / "config.toml"
+        self._make_config_file(
+            config_file,
+            {"cache": {"timeout": 1, "download_url": "https://example.com/tldr.zip"}},
+        )
+        mocker.patch.object(core, "DEFAULT_CONFIG_FILE", config_file)
+        page_finder = core.make_page_finder(core.setup_config())
+        assert page_finder.cache.timeout == 1
+        assert page_finder.cache.hard_timeout == core.DEFAULT_CACHE_HARD_HOURS
+
     @pytest.mark.parametrize(
         "config", ({"page_source": ""}, {"cache": ""}, {"cache": {"enabled": True}})
     )
@@ -40,6 +55,28 @@ class TestConfig:
             core.setup_config()
 
 
+@pytest.mark.parametrize(
+    "languages, extra, synced",
+    (
+        [["en"], [], ["en"]],
+        [["zh", "en"], [], ["zh", "en"]],
+        [["zh", "en"], ["en", "zh_TW"], ["zh", "en", "zh_TW"]],
+    ),
+)
+def test_languages_to_sync(languages, extra, synced):
+    config = {"cache": {"languages": extra}}
+    assert core.languages_to_sync(languages, config) == synced
+
+
+def test_network_config():
+    config = {"proxy_url": "", "network": {"timeout": 5, "retries": 1}}
+    client = core.make_http_client(config)
+    assert client.timeout == 5
+    assert client.stream_timeout == (5, 10)
+    assert client.retries == 1
+    assert client.pool_size == 10
+
+
 class TestEditConfig:
     def test_create_default_config(self, tmp_path, mocker, runner):
         config_file = tmp_path / "config.toml"
@@ -84,6 +121,247 @@ class TestCommand:
         assert "tldr" in result.output
         patched_update.assert_called_once()
 
+    def test_cache_hit(self, mocker, runner):
+        mocker.patch("py_tldr.page.PageFinder.find_cached", return_value="# tldr")
+        patched_find = mocker.patch("py_tldr.page.PageFinder.find")
+        patched_spinner = mocker.patch("py_tldr.core.spinner")
+        result = runner.invoke(cli, ["tldr"])
+        assert result.exit_code == 0
+        assert "tldr" in result.output
+        patched_find.assert_not_called()
+        patched_spinner.assert_not_called()
+
+    def test_revalidate_after_shown(self, mocker, runner):
+        mocker.patch("py_tldr.page.PageFinder.find_cached", return_value="# tldr")
+        patched_revalidate = mocker.patch("py_tldr.page.PageFinder.revalidate")
+        result = runner.invoke(cli, ["tldr"])
+        assert result.exit_code == 0
+        patched_revalidate.assert_called_once()
+
+
+class TestStaleCache:
+    @pytest.fixture(autouse=True)
+    def cache(self, tmp_path, mocker):
+        mocker.patch.object(core, "DEFAULT_CONFIG_FILE", tmp_path / "config.toml")
+        mocker.patch.object(core, "DEFAULT_CACHE_DIR", tmp_path / "cache")
+        mocker.patch.object(core, "DEFAULT_SOCKET_FILE", tmp_path / "daemon.sock")
+        cache = core.make_page_finder().cache
+        cache.set("tar", "common", "# tar")
+        CommandIndex.write(cache.index_table_file, {"tar": {"common": ["en"]}})
+        fetched = time() - 48 * 3600
+        cache.manifest.update(
+            {
+                "index.bin": {"fetched": fetched},
+                "pages/common/tar.md": {"fetched": fetched},
+            }
+        )
+        return cache
+
+    def test_offline(self, mocker, runner):
+        def download_data(*args, **kwargs):
+            sleep(5)
+            raise DownloadError()
+
+        patched_download = mocker.patch(
+            "py_tldr.page.download_data", side_effect=download_data
+        )
+        start = monotonic()
+        result = runner.invoke(cli, ["tar"])
+        assert result.exit_code == 0
+        assert "tar" in result.output
+        assert monotonic() - start < core.DEFAULT_REVALIDATE_TIMEOUT + 1
+        # Not tried again right after it failed
+        result = runner.invoke(cli, ["tar"])
+        assert result.exit_code == 0
+        patched_download.assert_called_once()
+
+
+class TestTimings:
+    def test_flag(self, mocker, runner):
+        mocker.patch("py_tldr.page.PageFinder.find_cached", return_value="# tldr")
+        result = runner.invoke(cli, ["--timings", "tldr"])
+        assert result.exit_code == 0
+        assert "config" in result.output
+        assert "format" in result.output
+        assert timing._hooks == []
+
+    def test_json(self, mocker, runner):
+        mocker.patch("py_tldr.page.PageFinder.find_cached", return_value="")
+        mocker.patch("py_tldr.page.PageFinder.find", return_value="")
+        mocker.patch("py_tldr.page.PageFinder.suggest", return_value=[])
+        result = runner.invoke(cli, ["tldr"], env={"TLDR_PROFILE": "json"})
+        assert result.exit_code == 1
+        data = json.loads(result.output.splitlines()[-1])
+        assert [phase["name"] for phase in data["phases"]][:2] == ["daemon", "config"]
+
+
+class TestBatch:
+    patch_path_find_many = "py_tldr.page.PageFinder.find_many"
+
+    def test_arguments(self, mocker, runner):
+        patched_find_many = mocker.patch(
+            self.patch_path_find_many,
+            return_value=[("tar", "# tar"), ("git-commit", "# git commit")],
+        )
+        result = runner.invoke(cli, ["--batch", "-p", "linux", "tar", "git commit"])
+        assert result.exit_code == 0
+        assert "tar" in result.output
+        assert "git commit" in result.output
+        names = patched_find_many.call_args[0][0]
+        assert list(names) == ["tar", "git-commit"]
+
+    def test_stdin(self, mocker, runner):
+        patched_find_many = mocker.patch(
+            self.patch_path_find_many, return_value=[("tar", "# tar")]
+        )
+        result = runner.invoke(cli, ["--batch"], input="tar\n\nGit Commit\n")
+        assert result.exit_code == 0
+        names = patched_find_many.call_args[0][0]
+        assert list(names) == ["tar", "git-commit"]
+
+    def test_missing(self, mocker, runner):
+        mocker.patch(
+            self.patch_path_find_many,
+            return_value=[("tar", "# tar"), ("foo", ""), ("bar", None)],
+        )
+        result = runner.invoke(cli, ["--batch", "tar", "foo", "bar"])
+        assert result.exit_code == 1
+        assert "No result: foo" in result.output
+        assert "Search failed: bar" in result.output
+
+
+class TestFormat:
+    def test_json(self, tmp_path, mocker, runner):
+        mocker.patch.object(core, "DEFAULT_CACHE_DIR", tmp_path)
+        content = "# tar\n\n- Extract:\n\n`tar xf {{source.tar}}`"
+        core.make_page_finder().cache.set("tar", "common", content)
+        mocker.patch("py_tldr.page.PageFinder.find_cached", return_value=content)
+        result = runner.invoke(cli, ["--format", "json", "tar"])
+        assert result.exit_code == 0
+        # Messages go to stderr, which the runner mixes in
+        page = json.loads(result.output.splitlines()[-1])
+        assert page["title"] == "tar"
+        assert page["examples"][0]["command"] == "tar xf source.tar"
+        # Kept parsed in the cache
+        assert list((tmp_path / "parsed").glob("*.json"))
+
+    def test_json_cache_disabled(self, tmp_path, mocker):
+        mocker.patch.object(core, "DEFAULT_CACHE_DIR", tmp_path)
+        config = deepcopy(core.DEFAULT_CONFIG)
+        config["cache"]["enabled"] = False
+        page_finder = core.make_page_finder(config)
+        formatter = core.make_page_formatter(config, "json", page_finder)
+        formatter.format("# tar")
+        assert not (tmp_path / "parsed").exists()
+
+    def test_json_batch(self, mocker, runner):
+        mocker.patch(
+            "py_tldr.page.PageFinder.find_many",
+            return_value=[("tar", "# tar"), ("git-commit", "# git commit")],
+        )
+        result = runner.invoke(cli, ["--batch", "-f", "json", "tar", "git commit"])
+        assert result.exit_code == 0
+        lines = [line for line in result.output.splitlines() if line.startswith("{")]
+        assert [json.loads(line)["title"] for line in lines] == ["tar", "git commit"]
+
+    def test_plain(self, mocker, runner):
+        mocker.patch("py_tldr.page.PageFinder.find_cached", return_value="# tar")
+        result = runner.invoke(cli, ["--format", "plain", "tar"], color=True)
+        assert result.exit_code == 0
+        page = result.output.split("> Page found.")[-1]
+        assert page == "\n\n    tar\n\n"
+
+
+class TestSearch:
+    def test_found(self, mocker, runner):
+        from py_tldr.search import SearchResult
+
+        patched_search_text = mocker.patch(
+            "py_tldr.page.PageFinder.search_text",
+            return_value=[SearchResult("zip", "common", "en", "Compress files.", 1)],
+        )
+        result = runner.invoke(cli, ["--search", "-p", "linux", "compress", "dir"])
+        assert result.exit_code == 0
+        assert "zip (common): Compress files." in result.output
+        assert patched_search_text.call_args[0][:2] == ("compress dir", "linux")
+
+    def test_not_synced(self, tmp_path, mocker, runner):
+        mocker.patch.object(core, "DEFAULT_CACHE_DIR", tmp_path)
+        result = runner.invoke(cli, ["--search", "compress"])
+        assert result.exit_code == 1
+        assert "No result" in result.output
+        assert "--update" in result.output
+
+
+class TestCacheCommands:
+    def test_stats(self, tmp_path, mocker, runner):
+        mocker.patch.object(core, "DEFAULT_CACHE_DIR", tmp_path)
+        core.make_page_finder().cache.set("foo", "common", "# foo")
+        result = runner.invoke(cli, ["--cache-stats"])
+        assert result.exit_code == 0
+        assert f"Location: {tmp_path}" in result.output
+        assert "Entries: 1" in result.output
+        assert "Pages fetched: 1, 0.0 KB" in result.output
+
+    def test_prune(self, mocker, runner):
+        patched_prune = mocker.patch(
+            "py_tldr.page.PageCache.prune", return_value=(2, 2048)
+        )
+        result = runner.invoke(cli, ["--cache-prune"])
+        assert result.exit_code == 0
+        assert "Pruned 2 cache entries, 2.0 KB freed." in result.output
+        patched_prune.assert_called_once()
+
+    def test_caps_config(self):
+        config = deepcopy(core.DEFAULT_CONFIG)
+        config["cache"].update(max_size_mb=1.5, max_entries=100, eviction="lfu")
+        cache = core.make_page_finder(config).cache
+        assert cache.max_size == 1.5 * 1024 * 1024
+        assert cache.max_entries == 100
+        assert cache.eviction == "lfu"
+
+
+class TestDaemon:
+    @pytest.fixture(autouse=True)
+    def socket_file(self, tmp_path, mocker):
+        socket_file = tmp_path / "daemon.sock"
+        socket_file.touch()
+        mocker.patch.object(core, "DEFAULT_SOCKET_FILE", socket_file)
+
+    def test_found(self, mocker, runner):
+        patched_query = mocker.patch(
+            "py_tldr.daemon.query", return_value={"status": "found", "output": "tar"}
+        )
+        patched_setup_config = mocker.patch.object(core, "setup_config")
+        result = runner.invoke(cli, ["tar"])
+        assert result.exit_code == 0
+        assert "tar" in result.output
+        assert patched_query.call_args[0][1]["command"] == ["tar"]
+        patched_setup_config.assert_not_called()
+
+    def test_missing(self, mocker, runner):
+        mocker.patch(
+            "py_tldr.daemon.query",
+            return_value={"status": "missing", "suggestions": ["fop"]},
+        )
+        result = runner.invoke(cli, ["foo"])
+        assert result.exit_code == 1
+        assert "No result" in result.output
+        assert "Did you mean: fop?" in result.output
+
+    def test_fallback(self, mocker, runner):
+        mocker.patch("py_tldr.daemon.query", return_value=None)
+        mocker.patch("py_tldr.page.PageFinder.find_cached", return_value="# tar")
+        result = runner.invoke(cli, ["tar"])
+        assert result.exit_code == 0
+        assert "tar" in result.output
+
+    def test_serve(self, mocker, runner):
+        patched_serve = mocker.patch("py_tldr.daemon.serve")
+        result = runner.invoke(cli, ["--serve"])
+        assert result.exit_code == 0
+        patched_serve.assert_called_once()
+
 
 class TestFailure:
     def test_sync_fail(self, mocker, runner):
@@ -94,13 +372,23 @@ class TestFailure:
         assert "failed" in result.output
 
     def test_find_page_fail(self, mocker, runner):
+        mocker.patch("py_tldr.page.PageFinder.find_cached", return_value="")
         mocker.patch("py_tldr.page.PageFinder.find", side_effect=DownloadError)
         result = runner.invoke(cli, ["tldr"])
         assert result.exit_code == 1
         assert "failed" in result.output
 
     def test_no_pages_found(self, mocker, runner):
+        mocker.patch("py_tldr.page.PageFinder.find_cached", return_value="")
         mocker.patch("py_tldr.page.PageFinder.find", return_value="")
         result = runner.invoke(cli, ["non-existed-cmd"])
         assert result.exit_code == 1
         assert "No result" in result.output
+
+    def test_suggestions(self, mocker, runner):
+        mocker.patch("py_tldr.page.PageFinder.find_cached", return_value="")
+        mocker.patch("py_tldr.page.PageFinder.find", return_value="")
+        mocker.patch("py_tldr.page.PageFinder.suggest", return_value=["git", "gist"])
+        result = runner.invoke(cli, ["gti"])
+        assert result.exit_code == 1
+        assert "Did you mean: git, gist?" in result.output
@@ -0,0 +1,63 @@
+import subprocess
+import sys
+from os import environ
+
+# Budget for modules imported by the `tldr` entry point on top of a bare
+# interpreter, measured via `python -X importtime`. It's about 55ms locally,
+# most of which is `click`, so this leaves room for slower machines.
+IMPORT_BUDGET_US = 150_000
+ENTRY_POINT = "import py_tldr; py_tldr.cli"
+LAZY_MODULES = (
+    "requests",
+    "urllib3",
+    "yaspin",
+    "toml",
+    "importlib.metadata",
+    "logging.config",
+)
+
+
+def import_times(code, env=None):
+    """Return {module: self time in us} reported by `-X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+def entry_point_imports():
+    baseline = import_times("pass")
+    return {
+        name: us
+        for name, us in import_times(ENTRY_POINT).items()
+        if name not in baseline
+    }
+
+
+def test_lazy_imports():
+    imported = entry_point_imports()
+    assert "py_tldr.core" in imported
+    for module in LAZY_MODULES:
+        assert module not in imported
+
+
+def test_import_budget():
+    # Best of a few runs to smooth out noise
+    total = min(sum(entry_point_imports().values()) for _ in range(3))
+    assert total < IMPORT_BUDGET_US
+
+
+def test_no_filesystem_writes(tmp_path):
+    env = dict(environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+    import_times(ENTRY_POINT, env=env)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,148 @@
+import asyncio
+import io
+import json
+import time
+from zipfile import ZipFile
+
+import pytest
+
+from py_tldr.page import PageFinder
+
+aiohttp = pytest.importorskip("aiohttp")
+web = pytest.importorskip("aiohttp.web")
+
+from py_tldr.aio import AsyncPageFinder  # noqa: E402
+
+INDEX = {
+    "commands": [
+        {"name": "foo", "targets": [{"os": "linux", "language": "en"}]},
+        {"name": "bar", "targets": [{"os": "common", "language": "en"}]},
+    ]
+}
+
+
+def make_archive():
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as f:
+        f.writestr("pages/common/bar.md", "# bar")
+    return buffer.getvalue()
+
+
+class Server:
+    """Local server for pages, index and archive."""
+
+    def __init__(self):
+        self.requests = []
+        self.app = web.Application()
+        self.app.router.add_get("/{path:.*}", self.handle)
+
+    async def handle(self, request):
+        path = request.match_info["path"]
+        self.requests.append((path, dict(request.headers)))
+        if path == "pages/linux/foo.md":
+            return web.Response(text="# foo")
+        if path == "index.json":
+            if request.headers.get("If-None-Match") == '"index"':
+                return web.Response(status=304)
+            return web.Response(text=json.dumps(INDEX), headers={"ETag": '"index"'})
+        if path == "tldr.zip":
+            return web.Response(body=make_archive())
+        return web.Response(status=404)
+
+    async def __aenter__(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *args):
+        await self.runner.cleanup()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def patch_index_url(mocker):
+    def patch(url):
+        mocker.patch("py_tldr.aio.INDEX_URL", f"{url}/index.json")
+
+    return patch
+
+
+def test_find(tmp_path, patch_index_url):
+    async def main():
+        async with Server() as server:
+            patch_index_url(server.url)
+            finder = PageFinder(f"{server.url}/pages", 1, tmp_path, "")
+            async with AsyncPageFinder(finder) as async_finder:
+                results = await asyncio.gather(
+                    async_finder.find("foo", "linux", ["en"]),
+                    async_finder.find("qux", "linux", ["en"]),
+                )
+                assert results == ["# foo", ""]
+                # Served by cache this time
+                count = len(server.requests)
+                assert await async_finder.find("foo", "linux", ["en"]) == "# foo"
+                assert len(server.requests) == count
+
+    run(main())
+
+
+def test_not_found(tmp_path, patch_index_url):
+    async def main():
+        async with Server() as server:
+            patch_index_url(server.url)
+            finder = PageFinder(f"{server.url}/missing", 1, tmp_path, "")
+            async with AsyncPageFinder(finder) as async_finder:
+                assert await async_finder.find("foo", "linux", ["en"]) == ""
+
+    run(main())
+
+
+def test_sync(tmp_path, patch_index_url):
+    async def main():
+        async with Server() as server:
+            patch_index_url(server.url)
+            finder = PageFinder("", 1, tmp_path, f"{server.url}/tldr.zip")
+            async with AsyncPageFinder(finder) as async_finder:
+                await async_finder.sync(["en"])
+                assert finder.cache.get("bar", "common") == "# bar"
+                assert await async_finder.find("bar", "linux", ["en"]) == "# bar"
+                # The index comes from the archive
+                assert [path for path, _ in server.requests] == ["tldr.zip"]
+                await async_finder.update_index()
+                await async_finder.update_index()
+                path, headers = server.requests[-1]
+                assert path == "index.json"
+                assert headers["If-None-Match"] == '"index"'
+
+    run(main())
+
+
+def test_stale(tmp_path, patch_index_url):
+    async def main():
+        async with Server() as server:
+            patch_index_url(server.url)
+            finder = PageFinder(
+                f"{server.url}/pages", 1, tmp_path, "", cache_hard_timeout=24
+            )
+            async with AsyncPageFinder(finder) as async_finder:
+                await async_finder.update_index()
+                finder.cache.set("foo", "linux", "# old foo")
+                age_entry(finder.cache, "pages/linux/foo.md", 2)
+                count = len(server.requests)
+                assert await async_finder.find("foo", "linux", ["en"]) == "# old foo"
+                assert len(server.requests) == count
+            # Revalidated before closing
+            assert finder.cache.get("foo", "linux") == "# foo"
+
+    run(main())
+
+
+def age_entry(cache, key, hours):
+    cache.manifest.update({key: {"fetched": time.time() - hours * 3600}})
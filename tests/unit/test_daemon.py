@@ -0,0 +1,95 @@
+import socket
+import stat
+import threading
+
+import pytest
+
+from py_tldr.daemon import (
+    STATUS_ERROR,
+    STATUS_FOUND,
+    STATUS_MISSING,
+    STATUS_OK,
+    PageServer,
+    query,
+    serve,
+)
+from py_tldr.page import DownloadError, PageFinder
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Unix sockets not supported"
+)
+
+
+@pytest.fixture
+def server(tmp_path):
+    page_finder = PageFinder("", 1, tmp_path, "")
+    server = PageServer(tmp_path / "tldr.sock", page_finder, {})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_request(command, language="en"):
+    return {"command": command, "platform": "linux", "language": language, "env": {}}
+
+
+def test_ping(server):
+    assert query(server.server_address, {}) == {"status": STATUS_OK}
+
+
+def test_socket_private(server):
+    socket_file = server.page_finder.cache.location_base / "tldr.sock"
+    assert stat.S_IMODE(socket_file.stat().st_mode) == 0o600
+
+
+def test_found(server, mocker):
+    patched_find = mocker.patch.object(
+        server.page_finder, "find", return_value="# git commit"
+    )
+    response = query(server.server_address, make_request(["git", "commit"]))
+    assert response["status"] == STATUS_FOUND
+    assert "git commit" in response["output"]
+    patched_find.assert_called_once_with("git-commit", "linux", languages=["en"])
+    # Rendered page is kept in memory
+    assert query(server.server_address, make_request(["git", "commit"])) == response
+    patched_find.assert_called_once()
+
+
+def test_language_env(server, mocker):
+    patched_find = mocker.patch.object(server.page_finder, "find", return_value="#")
+    request = make_request(["tar"], language="")
+    request["env"] = {"LANG": "zh_CN.UTF-8"}
+    query(server.server_address, request)
+    patched_find.assert_called_once_with("tar", "linux", languages=["zh", "en"])
+
+
+def test_missing(server, mocker):
+    mocker.patch.object(server.page_finder, "find", return_value="")
+    mocker.patch.object(server.page_finder, "suggest", return_value=["fop"])
+    response = query(server.server_address, make_request(["foo"]))
+    assert response == {"status": STATUS_MISSING, "suggestions": ["fop"]}
+
+
+def test_error(server, mocker):
+    mocker.patch.object(server.page_finder, "find", side_effect=DownloadError)
+    response = query(server.server_address, make_request(["foo"]))
+    assert response == {"status": STATUS_ERROR}
+
+
+def test_index_changed(server, mocker):
+    patched_find = mocker.patch.object(server.page_finder, "find", return_value="#")
+    query(server.server_address, make_request(["tar"]))
+    server.page_finder.cache.index_table_file.write_bytes(b"")
+    query(server.server_address, make_request(["tar"]))
+    assert patched_find.call_count == 2
+
+
+def test_no_daemon(tmp_path):
+    assert query(tmp_path / "tldr.sock", {}) is None
+
+
+def test_serve_already_running(server):
+    with pytest.raises(RuntimeError):
+        serve(server.page_finder.cache.location_base / "tldr.sock", None, {})
@@ -1,6 +1,10 @@
+import io
+import json
+
 from click import style
 
-from py_tldr.page import Formatter, PageFormatter
+from py_tldr.page import Formatter, JSONFormatter, PageFormatter
+from py_tldr.syntax import parse_page
 
 
 def test_indent_space():
@@ -32,8 +36,148 @@ def test_format_page():
                 style("Foo", bold=True, fg="red"),
                 style("See Foo from https://foo.com", fg="yellow", underline=True),
                 style("\u2022 Basic usage", fg="green"),
-                style("  Foo bar", fg="magenta"),
+                "  " + style("Foo ", fg="magenta") + style("bar", fg="cyan"),
             ]
         )
         + "\n"
     )
+
+
+def test_format_placeholders():
+    formatted = PageFormatter(color=False).format(
+        "`tar cf {{target.tar}} {{{file1,file2}}}`"
+    )
+    assert formatted == "  tar cf target.tar {file1,file2}\n"
+
+
+def test_format_theme():
+    formatter = PageFormatter(theme={"placeholder": {"fg": "blue", "bold": True}})
+    assert formatter.format("`foo {{bar}}`") == (
+        "  " + style("foo ", fg="magenta") + style("bar", fg="blue", bold=True) + "\n"
+    )
+    assert formatter.settings() != PageFormatter().settings()
+
+
+def test_format_page_without_color():
+    formatted = PageFormatter(color=False).format("# Foo\n- Basic usage\n`foo`")
+    assert formatted == "Foo\n• Basic usage\n  foo\n"
+
+
+def test_format_reused():
+    formatter = Formatter()
+    assert formatter.format("foo") == "foo\n"
+    assert formatter.format("bar") == "bar\n"
+
+
+class TestStreaming:
+    content = "# Foo\n- Basic usage\n`foo`"
+
+    def test_iter_format(self):
+        formatter = PageFormatter(color=False, start_with_new_line=True)
+        lines = formatter.iter_format(self.content)
+        assert next(lines) == "\n"
+        assert next(lines) == "Foo\n"
+        assert list(lines) == ["• Basic usage\n", "  foo\n"]
+
+    def test_interleaved(self):
+        formatter = Formatter()
+        foo, bar = formatter.iter_format("foo\nfoo"), formatter.iter_format("bar")
+        assert [next(foo), next(bar), next(foo)] == ["foo\n", "bar\n", "foo\n"]
+
+    def test_write(self):
+        file = io.StringIO()
+        Formatter(indent_spaces=2).write("foo\nbar", file)
+        assert file.getvalue() == "  foo\n  bar\n"
+
+    def test_write_memoized(self, mocker):
+        PageFormatter.render_cache.clear()
+        file = mocker.Mock()
+        PageFormatter(color=False).write(self.content, file)
+        assert file.write.call_count == 3
+        file.reset_mock()
+        formatter = PageFormatter(color=False)
+        spied_render = mocker.spy(formatter, "render")
+        formatter.write(self.content, file)
+        file.write.assert_called_once_with("Foo\n• Basic usage\n  foo\n")
+        spied_render.assert_not_called()
+        assert formatter.format(self.content) == "Foo\n• Basic usage\n  foo\n"
+
+
+class TestRenderCache:
+    content = "# Foo\n- Basic usage\n`foo`"
+
+    def setup_method(self):
+        PageFormatter.render_cache.clear()
+
+    def test_memoized(self, mocker):
+        formatted = PageFormatter().format(self.content)
+        render = mocker.spy(PageFormatter, "render")
+        assert PageFormatter().format(self.content) == formatted
+        render.assert_not_called()
+
+    def test_keyed_on_settings(self):
+        formatted = PageFormatter().format(self.content)
+        assert PageFormatter(indent_spaces=2).format(self.content) != formatted
+        assert PageFormatter(color=False).format(self.content) != formatted
+        assert len(PageFormatter.render_cache) == 3
+
+    def test_persisted(self, mocker, tmp_path):
+        formatted = PageFormatter(cache_location=tmp_path).format(self.content)
+        assert len(list(tmp_path.iterdir())) == 1
+        PageFormatter.render_cache.clear()
+        render = mocker.spy(PageFormatter, "render")
+        assert PageFormatter(cache_location=tmp_path).format(self.content) == formatted
+        render.assert_not_called()
+
+    def test_persisted_pruned(self, mocker, tmp_path):
+        mocker.patch.object(PageFormatter.render_cache, "max_size", 2)
+        formatter = PageFormatter(cache_location=tmp_path)
+        for content in ("foo", "bar", "bat"):
+            formatter.format(content)
+        assert len(list(tmp_path.iterdir())) == 2
+
+
+class TestParsedPage:
+    content = "# Foo\n\n> Foo it.\n\n- Basic usage:\n\n`foo {{bar}}`\n"
+
+    def test_same_as_content(self):
+        for color in (True, False):
+            formatter = PageFormatter(
+                indent_spaces=4, start_with_new_line=True, color=color
+            )
+            assert "".join(
+                formatter.iter_format_page(parse_page(self.content))
+            ) == "".join(formatter.iter_format(self.content))
+
+    def test_base_formatter(self):
+        formatted = "".join(
+            Formatter(indent_spaces=2).iter_format_page(parse_page(self.content))
+        )
+        assert formatted == "  Foo\n\n  Foo it.\n\n  Basic usage:\n\n  foo bar\n"
+
+    def test_write_page(self):
+        file = io.StringIO()
+        PageFormatter(color=False).write_page(parse_page(self.content), file)
+        assert file.getvalue() == "Foo\n\nFoo it.\n\n• Basic usage:\n\n  foo bar\n"
+
+    def test_json(self):
+        formatted = JSONFormatter(indent_spaces=4).format(self.content)
+        assert formatted.endswith("}\n") and formatted.count("\n") == 1
+        assert json.loads(formatted) == {
+            "title": "Foo",
+            "description": ["Foo it."],
+            "examples": [
+                {
+                    "description": "Basic usage:",
+                    "command": "foo bar",
+                    "tokens": [["code", "foo "], ["placeholder", "bar"]],
+                }
+            ],
+        }
+
+    def test_json_parse(self, mocker):
+        parse = mocker.Mock(return_value=parse_page(self.content))
+        file = io.StringIO()
+        JSONFormatter(parse=parse).write(self.content, file)
+        parse.assert_called_once_with(self.content)
+        assert json.loads(file.getvalue())["title"] == "Foo"
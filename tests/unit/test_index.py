@@ -0,0 +1,65 @@
+import pytest
+
+from py_tldr.index import (
+    CommandIndex,
+    Table,
+    decode_targets,
+    encode_targets,
+    write_table,
+)
+
+
+def test_table(tmp_path):
+    path = tmp_path / "table.bin"
+    items = {"foo": b"1", "bar": b"", "你好": b"3", "foo-bar": b"4"}
+    write_table(path, items.items())
+    table = Table(path)
+    assert len(table) == len(items)
+    for key, value in items.items():
+        assert table.get(key) == value
+    assert table.get("baz") is None
+    assert list(table.keys()) == sorted(items, key=lambda x: x.encode("utf8"))
+    table.close()
+
+
+def test_empty_table(tmp_path):
+    path = tmp_path / "table.bin"
+    write_table(path, [])
+    assert Table(path).get("foo") is None
+
+
+def test_invalid_table(tmp_path):
+    path = tmp_path / "table.bin"
+    path.write_bytes(b"0" * 32)
+    with pytest.raises(ValueError):
+        Table(path)
+
+
+@pytest.mark.parametrize(
+    "targets",
+    ({}, {"linux": ["en"]}, {"linux": ["en", "zh_TW"], "common": ["en"]}),
+)
+def test_targets_codec(targets):
+    assert decode_targets(encode_targets(targets)) == targets
+
+
+def test_command_index(tmp_path):
+    path = tmp_path / "index.bin"
+    CommandIndex.write(path, {"tldr": {"linux": ["en"], "common": ["en", "zh"]}})
+    index = CommandIndex(path)
+    assert index.get("tldr") == {"linux": ["en"], "common": ["en", "zh"]}
+    assert list(index.get("tldr")) == ["linux", "common"]
+    assert index.get("foo") is None
+    assert "tldr" in index
+    assert list(index.names()) == ["tldr"]
+
+
+def test_table_prefix(tmp_path):
+    path = tmp_path / "table.bin"
+    write_table(path, [("foo", b"1"), ("foobar", b"2"), ("fop", b"3"), ("bar", b"")])
+    table = Table(path)
+    assert list(table.prefix("foo")) == [("foo", b"1"), ("foobar", b"2")]
+    assert list(table.prefix("x")) == []
+    assert table.item(0) == ("bar", b"")
+    with pytest.raises(IndexError):
+        table.item(4)
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from py_tldr.local import TreeScanner, get_local_path
+
+
+def make_tree(root, pages):
+    for member, content in pages.items():
+        page_file = root / member
+        page_file.parent.mkdir(parents=True, exist_ok=True)
+        page_file.write_text(content, encoding="utf8")
+
+
+def age_dirs(root):
+    """Make mtimes of dirs old enough to be trusted, see MTIME_GRANULARITY_NS."""
+    for item in root.rglob("*"):
+        if item.is_dir():
+            os.utime(item, (1, 1))
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    (
+        ("file:///opt/tldr/pages", "/opt/tldr/pages"),
+        ("file:///opt/my%20tldr/pages", "/opt/my tldr/pages"),
+        ("/opt/tldr/pages", "/opt/tldr/pages"),
+        ("https://example.com/pages", None),
+        ("", None),
+    ),
+)
+def test_get_local_path(source, expected):
+    path = get_local_path(source)
+    assert (str(path) if path else None) == expected
+
+
+def test_get_local_path_checkout(tmp_path):
+    (tmp_path / "pages").mkdir()
+    assert get_local_path(str(tmp_path)) == tmp_path / "pages"
+    assert get_local_path(f"file://{tmp_path}") == tmp_path / "pages"
+
+
+class TestTreeScanner:
+    pages = {
+        "pages/common/tar.md": "# tar",
+        "pages/linux/apt.md": "# apt",
+        "pages.zh/common/tar.md": "# tar",
+        "pages/linux/README": "",
+    }
+
+    def make_scanner(self, tmp_path):
+        return TreeScanner(tmp_path / "tldr" / "pages", tmp_path / "scan.json")
+
+    def test_scan(self, tmp_path):
+        make_tree(tmp_path / "tldr", self.pages)
+        index = self.make_scanner(tmp_path).scan()
+        assert index == {"tar": {"common": ["en", "zh"]}, "apt": {"linux": ["en"]}}
+
+    def test_incremental(self, tmp_path, mocker):
+        make_tree(tmp_path / "tldr", self.pages)
+        age_dirs(tmp_path / "tldr")
+        index = self.make_scanner(tmp_path).scan()
+        listed = mocker.patch(
+            "py_tldr.local.list_page_names", side_effect=lambda path: ["dpkg"]
+        )
+        assert self.make_scanner(tmp_path).scan() is None
+        assert self.make_scanner(tmp_path).scan(force=True) == index
+        listed.assert_not_called()
+        (tmp_path / "tldr" / "pages" / "linux" / "dpkg.md").write_text("# dpkg")
+        index = self.make_scanner(tmp_path).scan()
+        assert index["dpkg"] == {"linux": ["en"]}
+        listed.assert_called_once_with(str(tmp_path / "tldr" / "pages" / "linux"))
+
+    def test_recently_modified(self, tmp_path, mocker):
+        make_tree(tmp_path / "tldr", self.pages)
+        self.make_scanner(tmp_path).scan()
+        listed = mocker.spy(TreeScanner, "_save_state")
+        # Not trusted within the mtime granularity, listed again unchanged
+        assert self.make_scanner(tmp_path).scan() is None
+        listed.assert_called_once()
+
+    def test_removed_platform(self, tmp_path):
+        make_tree(tmp_path / "tldr", self.pages)
+        age_dirs(tmp_path / "tldr")
+        self.make_scanner(tmp_path).scan()
+        (tmp_path / "tldr" / "pages" / "linux" / "apt.md").unlink()
+        (tmp_path / "tldr" / "pages" / "linux" / "README").unlink()
+        (tmp_path / "tldr" / "pages" / "linux").rmdir()
+        assert "apt" not in self.make_scanner(tmp_path).scan()
+
+    def test_missing(self, tmp_path):
+        with pytest.raises(OSError):
+            self.make_scanner(tmp_path).scan()
@@ -0,0 +1,29 @@
+from py_tldr.lru import LRUCache
+
+
+def test_get_set():
+    cache = LRUCache(2)
+    cache.set("foo", 1)
+    assert cache.get("foo") == 1
+    assert cache.get("bar") is None
+    assert cache.get("bar", 0) == 0
+    assert "foo" in cache
+
+
+def test_evict_least_recently_used():
+    cache = LRUCache(2)
+    cache.set("foo", 1)
+    cache.set("bar", 2)
+    cache.get("foo")
+    cache.set("baz", 3)
+    assert "bar" not in cache
+    assert cache.get("foo") == 1
+    assert cache.get("baz") == 3
+    assert len(cache) == 2
+
+
+def test_clear():
+    cache = LRUCache()
+    cache.set("foo", 1)
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,83 @@
+import json
+import threading
+from time import time
+
+from py_tldr.manifest import Manifest
+
+
+def test_update(tmp_path):
+    manifest = Manifest(tmp_path / "manifest.json")
+    assert not manifest.exists()
+    assert manifest.get("foo") is None
+    manifest.update({"foo": {"fetched": 1, "source": "url"}})
+    manifest.update({"foo": {"validators": {"etag": "bar"}}})
+    assert manifest.get("foo") == {
+        "fetched": 1,
+        "source": "url",
+        "validators": {"etag": "bar"},
+    }
+    manifest.update({"foo": None})
+    assert manifest.get("foo") is None
+    assert manifest.exists()
+
+
+def test_age(tmp_path):
+    manifest = Manifest(tmp_path / "manifest.json")
+    manifest.update({"foo": {"fetched": time() - 3600}, "bar": {"source": "url"}})
+    assert 1 <= manifest.age("foo") < 1.1
+    assert manifest.age("bar") is None
+    assert manifest.age("baz") is None
+
+
+def test_loaded_once(tmp_path, mocker):
+    path = tmp_path / "manifest.json"
+    Manifest(path).update({"foo": {"fetched": 1}})
+    manifest = Manifest(path)
+    spied_open = mocker.spy(json, "load")
+    for _ in range(3):
+        assert manifest.get("foo")
+    spied_open.assert_called_once()
+
+
+def test_merged_with_others(tmp_path):
+    path = tmp_path / "manifest.json"
+    manifest, other = Manifest(path), Manifest(path)
+    manifest.update({"foo": {"fetched": 1}})
+    other.update({"bar": {"fetched": 2}})
+    manifest.update({"baz": {"fetched": 3}})
+    assert set(manifest.entries) == {"foo", "bar", "baz"}
+    other.reload()
+    assert set(other.entries) == {"foo", "bar", "baz"}
+
+
+def test_concurrent_updates(tmp_path):
+    # Instances don't share their thread lock, as if they were processes
+    path = tmp_path / "manifest.json"
+
+    def update(name):
+        manifest = Manifest(path)
+        for i in range(50):
+            manifest.update({f"{name}-{i}": {"fetched": i}})
+
+    threads = [threading.Thread(target=update, args=(name,)) for name in "abcd"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(Manifest(path).entries) == 200
+
+
+def test_invalid(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text("{")
+    assert Manifest(path).entries == {}
+    path.write_text(json.dumps({"version": 0, "entries": {"foo": {}}}))
+    assert Manifest(path).entries == {}
+
+
+def test_update_existing_only(tmp_path):
+    manifest = Manifest(tmp_path / "manifest.json")
+    manifest.update({"foo": {"fetched": 1}})
+    manifest.update({"foo": {"hits": 1}, "bar": {"hits": 1}}, create=False)
+    assert manifest.get("foo") == {"fetched": 1, "hits": 1}
+    assert manifest.get("bar") is None
@@ -1,10 +1,29 @@
+import gzip
 import json
-from time import sleep
+import os
+import threading
+from pathlib import Path as LibPath
+from shutil import copyfile
+from time import sleep, time
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
 
 import pytest
+from requests.exceptions import ChunkedEncodingError
 
 from py_tldr.core import make_page_finder
-from py_tldr.page import PageCache
+from py_tldr.index import CommandIndex
+from py_tldr.page import (
+    CACHE_BACKENDS,
+    DownloadError,
+    HTTPClient,
+    PageCache,
+    PageFinder,
+    download_data,
+    download_file,
+    gzip_compress,
+    make_index,
+    make_session,
+)
 
 
 class TestPageCache:
@@ -37,6 +56,7 @@ class TestPageCache:
         cache.update_index()
         with open(cache.index_file) as f:
             assert json.load(f)["tldr"] == {"linux": ["en"]}
+        assert CommandIndex(cache.index_table_file).get("tldr") == {"linux": ["en"]}
         assert cache.check_index() is True
 
 
@@ -97,13 +117,44 @@ class TestPageFinder:
             self.command, self.platform, language=self.languages[0]
         )
         patched_query.assert_called_once_with(
-            self.page_finder._make_page_url(
+            self.page_finder.make_page_url(
                 self.command, self.platform, self.languages[0]
             )
         )
         patched_set.assert_called_once_with(
-            self.command, self.platform, "foobar", language=self.languages[0]
+            self.command,
+            self.platform,
+            "foobar",
+            language=self.languages[0],
+            source=self.page_finder.make_page_url(
+                self.command, self.platform, self.languages[0]
+            ),
+        )
+
+    def test_find_cached(self, mocker):
+        mocker.patch("py_tldr.page.PageCache.check_index", return_value=True)
+        mocker.patch(
+            self.patch_path_finder_search,
+            return_value=(self.command, self.platform, self.languages[0]),
+        )
+        patched_get = mocker.patch(self.patch_path_cache_get, return_value="foobar")
+        patched_query = mocker.patch(self.patch_path_finder_query)
+        assert (
+            self.page_finder.find_cached(
+                self.command, platform=self.platform, languages=self.languages
+            )
+            == "foobar"
+        )
+        patched_get.assert_called_once_with(
+            self.command, self.platform, language=self.languages[0]
         )
+        patched_query.assert_not_called()
+
+    def test_find_cached_without_index(self, mocker):
+        mocker.patch("py_tldr.page.PageCache.check_index", return_value=False)
+        patched_update_index = mocker.patch("py_tldr.page.PageCache.update_index")
+        assert self.page_finder.find_cached(self.command) == ""
+        patched_update_index.assert_not_called()
 
     @pytest.mark.parametrize(
         "index, search_params, search_result",
@@ -155,3 +206,895 @@ class TestPageFinder:
     def test_search(self, mocker, index, search_params, search_result):
         mocker.patch(self.patch_path_finder_get_index, return_value=index)
         assert self.page_finder.search(*search_params) == search_result
+
+
+def make_archive(path, pages):
+    with ZipFile(path, "w") as f:
+        for i, (name, content) in enumerate(pages.items()):
+            f.writestr(name, content, ZIP_DEFLATED if i % 2 else ZIP_STORED)
+        f.writestr("index.json", "{}")
+    return path
+
+
+def patch_download_file(mocker, archive):
+    """Serve archive for download_file, 304 if validators are sent."""
+
+    def download(url, path, validators=None, **kwargs):
+        if validators:
+            return False
+        validators["etag"] = '"foo"'
+        copyfile(archive, path)
+        return True
+
+    return mocker.patch("py_tldr.page.download_file", side_effect=download)
+
+
+class TestSyncedIndex:
+    pages = {
+        "pages/common/foo.md": "# foo",
+        "pages/linux/bar.md": "# bar",
+        "pages.zh/common/foo.md": "# 福",
+    }
+
+    def test_make_index(self):
+        names = [*self.pages, "index.json", "LICENSE.md", "pages/", "foo/linux/a.md"]
+        assert make_index(names) == {
+            "foo": {"common": ["en", "zh"]},
+            "bar": {"linux": ["en"]},
+        }
+
+    @pytest.mark.parametrize("backend", CACHE_BACKENDS)
+    def test_from_archive(self, tmp_path, mocker, backend):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        patched_get = mocker.patch("py_tldr.page.HTTPClient.get")
+        finder = PageFinder("", 1, tmp_path / "cache", "", cache_backend=backend)
+        finder.sync(["en"])
+        patched_get.assert_not_called()
+        assert finder.cache.get_index() == make_index(self.pages)
+        assert finder.cache.check_index()
+        assert finder.search("foo", "linux", ["zh", "en"]) == ("foo", "common", "zh")
+        assert finder.find("bar", "linux", ["en"]) == "# bar"
+        assert finder.suggest("baz") == ["bar"]
+
+    def test_not_modified(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1, tmp_path / "cache", "")
+        cache.update(["en"])
+        age_entry(cache, "index.bin", 2)
+        write_index = mocker.spy(PageCache, "_write_index")
+        cache.update(["en"])
+        write_index.assert_not_called()
+        assert cache.check_index()
+
+    def test_missing_not_modified(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1, tmp_path / "cache", "")
+        cache.update(["en"])
+        cache.index_table_file.unlink()
+        patched_update_index = mocker.patch("py_tldr.page.PageCache.update_index")
+        cache.update(["en"])
+        patched_update_index.assert_called_once()
+
+
+class TestManifest:
+    def test_page_entry(self, tmp_path):
+        cache = PageCache(1, tmp_path, "")
+        cache.set("foo", "common", "# foo", source="https://foo.com")
+        entry = cache.manifest.get("pages/common/foo.md")
+        assert entry["source"] == "https://foo.com"
+        assert entry["fetched"] <= time()
+        # Loaded by another process
+        assert PageCache(1, tmp_path, "").get("foo", "common") == "# foo"
+
+    def test_mtime_ignored(self, tmp_path):
+        cache = PageCache(1, tmp_path, "")
+        cache.set("foo", "common", "# foo")
+        page_file = cache._make_page_file("common", "foo", "en")
+        os.utime(page_file, (0, 0))
+        assert cache.get("foo", "common") == "# foo"
+
+    def test_sync_not_modified(self, tmp_path, mocker):
+        patch_download_file(
+            mocker, make_archive(tmp_path / "src.zip", {"pages/common/foo.md": "#"})
+        )
+        cache = PageCache(1, tmp_path / "cache", "url")
+        cache.update("en")
+        fetched = cache.manifest.get("tldr.zip")["fetched"]
+        spied_utime = mocker.spy(os, "utime")
+        cache.update("en")
+        spied_utime.assert_not_called()
+        assert cache.manifest.get("tldr.zip")["fetched"] >= fetched
+        assert cache.manifest.get("tldr.zip")["validators"] == {"etag": '"foo"'}
+
+    def test_migrate(self, tmp_path):
+        cache = PageCache(1, tmp_path, "url")
+        CommandIndex.write(cache.index_table_file, {"foo": {"common": ["en"]}})
+        page_file = cache._make_page_file("common", "foo", "zh")
+        page_file.parent.mkdir(parents=True)
+        page_file.write_text("# 福", encoding="utf8")
+        with open(cache.validators_file, "w") as f:
+            json.dump({"url": {"etag": '"foo"'}}, f)
+        assert cache.check_index() is True
+        assert cache.get("foo", "common", language="zh") == "# 福"
+        assert cache.get_validators("tldr.zip", True) == {"etag": '"foo"'}
+        assert not cache.validators_file.exists()
+        assert cache.manifest_file.exists()
+
+
+class TestArchiveCache:
+    pages = {
+        "pages/common/foo.md": "# foo",
+        "pages/linux/bar.md": "# bar",
+        "pages.zh/common/foo.md": "# 福",
+    }
+
+    def test_update_and_get(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1, tmp_path / "cache", "", backend="archive")
+        cache.update("en")
+        assert cache.get("foo", "common") == "# foo"
+        assert cache.get("bar", "linux") == "# bar"
+        assert cache.get("foo", "common", language="zh") == "# 福"
+        assert cache.get("bar", "common") == ""
+        # Nothing extracted
+        assert not list((tmp_path / "cache").glob("pages*"))
+
+    def test_page_file_first(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1, tmp_path / "cache", "", backend="archive")
+        cache.update("en")
+        cache.set("foo", "common", "# new foo")
+        assert cache.get("foo", "common") == "# new foo"
+
+    def test_expired(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1 / 3600 / 10, tmp_path / "cache", "", backend="archive")
+        cache.update("en")
+        sleep(0.1)
+        assert cache.get("foo", "common") == ""
+
+    def test_synced_by_others(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1, tmp_path / "cache", "", backend="archive")
+        cache.update("en")
+        assert cache.get("bar", "linux") == "# bar"
+        pages = {"pages/common/foo.md": "# new foo" * 10, "pages/linux/bar.md": "#"}
+        patch_download_file(mocker, make_archive(tmp_path / "new.zip", pages))
+        other = PageCache(1, tmp_path / "cache", "", backend="archive")
+        other.save_validators("tldr.zip", {})
+        other.update("en")
+        assert cache.get("bar", "linux") == "#"
+        cache.reload()
+        assert cache.get("foo", "common") == "# new foo" * 10
+
+    def test_table_behind(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1, tmp_path / "cache", "", backend="archive")
+        cache.update("en")
+        assert cache.get("foo", "common") == "# foo"
+        # Replaced before the table is rebuilt
+        pages = {"pages/linux/bar.md": "#", "pages/common/foo.md": "# new foo"}
+        make_archive(tmp_path / "new.zip", pages).replace(cache.archive_file)
+        assert cache.get("foo", "common") == "# new foo"
+
+    def test_bad_data(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        finder = PageFinder("", 1, tmp_path / "cache", "", cache_backend="archive")
+        finder.cache.update("en")
+        finder.cache.archive_file.write_bytes(b"foo")
+        assert finder.cache.get("foo", "common") == ""
+        mocker.patch("py_tldr.page.PageFinder._query", return_value="# foo")
+        assert finder.find("foo", "linux", ["en"]) == "# foo"
+
+    def test_unknown_backend(self, tmp_path):
+        with pytest.raises(ValueError):
+            PageCache(1, tmp_path, "", backend="foo")
+
+
+class TestSelectiveExtraction:
+    pages = {
+        "pages/common/foo.md": "# foo",
+        "pages/linux/bar.md": "# bar",
+        "pages/osx/baz.md": "# baz",
+        "pages.zh/common/foo.md": "# 福",
+    }
+
+    def test_language(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        spied_extractall = mocker.spy(ZipFile, "extractall")
+        cache = PageCache(1, tmp_path / "cache", "")
+        cache.update("zh")
+        members = spied_extractall.call_args[1]["members"]
+        assert [info.filename for info in members] == ["pages.zh/common/foo.md"]
+        assert cache.get("foo", "common", language="zh") == "# 福"
+        assert sorted(p.name for p in (tmp_path / "cache").iterdir()) == [
+            "index.bin",
+            "index.json",
+            "manifest.json",
+            "manifest.json.lock",
+            "pages.zh",
+            "search.bin",
+            "search_docs.bin",
+            "suggest.bin",
+        ]
+
+    def test_languages(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1, tmp_path / "cache", "")
+        cache.update(["zh", "en"])
+        assert cache.get("foo", "common", language="zh") == "# 福"
+        assert cache.get("bar", "linux") == "# bar"
+
+    def test_fallback_offline(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        mocker.patch("py_tldr.page.PageCache.update_index")
+        finder = PageFinder("", 1, tmp_path / "cache", "")
+        finder.sync(["zh", "en"])
+        CommandIndex.write(
+            finder.cache.index_table_file,
+            {"bar": {"linux": ["en"]}, "foo": {"common": ["en", "zh"]}},
+        )
+        patched_query = mocker.patch("py_tldr.page.PageFinder._query")
+        languages = ["zh", "en"]
+        assert finder.find("bar", "linux", languages=languages) == "# bar"
+        assert finder.find("foo", "linux", languages=languages) == "# 福"
+        patched_query.assert_not_called()
+
+    def test_platform(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1, tmp_path / "cache", "", platforms=["linux"])
+        cache.update("en")
+        assert cache.get("foo", "common") == "# foo"
+        assert cache.get("bar", "linux") == "# bar"
+        assert cache.get("baz", "osx") == ""
+
+    def test_remove_other_platforms(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        PageCache(1, tmp_path / "cache", "").update("en")
+        (tmp_path / "cache" / "manifest.json").unlink()
+        PageCache(1, tmp_path / "cache", "", platforms=["osx"]).update("en")
+        assert sorted(p.name for p in (tmp_path / "cache" / "pages").iterdir()) == [
+            "common",
+            "osx",
+        ]
+
+    def test_keep_fetched(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1, tmp_path / "cache", "", platforms=["osx"])
+        cache.set("apt", "linux", "# apt")
+        cache.set("foo", "sunos", "# 福", language="zh")
+        cache.update("en")
+        assert cache.get("apt", "linux") == "# apt"
+        assert cache.get("foo", "sunos", language="zh") == "# 福"
+        assert not (tmp_path / "cache" / "pages" / "linux" / "bar.md").exists()
+
+
+class TestCompression:
+    pages = {"pages/common/foo.md": "# foo", "pages.zh/common/foo.md": "# 福"}
+
+    def test_page(self, tmp_path):
+        cache = PageCache(1, tmp_path, "", compress=True)
+        cache.set("foo", "common", "# foo" * 100)
+        page_file = cache._make_page_file("common", "foo", "en")
+        assert not page_file.exists()
+        with gzip.open(f"{page_file}.gz", "rt", encoding="utf8") as f:
+            assert f.read() == "# foo" * 100
+        assert cache.manifest.get("pages/common/foo.md")["size"] < 500
+        assert cache.get("foo", "common") == "# foo" * 100
+
+    def test_reproducible(self):
+        data = gzip_compress(b"# foo")
+        # No mtime in the header
+        assert data[4:8] == b"\0\0\0\0"
+        assert gzip.decompress(data) == b"# foo"
+
+    def test_switched(self, tmp_path):
+        PageCache(1, tmp_path, "").set("foo", "common", "# foo")
+        cache = PageCache(1, tmp_path, "", compress=True)
+        assert cache.get("foo", "common") == "# foo"
+        cache.set("foo", "common", "# new foo")
+        assert not cache._make_page_file("common", "foo", "en").exists()
+        assert PageCache(1, tmp_path, "").get("foo", "common") == "# new foo"
+
+    def test_sync(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1, tmp_path / "cache", "", compress=True)
+        cache.update(["zh", "en"])
+        assert sorted(
+            str(p.relative_to(tmp_path / "cache"))
+            for p in (tmp_path / "cache").glob("pages*/*/*")
+        ) == ["pages.zh/common/foo.md.gz", "pages/common/foo.md.gz"]
+        assert cache.get("foo", "common", language="zh") == "# 福"
+        assert [page[:3] for page in cache.iter_pages(["en"])] == [
+            ("en", "common", "foo")
+        ]
+
+    def test_index(self, tmp_path):
+        cache = PageCache(1, tmp_path, "", compress=True)
+        cache.install_index(
+            json.dumps(
+                {
+                    "commands": [
+                        {"name": "foo", "targets": [{"os": "linux", "language": "en"}]}
+                    ]
+                }
+            ).encode()
+        )
+        assert not cache.index_file.exists()
+        assert cache.get_index() == {"foo": {"linux": ["en"]}}
+        # Read via mmap, never compressed
+        assert CommandIndex(cache.index_table_file).get("foo") == {"linux": ["en"]}
+
+
+class TestParsedPages:
+    content = "# foo\n\n> Foo it.\n\n- Usage:\n\n`foo {{bar}}`\n"
+
+    def make_cache(self, tmp_path, **kwargs):
+        cache = PageCache(1, tmp_path, "", **kwargs)
+        cache.set("foo", "common", self.content)
+        return cache
+
+    def test_persisted(self, tmp_path, mocker):
+        cache = self.make_cache(tmp_path)
+        page = cache.get_parsed(self.content)
+        assert page.examples[0].command == "foo bar"
+        assert len(list(cache.parsed_location.glob("*.json"))) == 1
+        parse = mocker.patch("py_tldr.page.parse_page")
+        assert PageCache(1, tmp_path, "").get_parsed(self.content) == page
+        parse.assert_not_called()
+
+    def test_corrupted(self, tmp_path):
+        cache = self.make_cache(tmp_path)
+        cache.get_parsed(self.content)
+        for parsed_file in cache.parsed_location.glob("*.json"):
+            parsed_file.write_text("{")
+        assert cache.get_parsed(self.content).title == "foo"
+
+    def test_not_cached(self, tmp_path):
+        cache = PageCache(1, tmp_path, "")
+        assert cache.get_parsed(self.content).title == "foo"
+        assert not cache.parsed_location.exists()
+
+    def test_in_manifest(self, tmp_path):
+        cache = self.make_cache(tmp_path)
+        entry = cache.manifest.get("pages/common/foo.md")
+        cache.get_parsed(self.content)
+        (parsed_file,) = cache.parsed_location.glob("*.json")
+        parsed_size = parsed_file.stat().st_size
+        assert cache.manifest.get("pages/common/foo.md")["size"] == (
+            entry["size"] + parsed_size
+        )
+        # Fetched again with the same content
+        cache.set("foo", "common", self.content)
+        assert parsed_file.exists()
+        assert cache.manifest.get("pages/common/foo.md")["parsed_size"] == parsed_size
+        # Then with changes
+        cache.set("foo", "common", "# foo")
+        assert not parsed_file.exists()
+        assert cache.manifest.get("pages/common/foo.md")["size"] == 5
+
+    def test_evicted_with_page(self, tmp_path):
+        cache = self.make_cache(tmp_path, max_entries=1)
+        cache.get_parsed(self.content)
+        cache.set("bar", "common", "# bar")
+        assert cache.get("foo", "common") == ""
+        assert not list(cache.parsed_location.glob("*.json"))
+
+    def test_cleared_on_sync(self, tmp_path, mocker):
+        synced = "# bar"
+        patch_download_file(
+            mocker, make_archive(tmp_path / "src.zip", {"pages/common/bar.md": synced})
+        )
+        cache = self.make_cache(tmp_path / "cache")
+        cache.update(["en"])
+        cache.get_parsed(self.content)
+        cache.get_parsed(synced)
+        assert len(list(cache.parsed_location.glob("*.json"))) == 2
+        # Not modified, parsed pages are still valid
+        cache.update(["en"])
+        assert len(list(cache.parsed_location.glob("*.json"))) == 2
+        # Modified, with no validators to send
+        cache.save_validators("tldr.zip", {})
+        cache.update(["en"])
+        # Ones of pages fetched are kept
+        assert len(list(cache.parsed_location.glob("*.json"))) == 1
+
+
+def age_entry(cache, key, hours):
+    cache.manifest.update({key: {"fetched": time() - hours * 3600}})
+
+
+class TestEviction:
+    def test_record_access(self, tmp_path, mocker):
+        cache = PageCache(1, tmp_path, "")
+        cache.set("foo", "common", "# foo")
+        key = "pages/common/foo.md"
+        assert cache.manifest.get(key)["size"] == 5
+        spied_update = mocker.spy(cache.manifest, "update")
+        cache.get("foo", "common")
+        spied_update.assert_not_called()
+        cache.manifest.update({key: {"accessed": time() - 7200}})
+        cache.get("foo", "common")
+        assert cache.manifest.get(key)["hits"] == 2
+
+    def test_no_caps(self, tmp_path):
+        cache = PageCache(1, tmp_path, "")
+        for name in ("foo", "bar", "baz"):
+            cache.set(name, "common", "#")
+        assert cache.evict() == (0, 0)
+        assert len(cache.manifest.entries) == 3
+
+    def test_max_entries_lru(self, tmp_path):
+        cache = PageCache(1, tmp_path, "", max_entries=2)
+        cache.set("foo", "common", "# foo")
+        cache.set("bar", "common", "# bar")
+        cache.manifest.update({"pages/common/bar.md": {"accessed": 0}})
+        cache.set("baz", "common", "# baz")
+        assert cache.get("foo", "common") == "# foo"
+        assert cache.get("bar", "common") == ""
+        assert not cache._make_page_file("common", "bar", "en").exists()
+        assert cache.get("baz", "common") == "# baz"
+
+    def test_max_size_lfu(self, tmp_path):
+        cache = PageCache(1, tmp_path, "", max_size=10, eviction="lfu")
+        cache.set("foo", "common", "# foo")
+        cache.manifest.update({"pages/common/foo.md": {"hits": 3}})
+        cache.set("bar", "common", "# bar")
+        cache.set("baz", "common", "# baz")
+        assert cache.get("foo", "common") == "# foo"
+        assert cache.get("bar", "common") == ""
+        assert cache.get("baz", "common") == "# baz"
+
+    def test_synced_pages(self, tmp_path, mocker):
+        pages = {"pages/common/foo.md": "# foo", "pages/linux/bar.md": "# bar"}
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", pages))
+        # Neither synced pages nor the index count
+        cache = PageCache(1, tmp_path / "cache", "", max_entries=2)
+        cache.update("en")
+        assert cache.manifest.get("tldr.zip")["size"] == 10
+        for name in ("baz", "qux", "quux"):
+            cache.set(name, "common", f"# {name}")
+        assert cache.get("baz", "common") == ""
+        assert cache.get("qux", "common") == "# qux"
+        assert cache.get("quux", "common") == "# quux"
+        # Synced pages are still there for offline use
+        assert cache.get("foo", "common") == "# foo"
+        assert cache.get("bar", "linux") == "# bar"
+        assert cache.search_terms_file.exists()
+        assert set(cache.manifest.entries) == {
+            "index.bin",
+            "tldr.zip",
+            "pages/common/qux.md",
+            "pages/common/quux.md",
+        }
+
+    def test_unknown_eviction(self, tmp_path):
+        with pytest.raises(ValueError):
+            PageCache(1, tmp_path, "", eviction="foo")
+
+    def test_prune(self, tmp_path):
+        cache = PageCache(1, tmp_path, "", hard_timeout=24)
+        cache.set("foo", "common", "# foo")
+        cache.set("bar", "common", "# bar")
+        age_entry(cache, "pages/common/foo.md", 25)
+        assert cache.prune() == (1, 5)
+        assert set(cache.manifest.entries) == {"pages/common/bar.md"}
+
+    def test_stats(self, tmp_path):
+        cache = PageCache(1, tmp_path, "", max_entries=10)
+        cache.set("foo", "common", "# foo")
+        CommandIndex.write(cache.index_table_file, {"foo": {"common": ["en"]}})
+        cache._record_index()
+        stats = cache.stats()
+        assert stats["entries"] == 2
+        assert stats["size"] == 5 + cache.index_table_file.stat().st_size
+        assert stats["max_entries"] == 10
+        assert stats["synced"] is None
+        assert stats["pages"] == {"count": 1, "size": 5}
+
+
+class TestStaleWhileRevalidate:
+    index = {"foo": {"common": ["en"]}}
+
+    def make_finder(self, tmp_path, hard_timeout=24):
+        finder = PageFinder("", 1, tmp_path, "", cache_hard_timeout=hard_timeout)
+        CommandIndex.write(finder.cache.index_table_file, self.index)
+        finder.cache.set("foo", "common", "# old foo")
+        age_entry(finder.cache, "pages/common/foo.md", 2)
+        return finder
+
+    def test_get_stale(self, tmp_path):
+        cache = self.make_finder(tmp_path).cache
+        assert cache.get("foo", "common") == ""
+        assert cache.get_stale("foo", "common") == "# old foo"
+        age_entry(cache, "pages/common/foo.md", 25)
+        assert cache.get_stale("foo", "common") == ""
+
+    def test_no_hard_timeout(self, tmp_path):
+        cache = self.make_finder(tmp_path, hard_timeout=None).cache
+        assert cache.get_stale("foo", "common") == ""
+        age_entry(cache, "index.bin", 2)
+        assert cache.check_stale_index() is False
+
+    def test_stale_index(self, tmp_path):
+        cache = self.make_finder(tmp_path).cache
+        age_entry(cache, "index.bin", 2)
+        assert cache.check_index() is False
+        assert cache.check_stale_index() is True
+        age_entry(cache, "index.bin", 25)
+        assert cache.check_stale_index() is False
+
+    def test_background(self, tmp_path, mocker):
+        finder = self.make_finder(tmp_path)
+        patched_query = mocker.patch(
+            "py_tldr.page.PageFinder._query", return_value="# foo"
+        )
+        spied_thread = mocker.spy(threading.Thread, "start")
+        assert finder.find("foo", "linux", ["en"]) == "# old foo"
+        spied_thread.assert_called_once()
+        for thread in threading.enumerate():
+            if thread.name == "tldr-revalidate":
+                thread.join()
+        patched_query.assert_called_once()
+        assert finder.cache.get("foo", "common") == "# foo"
+
+    def test_stale_index_revalidated(self, tmp_path, mocker):
+        finder = self.make_finder(tmp_path)
+        finder.background_revalidation = False
+        age_entry(finder.cache, "index.bin", 2)
+        patched_update_index = mocker.patch("py_tldr.page.PageCache.update_index")
+        mocker.patch("py_tldr.page.PageFinder._query", return_value="# foo")
+        assert finder.find_cached("foo", "linux", ["en"]) == "# old foo"
+        patched_update_index.assert_not_called()
+        finder.revalidate()
+        patched_update_index.assert_called_once()
+        assert finder.cache.get("foo", "common") == "# foo"
+        # Nothing left to revalidate
+        finder.revalidate()
+        patched_update_index.assert_called_once()
+
+    def test_revalidation_failed(self, tmp_path, mocker):
+        finder = self.make_finder(tmp_path)
+        finder.background_revalidation = False
+        patched_query = mocker.patch(
+            "py_tldr.page.PageFinder._query", side_effect=DownloadError
+        )
+        assert finder.find("foo", "linux", ["en"]) == "# old foo"
+        finder.revalidate()
+        assert finder.cache.get_stale("foo", "common") == "# old foo"
+        # Not tried again for a while
+        assert finder.find("foo", "linux", ["en"]) == "# old foo"
+        finder.revalidate()
+        patched_query.assert_called_once()
+
+    def test_revalidation_timeout(self, tmp_path, mocker):
+        finder = self.make_finder(tmp_path)
+        finder.background_revalidation = False
+        event = threading.Event()
+
+        def query(url):
+            event.wait()
+            raise DownloadError()
+
+        mocker.patch("py_tldr.page.PageFinder._query", side_effect=query)
+        assert finder.find("foo", "linux", ["en"]) == "# old foo"
+        finder.revalidate(timeout=0.1)
+        # Abandoned ones count as failed
+        assert finder.cache.check_revalidation() is False
+        event.set()
+
+
+class TestSuggest:
+    index = {
+        "commands": [
+            {"name": name, "targets": [{"os": "common", "language": "en"}]}
+            for name in ("git", "git-commit", "tar")
+        ]
+    }
+
+    def test_suggest(self, tmp_path):
+        finder = PageFinder("", 1, tmp_path, "")
+        assert finder.suggest("gti") == []
+        finder.cache.install_index(json.dumps(self.index).encode())
+        assert finder.suggest("gti") == ["git"]
+        assert finder.suggest("git-comit") == ["git-commit"]
+
+    def test_built_if_not_modified(self, tmp_path):
+        finder = PageFinder("", 1, tmp_path, "")
+        finder.cache.install_index(json.dumps(self.index).encode())
+        finder.cache.suggest_file.unlink()
+        finder.cache.install_index(None)
+        assert finder.suggest("tra") == ["tar"]
+
+
+class TestLocalSource:
+    pages = {
+        "pages/common/tar.md": "# tar\n\n> Archive files.",
+        "pages/linux/apt.md": "# apt",
+        "pages.zh/common/tar.md": "# tar\n\n> 归档",
+    }
+
+    @pytest.fixture(autouse=True)
+    def no_network(self, mocker):
+        mocker.patch("py_tldr.page.HTTPClient.get", side_effect=AssertionError)
+        mocker.patch("py_tldr.page.HTTPClient.get_file", side_effect=AssertionError)
+
+    def make_finder(self, tmp_path, source):
+        for member, content in self.pages.items():
+            page_file = tmp_path / "tldr" / member
+            page_file.parent.mkdir(parents=True, exist_ok=True)
+            page_file.write_text(content, encoding="utf8")
+        return PageFinder(source, 1, tmp_path / "cache", "")
+
+    @pytest.mark.parametrize("source", ("tldr", "tldr/pages", "file://{}/tldr"))
+    def test_find(self, tmp_path, source):
+        source = source.format(tmp_path) if "{}" in source else f"{tmp_path}/{source}"
+        finder = self.make_finder(tmp_path, source)
+        assert finder.find("tar", "linux", ["zh", "en"]) == "# tar\n\n> 归档"
+        assert finder.find("apt", "linux", ["zh", "en"]) == "# apt"
+        assert finder.find("foo", "linux", ["en"]) == ""
+        assert finder.find_cached("apt", "linux", ["en"]) == "# apt"
+        # Read from the tree, never cached
+        assert not finder.cache.location.exists()
+        assert finder.cache.manifest.get("index.bin")["source"] == str(
+            tmp_path / "tldr" / "pages"
+        )
+
+    def test_page_changed(self, tmp_path):
+        finder = self.make_finder(tmp_path, str(tmp_path / "tldr"))
+        assert finder.find("apt", "linux", ["en"]) == "# apt"
+        (tmp_path / "tldr" / "pages" / "linux" / "apt.md").write_text("# new apt")
+        assert finder.find("apt", "linux", ["en"]) == "# new apt"
+
+    def test_sync(self, tmp_path, mocker):
+        finder = self.make_finder(tmp_path, str(tmp_path / "tldr"))
+        finder.sync(["en"])
+        results = finder.search_text("archive", "linux", ["en"])
+        assert [(r.name, r.platform) for r in results] == [("tar", "common")]
+        write_index = mocker.spy(PageCache, "_write_index")
+        finder.sync(["en"])
+        write_index.assert_not_called()
+        assert finder.suggest("atp") == ["apt"]
+
+
+class TestTextIndex:
+    pages = {
+        "pages/common/foo.md": "# foo\n\n> Compress files.",
+        "pages/linux/bar.md": "# bar\n\n> List files.",
+        "pages.zh/common/foo.md": "# foo\n\n> 压缩",
+    }
+
+    @pytest.mark.parametrize("backend", CACHE_BACKENDS)
+    def test_built_by_sync(self, tmp_path, mocker, backend):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        mocker.patch("py_tldr.page.PageCache.update_index")
+        finder = PageFinder("", 1, tmp_path / "cache", "", cache_backend=backend)
+        assert finder.search_text("compress") == []
+        finder.sync(["en"])
+        results = finder.search_text("compress", "linux", ["en"])
+        assert [(r.name, r.platform) for r in results] == [("foo", "common")]
+        assert finder.search_text("压缩") == []
+
+    def test_kept_if_not_modified(self, tmp_path, mocker):
+        patch_download_file(mocker, make_archive(tmp_path / "src.zip", self.pages))
+        cache = PageCache(1, tmp_path / "cache", "")
+        cache.update("en")
+        patched_build = mocker.patch("py_tldr.search.build_text_index")
+        cache.update("en")
+        patched_build.assert_not_called()
+
+
+class TestConditionalDownload:
+    def make_response(self, mocker, status_code, headers=None, content=b""):
+        resp = mocker.Mock(status_code=status_code, headers=headers or {})
+        resp.content = content
+        return resp
+
+    def test_save_validators(self, mocker):
+        resp = self.make_response(
+            mocker, 200, {"ETag": '"foo"', "Last-Modified": "bar"}, b"data"
+        )
+        mocker.patch("requests.get", return_value=resp)
+        validators = {}
+        assert download_data("url", validators=validators) == b"data"
+        assert validators == {"etag": '"foo"', "last_modified": "bar"}
+
+    def test_not_modified(self, mocker):
+        patched_get = mocker.patch(
+            "requests.get", return_value=self.make_response(mocker, 304)
+        )
+        validators = {"etag": '"foo"', "last_modified": "bar"}
+        assert download_data("url", validators=validators) is None
+        assert patched_get.call_args[1]["headers"] == {
+            "If-None-Match": '"foo"',
+            "If-Modified-Since": "bar",
+        }
+        assert validators == {"etag": '"foo"', "last_modified": "bar"}
+
+    def test_unconditional(self, mocker):
+        patched_get = mocker.patch(
+            "requests.get", return_value=self.make_response(mocker, 200)
+        )
+        download_data("url")
+        assert patched_get.call_args[1]["headers"] == {}
+
+    @pytest.mark.parametrize("backend", CACHE_BACKENDS)
+    def test_update_not_modified(self, tmp_path, mocker, backend):
+        archive = make_archive(tmp_path / "src.zip", {"pages/common/foo.md": "# foo"})
+        patched_download = patch_download_file(mocker, archive)
+        cache = PageCache(1 / 3600 / 10, tmp_path / "cache", "url", backend=backend)
+        cache.update("en")
+        sleep(0.1)
+        assert cache.get("foo", "common") == ""
+        cache.update("en")
+        assert patched_download.call_args[1]["validators"] == {"etag": '"foo"'}
+        assert cache.get("foo", "common") == "# foo"
+
+    def test_update_other_language(self, tmp_path, mocker):
+        archive = make_archive(tmp_path / "src.zip", {"pages.zh/common/foo.md": "#"})
+        patch_download_file(mocker, archive)
+        cache = PageCache(1, tmp_path / "cache", "url")
+        (tmp_path / "cache" / "pages").mkdir(parents=True)
+        with open(cache.validators_file, "w") as f:
+            json.dump({"url": {"etag": '"foo"'}}, f)
+        cache.update("zh")
+        # No validators sent for pages not synced before, so no 304
+        assert cache.get("foo", "common", language="zh") == "#"
+
+
+class StreamResponse:
+    def __init__(self, status_code, headers=None, chunks=(), error=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.chunks = chunks
+        self.error = error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield from self.chunks
+        if self.error:
+            raise self.error
+
+
+class TestStreamingDownload:
+    def test_download(self, tmp_path, mocker):
+        resp = StreamResponse(
+            200, {"ETag": '"foo"', "Content-Length": "6"}, [b"foo", b"bar"]
+        )
+        patched_get = mocker.patch("requests.get", return_value=resp)
+        progress = mocker.Mock()
+        validators = {}
+        path = tmp_path / "tldr.zip"
+        assert download_file("url", path, validators=validators, progress=progress)
+        assert path.read_bytes() == b"foobar"
+        assert validators == {"etag": '"foo"'}
+        progress.assert_called_with(6, 6)
+        assert patched_get.call_args[1]["stream"] is True
+        assert list(tmp_path.iterdir()) == [path]
+
+    def test_resume(self, tmp_path, mocker):
+        path = tmp_path / "tldr.zip"
+        mocker.patch(
+            "requests.get",
+            return_value=StreamResponse(
+                200,
+                {"ETag": '"foo"'},
+                [b"foo"],
+                error=ChunkedEncodingError("interrupted"),
+            ),
+        )
+        with pytest.raises(DownloadError):
+            download_file("url", path)
+        assert not path.exists()
+
+        patched_get = mocker.patch(
+            "requests.get", return_value=StreamResponse(206, {}, [b"bar"])
+        )
+        assert download_file("url", path)
+        assert path.read_bytes() == b"foobar"
+        headers = patched_get.call_args[1]["headers"]
+        assert headers["Range"] == "bytes=3-"
+        assert headers["If-Range"] == '"foo"'
+
+    def test_resume_changed_source(self, tmp_path, mocker):
+        path = tmp_path / "tldr.zip"
+        LibPath(f"{path}.part").write_bytes(b"foo")
+        LibPath(f"{path}.part.tag").write_text('"foo"')
+        mocker.patch(
+            "requests.get", return_value=StreamResponse(200, {}, [b"new", b"data"])
+        )
+        assert download_file("url", path)
+        assert path.read_bytes() == b"newdata"
+
+    def test_not_modified(self, tmp_path, mocker):
+        mocker.patch("requests.get", return_value=StreamResponse(304))
+        path = tmp_path / "tldr.zip"
+        assert download_file("url", path, validators={"etag": '"foo"'}) is False
+        assert not path.exists()
+
+
+class TestHTTPClient:
+    def test_shared_session(self, tmp_path):
+        finder = PageFinder("", 1, tmp_path, "")
+        assert finder.cache.http_client is finder.http_client
+        session = finder.http_client.session
+        assert finder.http_client.session is session
+
+    def test_session_retry(self):
+        session = make_session(pool_size=2, retries=5, backoff_factor=1)
+        adapter = session.get_adapter("https://tldr.sh")
+        assert adapter._pool_maxsize == 2
+        assert adapter.max_retries.total == 5
+        assert adapter.max_retries.backoff_factor == 1
+        assert 503 in adapter.max_retries.status_forcelist
+
+    def test_get_with_session(self, mocker):
+        client = HTTPClient("http://proxy", timeout=5)
+        patched_download = mocker.patch(
+            "py_tldr.page.download_data", return_value=b"data"
+        )
+        assert client.get("url") == b"data"
+        patched_download.assert_called_once_with(
+            "url",
+            proxies={"https": "http://proxy"},
+            timeout=5,
+            validators=None,
+            session=client.session,
+        )
+
+
+class TestFindMany:
+    index = {
+        "foo": {"common": ["en"]},
+        "bar": {"linux": ["en"]},
+        "baz": {"linux": ["en"]},
+    }
+
+    def make_finder(self, tmp_path):
+        finder = PageFinder("", 1, tmp_path, "")
+        CommandIndex.write(finder.cache.index_table_file, self.index)
+        finder.cache.set("foo", "common", "# foo")
+        return finder
+
+    def test_find_many(self, tmp_path, mocker):
+        finder = self.make_finder(tmp_path)
+        patched_query = mocker.patch(
+            "py_tldr.page.PageFinder._query", side_effect=lambda url: url
+        )
+        patched_check_index = mocker.spy(finder.cache, "check_index")
+        results = dict(finder.find_many(["foo", "bar", "qux"], "linux", ["en"]))
+        assert results == {
+            "foo": "# foo",
+            "bar": finder.make_page_url("bar", "linux", "en"),
+            "qux": "",
+        }
+        patched_query.assert_called_once()
+        patched_check_index.assert_called_once()
+        # Fetched pages are cached
+        assert finder.cache.get("bar", "linux") == results["bar"]
+
+    def test_cache_hits_first(self, tmp_path, mocker):
+        finder = self.make_finder(tmp_path)
+        mocker.patch("py_tldr.page.PageFinder._query", return_value="# page")
+        results = list(finder.find_many(["bar", "foo"], "linux", ["en"]))
+        assert results == [("foo", "# foo"), ("bar", "# page")]
+
+    def test_fetch_failed(self, tmp_path, mocker):
+        finder = self.make_finder(tmp_path)
+
+        def query(url):
+            if "bar" in url:
+                raise DownloadError()
+            return "# baz"
+
+        mocker.patch("py_tldr.page.PageFinder._query", side_effect=query)
+        results = dict(finder.find_many(["bar", "baz"], "linux", ["en"]))
+        assert results == {"bar": None, "baz": "# baz"}
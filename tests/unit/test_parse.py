@@ -64,3 +64,9 @@ def test_lang_env_precedence():
 )
 def test_parse_platform(platform, config, parsed):
     assert parse_platform(platform, config) == parsed
+
+
+def test_language_from_given_env():
+    environ["LC_ALL"] = environ["LANG"] = "en_US.UTF-8"
+    env = {"LANG": "zh_CN.UTF-8", "LANGUAGE": "it"}
+    assert parse_language("", {}, env=env) == ["it", "zh", "en"]
@@ -0,0 +1,124 @@
+import pytest
+
+from py_tldr.search import (
+    build_text_index,
+    open_text_index,
+    parse_page,
+    stem,
+    tokenize,
+)
+
+TAR = """# tar
+
+> Archiving utility.
+> Often combined with a compression method, such as gzip or bzip2.
+> More information: <https://www.gnu.org/software/tar>.
+
+- [c]reate a gzipped archive from a directory:
+
+`tar czf {{path/to/target.tar.gz}} {{path/to/directory}}`
+"""
+ZIP = """# zip
+
+> Package and compress (archive) files into zip archive.
+
+- Add files or directories to a compressed archive:
+
+`zip -r {{path/to/compressed.zip}} {{path/to/file_or_directory}}`
+"""
+LS = """# ls
+
+> List directory contents.
+
+- List files one per line:
+
+`ls -1`
+"""
+PAGES = [
+    ("en", "common", "tar", TAR),
+    ("en", "common", "zip", ZIP),
+    ("en", "common", "ls", LS),
+    ("en", "osx", "ditto", "# ditto\n\n> Copy and compress directories."),
+    ("zh", "common", "tar", "# tar\n\n> 归档工具。"),
+]
+
+
+@pytest.mark.parametrize(
+    "term, stemmed",
+    (
+        ("compresses", "compress"),
+        ("directories", "directory"),
+        ("archives", "archive"),
+        ("files", "file"),
+        ("process", "process"),
+        ("status", "status"),
+        ("ls", "ls"),
+    ),
+)
+def test_stem(term, stemmed):
+    assert stem(term) == stemmed
+
+
+def test_tokenize():
+    assert tokenize("Which command compresses a Directory?") == [
+        "compress",
+        "directory",
+    ]
+    assert tokenize("[c]reate 2 files") == ["create", "file"]
+
+
+def test_parse_page():
+    description, frequencies = parse_page("tar", TAR)
+    assert description == (
+        "Archiving utility. Often combined with a compression method, "
+        "such as gzip or bzip2."
+    )
+    assert "www" not in frequencies
+    assert frequencies["tar"] > frequencies["directory"]
+
+
+@pytest.fixture
+def text_index(tmp_path):
+    terms_file, docs_file = tmp_path / "search.bin", tmp_path / "search_docs.bin"
+    assert build_text_index(PAGES, terms_file, docs_file) == len(PAGES)
+    index = open_text_index(terms_file, docs_file)
+    yield index
+    index.close()
+
+
+def test_search(text_index):
+    results = text_index.search("which command compresses a directory?")
+    assert [result.name for result in results][:2] == ["zip", "ditto"]
+    assert results[0].platform == "common"
+    assert results[0].description == (
+        "Package and compress (archive) files into zip archive."
+    )
+    assert results[0].score > results[1].score
+
+
+def test_search_by_name(text_index):
+    assert text_index.search("tar")[0].name == "tar"
+
+
+def test_search_prefix(text_index):
+    assert {result.name for result in text_index.search("compr")} == {
+        "zip",
+        "ditto",
+        "tar",
+    }
+
+
+def test_search_filters(text_index):
+    results = text_index.search("compress", platform="linux", languages=["en"])
+    assert "ditto" not in [result.name for result in results]
+    results = text_index.search("tar", languages=["zh"])
+    assert [(result.name, result.language) for result in results] == [("tar", "zh")]
+
+
+def test_search_nothing(text_index):
+    assert text_index.search("") == []
+    assert text_index.search("foobar") == []
+
+
+def test_not_built(tmp_path):
+    assert open_text_index(tmp_path / "foo.bin", tmp_path / "bar.bin") is None
@@ -0,0 +1,70 @@
+import pytest
+
+from py_tldr.index import CommandIndex
+from py_tldr.suggest import (
+    build_ngram_index,
+    edit_distance,
+    make_grams,
+    open_ngram_index,
+)
+
+NAMES = ["git", "git-commit", "gist", "grep", "tar", "tig", "docker-compose", "ls"]
+
+
+def test_make_grams():
+    assert make_grams("ls") == {"$$l", "$ls", "ls$", "s$$"}
+
+
+@pytest.mark.parametrize(
+    "a, b, distance",
+    (
+        ("git", "git", 0),
+        ("gti", "git", 1),
+        ("gits", "git", 1),
+        ("gist", "git", 1),
+        ("grep", "git", 3),
+        ("", "ls", 2),
+    ),
+)
+def test_edit_distance(a, b, distance):
+    assert edit_distance(a, b, 3) == distance
+    assert edit_distance(a, b, distance) == distance
+
+
+def test_edit_distance_limit():
+    assert edit_distance("grep", "git", 1) == 2
+    assert edit_distance("docker-compose", "ls", 2) == 3
+
+
+@pytest.fixture
+def ngram_index(tmp_path):
+    CommandIndex.write(tmp_path / "index.bin", {name: {} for name in NAMES})
+    build_ngram_index(NAMES, tmp_path / "suggest.bin")
+    index = CommandIndex(tmp_path / "index.bin")
+    ngram_index = open_ngram_index(tmp_path / "suggest.bin", index.name_at)
+    yield ngram_index
+    ngram_index.close()
+    index.close()
+
+
+@pytest.mark.parametrize(
+    "name, suggestions",
+    (
+        ("gti", ["git"]),
+        ("git-comit", ["git-commit"]),
+        ("docker-compse", ["docker-compose"]),
+        ("git", ["gist"]),
+        ("gist", ["git"]),
+        ("xyz", []),
+    ),
+)
+def test_suggest(ngram_index, name, suggestions):
+    assert ngram_index.suggest(name) == suggestions
+
+
+def test_suggest_limit(ngram_index):
+    assert ngram_index.suggest("gti", limit=1) == ["git"]
+
+
+def test_not_built(tmp_path):
+    assert open_ngram_index(tmp_path / "suggest.bin", str) is None
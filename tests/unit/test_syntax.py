@@ -0,0 +1,143 @@
+import pytest
+
+from py_tldr.syntax import (
+    BLANK,
+    CODE,
+    DESCRIPTION,
+    EXAMPLE,
+    PLACEHOLDER,
+    TITLE,
+    Example,
+    Page,
+    parse_page,
+    split_placeholders,
+    strip_line,
+    strip_placeholders,
+    tokenize_line,
+)
+
+PAGE = """# tar
+
+> Archiving utility.
+> More information: <https://www.gnu.org/software/tar>.
+
+- [c]reate an archive:
+
+`tar cf {{target.tar}} {{file1 file2}}`
+
+- List contents:
+
+`tar tvf {{source.tar}}`
+"""
+
+
+@pytest.mark.parametrize(
+    "line, kind, spans",
+    (
+        ("", BLANK, []),
+        ("# tar", TITLE, [(TITLE, "tar")]),
+        (
+            "> More information: <https://tar.com>.",
+            DESCRIPTION,
+            [(DESCRIPTION, "More information: https://tar.com.")],
+        ),
+        ("- [c]reate an archive:", EXAMPLE, [(EXAMPLE, "[c]reate an archive:")]),
+        ("- List `{{path}}`:", EXAMPLE, [(EXAMPLE, "List path:")]),
+        (
+            "`tar cf {{target.tar}} {{file}}`",
+            CODE,
+            [
+                (CODE, "tar cf "),
+                (PLACEHOLDER, "target.tar"),
+                (CODE, " "),
+                (PLACEHOLDER, "file"),
+            ],
+        ),
+    ),
+)
+def test_tokenize_line(line, kind, spans):
+    assert tokenize_line(line) == (kind, spans)
+
+
+@pytest.mark.parametrize(
+    "text, spans",
+    (
+        ("ls", [(CODE, "ls")]),
+        ("{{a}}", [(PLACEHOLDER, "a")]),
+        ("echo {{{a,b}}}", [(CODE, "echo "), (PLACEHOLDER, "{a,b}")]),
+        (
+            "awk '{{print $1}}' {{file}}",
+            [
+                (CODE, "awk '"),
+                (PLACEHOLDER, "print $1"),
+                (CODE, "' "),
+                (PLACEHOLDER, "file"),
+            ],
+        ),
+        ("echo {{unclosed", [(CODE, "echo {{unclosed")]),
+    ),
+)
+def test_split_placeholders(text, spans):
+    assert split_placeholders(text) == spans
+    assert strip_placeholders(text) == "".join([text for _, text in spans])
+
+
+@pytest.mark.parametrize(
+    "line",
+    ("", "# tar", "> See <https://tar.com>.", "- List `{{path}}`:", "`ls {{a}}`", "`"),
+)
+def test_strip_line(line):
+    kind, spans = tokenize_line(line)
+    assert strip_line(line) == (kind, "".join([text for _, text in spans]))
+
+
+class TestParsePage:
+    def test_parse(self):
+        page = parse_page(PAGE)
+        assert page.title == "tar"
+        assert page.description == [
+            "Archiving utility.",
+            "More information: https://www.gnu.org/software/tar.",
+        ]
+        assert page.examples == [
+            Example(
+                "[c]reate an archive:",
+                [
+                    (CODE, "tar cf "),
+                    (PLACEHOLDER, "target.tar"),
+                    (CODE, " "),
+                    (PLACEHOLDER, "file1 file2"),
+                ],
+            ),
+            Example(
+                "List contents:", [(CODE, "tar tvf "), (PLACEHOLDER, "source.tar")]
+            ),
+        ]
+        assert page.examples[0].command == "tar cf target.tar file1 file2"
+        assert page.examples[0].placeholders == ["target.tar", "file1 file2"]
+
+    def test_code_without_example(self):
+        page = parse_page("# foo\n`foo`\n`bar`")
+        assert [example.command for example in page.examples] == ["foo", "bar"]
+        assert [example.description for example in page.examples] == ["", ""]
+
+    def test_slots(self):
+        page = parse_page(PAGE)
+        with pytest.raises(AttributeError):
+            page.foo = "bar"
+        with pytest.raises(AttributeError):
+            page.examples[0].foo = "bar"
+
+    def test_dict(self):
+        page = parse_page(PAGE)
+        data = page.to_dict()
+        assert data["examples"][1] == {
+            "description": "List contents:",
+            "command": "tar tvf source.tar",
+            "tokens": [["code", "tar tvf "], ["placeholder", "source.tar"]],
+        }
+        assert Page.from_dict(data) == page
+
+    def test_iter_lines(self):
+        lines = [tokenize_line(line.strip()) for line in PAGE.strip().split("\n")]
+        assert list(parse_page(PAGE).iter_lines()) == lines
@@ -0,0 +1,63 @@
+import io
+import json
+
+from py_tldr import timing
+from py_tldr.timing import Timings, add_hook, remove_hook, timed
+
+
+def test_disabled():
+    assert timed("foo") is timed("bar")
+    with timed("foo"):
+        pass
+
+
+def test_hook():
+    calls = []
+
+    def hook(name, seconds):
+        calls.append((name, seconds))
+
+    add_hook(hook)
+    try:
+        with timed("foo"):
+            with timed("bar"):
+                pass
+    finally:
+        remove_hook(hook)
+    assert [name for name, _ in calls] == ["bar", "foo"]
+    assert calls[0][1] <= calls[1][1]
+    assert timing._hooks == []
+
+
+def test_timings_report():
+    timings = Timings()
+    timings("foo", 0.001)
+    timings("bar", 0.002)
+    timings("foo", 0.003)
+    file = io.StringIO()
+    timings.report(file=file)
+    lines = file.getvalue().splitlines()
+    assert lines[1].split() == ["foo", "2", "4.00"]
+    assert lines[2].split() == ["bar", "1", "2.00"]
+    assert lines[3].startswith("total")
+    file = io.StringIO()
+    timings.report(as_json=True, file=file)
+    data = json.loads(file.getvalue())
+    assert data["phases"][0] == {"name": "foo", "count": 2, "ms": 4.0}
+
+
+def test_page_finder_phases(tmp_path, mocker):
+    from py_tldr.index import CommandIndex
+    from py_tldr.page import PageFinder
+
+    finder = PageFinder("", 1, tmp_path, "")
+    CommandIndex.write(finder.cache.index_table_file, {"foo": {"common": ["en"]}})
+    finder.cache._record_index()
+    finder.cache.set("foo", "common", "# foo")
+    timings = Timings()
+    add_hook(timings)
+    try:
+        assert finder.find("foo", languages=["en"]) == "# foo"
+    finally:
+        remove_hook(timings)
+    assert list(timings.phases) == ["index.check", "index.load", "search", "cache.read"]